@@ -0,0 +1,79 @@
+"""파서 백엔드 마이크로 벤치마크.
+
+benchmarks/fixtures 의 샘플 페이지(네이버 금융 마크업과 같은 구조, cp949)를 각 백엔드로
+반복 파싱해서 페이지 종류별 rows/sec 를 비교하고, 모든 백엔드가 같은 행을 뽑는지 확인한다.
+
+    python benchmarks/bench_parsers.py --repeat 50
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from doragi.parsers import PARSER_BACKENDS  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (페이지 종류, 추출 메서드, 샘플 파일)
+CASES = [
+    ("theme", "theme_list", ["theme.html"]),
+    ("theme_detail", "theme_stocks", ["theme_detail_1.html", "theme_detail_2.html"]),
+    ("sise_rise", "riser_rows", ["sise_rise_0.html", "sise_rise_1.html"]),
+    ("market_sum", "market_sum_rows", ["sise_market_sum_amount_0_1.html", "sise_market_sum_cap_0_1.html"]),
+    ("item_main", "item_fundamentals", ["item_main.html"]),
+]
+
+
+def _count_rows(result):
+    return len(result) if isinstance(result, list) else 1
+
+
+def run(backend_names, repeat):
+    pages = {}
+    for _, _, files in CASES:
+        for fname in files:
+            with open(os.path.join(FIXTURE_DIR, fname), "rb") as f:
+                pages[fname] = f.read()
+
+    backends = {name: PARSER_BACKENDS[name]() for name in backend_names}
+    mismatches = []
+    print(f"{'page':<14}{'backend':<8}{'rows':>6}{'ms/page':>10}{'rows/sec':>12}")
+    for kind, method, files in CASES:
+        reference = None
+        for name, backend in backends.items():
+            parse = getattr(backend, method)
+            results = [parse(pages[fname]) for fname in files]
+            if reference is None:
+                reference = (name, results)
+            elif results != reference[1]:
+                mismatches.append(f"{kind}: {name} != {reference[0]}")
+
+            rows = sum(_count_rows(r) for r in results)
+            t_start = time.perf_counter()
+            for _ in range(repeat):
+                for fname in files:
+                    parse(pages[fname])
+            elapsed = time.perf_counter() - t_start
+            ms_per_page = elapsed * 1000 / (repeat * len(files))
+            print(f"{kind:<14}{name:<8}{rows:>6}{ms_per_page:>10.3f}{rows * repeat / elapsed:>12.0f}")
+
+    if mismatches:
+        print("\n❌ 백엔드 결과 불일치:\n  " + "\n  ".join(mismatches))
+        return 1
+    print("\n✅ 모든 백엔드가 같은 행을 추출했습니다.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backend", action="append", choices=sorted(PARSER_BACKENDS),
+                        help="비교할 백엔드 (여러 번 지정 가능, 기본값: 전부)")
+    args = parser.parse_args()
+    return run(args.backend or sorted(PARSER_BACKENDS), args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""수집 → 교집합 파이프라인 end-to-end 벤치마크 (네트워크 없이).
+
+replay_server.py 를 별도 프로세스로 띄우고, 공유 HttpClient 의 finance.naver.com / news.google.com
+요청을 그 서버로 돌린다. 그 다음 get_top_50_themes_stocks 부터 상승률/거래대금 수집, 교집합,
+교집합 종목의 기본 지표와 뉴스까지 전체를 rounds 번 돌려 라운드별 소요 시간, req/s,
+최대 메모리, 단계별 행 수를 출력한다.
+
+    python benchmarks/bench_pipeline.py --rounds 5 --latency 0.05 --jitter 0.02 --error-rate 0.02
+
+기본은 라운드마다 HttpClient 와 캐시(테마 상세 포함)를 새로 만든다(콜드). --warm 이면 HttpClient 를 유지해서
+keep-alive 커넥션과 ETag 재검증(304)까지 포함한 반복 갱신을 잰다. --reuse-theme-details 면 테마 상세 델타
+갱신(바뀌지 않은 테마 페이지 재사용)도 라운드 사이에 유지한다. 첫 줄에 어느 모드인지 찍는다.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 대역 서버의 순위가 실제 테마 순위 이력(data/rank_history.sqlite3)에 섞이지 않게
+os.environ.setdefault("DORAGI_DATA_DIR", tempfile.mkdtemp(prefix="doragi-bench-"))
+
+from doragi import collectors, news, pages  # noqa: E402
+from doragi.http_client import get_http_client  # noqa: E402
+from doragi.intersection import compute_intersection  # noqa: E402
+from doragi.metrics import count_rows, get_metrics  # noqa: E402
+from doragi.ratelimit import get_rate_limiter  # noqa: E402
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_server.py")
+REPLAYED_HOSTS = ("https://finance.naver.com", "https://news.google.com")
+PIPELINE_DATASETS = ("themes", "risers", "trading_value")
+
+
+class ReplayAdapter(HTTPAdapter):
+    """요청 URL 의 scheme/host 만 대역 서버로 바꿔 보낸다. (재시도/풀 설정은 원래 어댑터와 같게)"""
+
+    def __init__(self, netloc, **kwargs):
+        super().__init__(**kwargs)
+        self.netloc = netloc
+
+    def send(self, request, **kwargs):
+        parts = urllib.parse.urlsplit(request.url)
+        request.url = urllib.parse.urlunsplit(("http", self.netloc, parts.path, parts.query, ""))
+        return super().send(request, **kwargs)
+
+
+def start_server(args):
+    cmd = [
+        sys.executable, SERVER, "--port", "0", "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status), "--seed", str(args.seed),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline().split()
+    if len(line) != 2 or line[0] != "PORT":
+        proc.kill()
+        raise RuntimeError("replay_server 를 시작하지 못했습니다.")
+    return proc, f"127.0.0.1:{line[1]}"
+
+
+def server_stats(netloc):
+    with urllib.request.urlopen(f"http://{netloc}/__stats") as res:
+        return json.load(res)
+
+
+def reset(netloc, warm, reuse_theme_details=False):
+    """라운드 사이에 공유 객체를 새로 만든다. (warm 이면 HttpClient, reuse_theme_details 면 테마 상세는 유지)"""
+    if not warm:
+        get_http_client.cache_clear()
+        get_rate_limiter().reset()
+    if not reuse_theme_details:
+        collectors.get_theme_detail_cache().clear()
+    pages.get_snapshot_pages.cache_clear()
+    collectors.get_fundamentals_cache.cache_clear()
+    news.get_news_aggregator.cache_clear()
+    get_metrics().clear()
+
+    client = get_http_client()
+    original = client.session.get_adapter("https://")
+    adapter = ReplayAdapter(
+        netloc, pool_connections=original._pool_connections, pool_maxsize=original._pool_maxsize,
+        max_retries=original.max_retries,
+    )
+    for prefix in REPLAYED_HOSTS:
+        client.session.mount(prefix, adapter)
+    return client
+
+
+def run_round(netloc, args):
+    client = reset(netloc, args.warm, args.reuse_theme_details)
+    before = server_stats(netloc)
+    retried_before = client.stats["retried"]
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    stages = {}
+    t_start = time.perf_counter()
+    results, errors = collectors.collect_all(PIPELINE_DATASETS)
+    stages["collect"] = time.perf_counter() - t_start
+
+    t_stage = time.perf_counter()
+    df_final = compute_intersection(
+        results.get("themes"), results.get("risers", {}), results.get("trading_value")
+    ) if not errors else None
+    stages["intersection"] = time.perf_counter() - t_stage
+
+    fundamentals, news_items = [], []
+    if df_final is not None and not df_final.empty:
+        t_stage = time.perf_counter()
+        codes = list(df_final["code"].head(args.fundamentals))
+        collectors.get_fundamentals_cache().prefetch(codes)
+        fundamentals = [collectors.get_stock_fundamentals(code) for code in codes]
+        stages["fundamentals"] = time.perf_counter() - t_stage
+
+        t_stage = time.perf_counter()
+        queries = [q for name in df_final["종목명"].head(args.news) for q in news.stock_news_queries(name)]
+        news_items = news.get_news_aggregator().search(queries, limit=10) if queries else []
+        stages["news"] = time.perf_counter() - t_stage
+    wall = time.perf_counter() - t_start
+
+    heap_peak = None
+    if args.tracemalloc:
+        heap_peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    after = server_stats(netloc)
+    requests_made = after["requests"] - before["requests"]
+    return {
+        "wall": wall, "stages": stages,
+        "requests": requests_made, "req_per_sec": requests_made / wall if wall else 0.0,
+        "not_modified": after["not_modified"] - before["not_modified"],
+        "injected_errors": after["errors"] - before["errors"],
+        "client_retries": client.stats["retried"] - retried_before,
+        "theme_details_reused": results["themes"].attrs.get("crawl_stats", {}).get("reused", 0) if "themes" in results else 0,
+        "bytes": after["bytes"] - before["bytes"],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "heap_peak_mb": heap_peak,
+        "rows": {
+            **{name: count_rows(results[name]) for name in PIPELINE_DATASETS if name in results},
+            "intersection": 0 if df_final is None else len(df_final),
+            "fundamentals": len(fundamentals), "news": len(news_items),
+        },
+        "errors": errors,
+    }
+
+
+def mode_label(args):
+    parts = (["HTTP 유지(keep-alive + 304)"] if args.warm else []) + (["테마 상세 재사용"] if args.reuse_theme_details else [])
+    return " + ".join(parts) if parts else "콜드"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.03, help="요청당 서버 지연 (초)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="오류 응답 확률 (HttpClient 가 재시도)")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fundamentals", type=int, default=20, help="기본 지표를 받을 교집합 상위 종목 수")
+    parser.add_argument("--news", type=int, default=5, help="뉴스를 받을 교집합 상위 종목 수")
+    parser.add_argument("--warm", action="store_true", help="라운드 사이에 HttpClient 를 유지 (keep-alive + 304)")
+    parser.add_argument("--reuse-theme-details", action="store_true",
+                        help="라운드 사이에 테마 상세 페이지 캐시를 유지 (바뀌지 않은 테마는 다시 받지 않음)")
+    parser.add_argument("--tracemalloc", action="store_true", help="파이썬 힙 최대치도 잰다 (느려짐)")
+    parser.add_argument("--json", help="라운드별 결과를 쓸 파일")
+    args = parser.parse_args()
+
+    proc, netloc = start_server(args)
+    try:
+        rounds = []
+        print(f"mode: {mode_label(args)}")
+        print(f"{'round':>5}{'wall(s)':>9}{'collect':>9}{'req':>6}{'req/s':>8}{'304':>5}{'err':>5}{'retry':>6}{'reuse':>6}"
+              f"{'rss(MB)':>9}{'heap(MB)':>9}  rows")
+        for i in range(1, args.rounds + 1):
+            r = run_round(netloc, args)
+            rounds.append(r)
+            heap = f"{r['heap_peak_mb']:.1f}" if r["heap_peak_mb"] is not None else "-"
+            rows = " ".join(f"{k}={v}" for k, v in r["rows"].items())
+            print(f"{i:>5}{r['wall']:>9.3f}{r['stages']['collect']:>9.3f}{r['requests']:>6}{r['req_per_sec']:>8.1f}"
+                  f"{r['not_modified']:>5}{r['injected_errors']:>5}{r['client_retries']:>6}{r['theme_details_reused']:>6}"
+                  f"{r['peak_rss_mb']:>9.1f}{heap:>9}  {rows}")
+            for name, error in r["errors"].items():
+                print(f"      ⚠️ {name}: {error}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    walls = [r["wall"] for r in rounds]
+    print(f"\n[{mode_label(args)}] wall 중앙값 {statistics.median(walls):.3f}s / 최소 {min(walls):.3f}s / 최대 {max(walls):.3f}s"
+          f" (지연 {args.latency}+U(0,{args.jitter})s, 오류율 {args.error_rate})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "mode": mode_label(args), "rounds": rounds}, f, ensure_ascii=False, indent=2)
+    return 1 if any(r["errors"] or not r["rows"]["intersection"] for r in rounds) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
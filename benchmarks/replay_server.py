@@ -0,0 +1,253 @@
+"""네이버 금융 / Google News RSS 대역 서버 (오프라인 벤치마크용).
+
+benchmarks/fixtures 의 페이지를 URL 경로에 맞춰 돌려준다. fixtures/recorded/ 에 같은 URL 로
+녹화한 응답이 있으면 그것을 먼저 쓰고, 없으면 종류별 샘플 페이지로 대신한다.
+
+- --latency / --jitter: 요청마다 latency + U(0, jitter) 초 지연
+- --error-rate / --error-status: 주어진 확률로 오류 응답 (시드 고정이라 매번 같은 순서)
+- ETag 를 붙이고 If-None-Match 가 맞으면 304 를 준다. (HttpClient 의 재검증 경로)
+- GET /__stats: 지금까지의 요청/오류/304/바이트 수 (JSON)
+- GET /api/realtime/domestic/stock/<code,code,...>: 실시간 시세 대역. 요청마다 종목별로 시드 고정
+  랜덤 워크를 한 걸음씩 움직인다. (DORAGI_QUOTE_URL=http://127.0.0.1:<port>/api/realtime/domestic/stock/{codes})
+
+    python benchmarks/replay_server.py --port 8765 --latency 0.05 --error-rate 0.02
+    python benchmarks/replay_server.py --record       # 실제 사이트에서 fixtures/recorded/ 로 녹화 (네트워크 필요)
+
+시작하면 첫 줄에 "PORT <번호>" 를 출력한다. (--port 0 이면 빈 포트)
+"""
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDED_DIR = os.path.join(FIXTURE_DIR, "recorded")
+
+_PUBDATE_RE = re.compile(r'__PUBDATE_(\d+)__')
+_UNSAFE_RE = re.compile(r'[^0-9A-Za-z._=-]+')
+QUOTE_PATH = "/api/realtime/domestic/stock/"
+
+
+def recorded_name(path, query):
+    """URL 경로+쿼리 -> 녹화 파일 이름. (예: sise_rise.naver?sosok=0 -> sise_rise.naver_sosok=0)"""
+    name = path.strip("/").replace("/", "_")
+    if query:
+        name += "_" + "&".join(sorted(query.split("&")))
+    return _UNSAFE_RE.sub("_", name)
+
+
+def sample_fixture(path, params):
+    """녹화가 없을 때 쓸 샘플 페이지 이름. 모르는 경로면 None."""
+    first = lambda key, default="": params.get(key, [default])[0]
+    if path == "/sise/theme.naver":
+        return "theme.html"
+    if path == "/sise/sise_group_detail.naver":
+        return f"theme_detail_{int(first('no', '1')) % 2 + 1}.html"
+    if path == "/sise/sise_rise.naver":
+        return f"sise_rise_{first('sosok', '0')}.html"
+    if path == "/sise/sise_market_sum.naver":
+        return "sise_market_sum_amount_0_1.html" if first("sort") == "amount" else "sise_market_sum_cap_0_1.html"
+    if path == "/item/main.naver":
+        return "item_main.html"
+    if path == "/rss/search":
+        return "news_rss.xml"
+    return None
+
+
+def render_pubdates(body, now=None):
+    """RSS 샘플의 __PUBDATE_<분>__ 을 '지금으로부터 n분 전' 날짜로 바꾼다. (7일 필터에 걸리지 않게)"""
+    now = now or datetime.now(timezone.utc)
+    return _PUBDATE_RE.sub(
+        lambda m: email.utils.format_datetime(now - timedelta(minutes=int(m.group(1)))), body.decode("utf-8")
+    ).encode("utf-8")
+
+
+class ReplayState:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._quotes = {}  # code -> (전일 종가, 현재가)
+        self.stats = {"requests": 0, "errors": 0, "not_modified": 0, "bytes": 0, "unknown": 0}
+
+    def draw(self):
+        """(지연 초, 오류를 낼지)"""
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter), self._random.random() < self.error_rate
+
+    def load(self, path, query):
+        recorded = os.path.join(RECORDED_DIR, recorded_name(path, query))
+        fname = recorded if os.path.exists(recorded) else None
+        if fname is None:
+            sample = sample_fixture(path, urllib.parse.parse_qs(query))
+            fname = os.path.join(FIXTURE_DIR, sample) if sample else None
+        if fname is None:
+            return None
+        with self._lock:
+            if fname not in self._files:
+                with open(fname, "rb") as f:
+                    self._files[fname] = f.read()
+            return self._files[fname]
+
+    def quotes(self, codes):
+        """polling API 와 같은 모양의 응답. 절반쯤의 종목만 한 호가씩 움직인다."""
+        datas = []
+        with self._lock:
+            for code in codes:
+                if code not in self._quotes:
+                    base = 1000 + int(hashlib.md5(code.encode()).hexdigest()[:6], 16) % 200000
+                    self._quotes[code] = (base, base)
+                prev_close, price = self._quotes[code]
+                if self._random.random() < 0.5:
+                    price = max(1, price + self._random.choice((-1, 1)) * max(1, prev_close // 1000))
+                    self._quotes[code] = (prev_close, price)
+                datas.append({
+                    "itemCode": code, "closePrice": f"{price:,}",
+                    "fluctuationsRatio": f"{(price - prev_close) / prev_close * 100:.2f}",
+                })
+        return {"datas": datas}
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+
+def make_handler(state):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive (HttpClient 의 커넥션 풀 재사용까지 재현)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body=b"", headers=()):
+            self.send_response(status)
+            for key, value in headers:
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            parts = urllib.parse.urlsplit(self.path)
+            if parts.path == "/__stats":
+                with state._lock:
+                    body = json.dumps(state.stats).encode("utf-8")
+                return self._send(200, body, [("Content-Type", "application/json")])
+
+            state.count("requests")
+            delay, fail = state.draw()
+            if delay > 0:
+                time.sleep(delay)
+            if fail:
+                state.count("errors")
+                return self._send(state.error_status, b"injected error")
+
+            if parts.path.startswith(QUOTE_PATH):
+                codes = [c for c in parts.path[len(QUOTE_PATH):].split(",") if c]
+                body = json.dumps(state.quotes(codes)).encode("utf-8")
+                state.count("bytes", len(body))
+                return self._send(200, body, [("Content-Type", "application/json")])
+
+            body = state.load(parts.path, parts.query)
+            if body is None:
+                state.count("unknown")
+                return self._send(404, b"no fixture")
+
+            is_rss = parts.path.startswith("/rss/")
+            if is_rss:
+                body = render_pubdates(body)
+                content_type = "application/rss+xml; charset=UTF-8"
+            else:
+                content_type = "text/html; charset=euc-kr"
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if not is_rss and self.headers.get("If-None-Match") == etag:
+                state.count("not_modified")
+                return self._send(304, headers=[("ETag", etag)])
+            state.count("bytes", len(body))
+            headers = [("Content-Type", content_type)] + ([] if is_rss else [("ETag", etag)])
+            self._send(200, body, headers)
+
+    return ReplayHandler
+
+
+def serve(port=0, **options):
+    """서버를 띄우고 (server, state) 를 돌려준다. serve_forever 는 호출하는 쪽에서."""
+    state = ReplayState(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    return server, state
+
+
+def record():
+    """실제 사이트에서 벤치마크 경로 전체를 한 번 받아 fixtures/recorded/ 에 저장한다."""
+    from doragi.http_client import get_headers, get_http_client
+    from doragi.news import build_search_url
+    from doragi.parsers import get_parser_backend
+
+    client, parser = get_http_client(), get_parser_backend()
+    os.makedirs(RECORDED_DIR, exist_ok=True)
+
+    def fetch(url, headers=None):
+        res = client.get(url, headers=headers or get_headers(), revalidate=False)
+        res.raise_for_status()
+        parts = urllib.parse.urlsplit(url)
+        with open(os.path.join(RECORDED_DIR, recorded_name(parts.path, parts.query)), "wb") as f:
+            f.write(res.content)
+        print(f"{len(res.content):>8} {url}")
+        return res.content
+
+    base = "https://finance.naver.com"
+    for theme in parser.theme_list(fetch(f"{base}/sise/theme.naver")):
+        fetch(theme["link"])
+    codes = []
+    for sosok in (0, 1):
+        codes += [row["code"] for row in parser.riser_rows(fetch(f"{base}/sise/sise_rise.naver?sosok={sosok}"))]
+        for page in range(1, 6):
+            fetch(f"{base}/sise/sise_market_sum.naver?sosok={sosok}&sort=amount&page={page}")
+    for page in range(1, 4):
+        fetch(f"{base}/sise/sise_market_sum.naver?sosok=0&page={page}")
+    for code in codes[:20]:
+        fetch(f"{base}/item/main.naver?code={code}")
+    fetch(build_search_url("국내 증시"), headers={"User-Agent": "Mozilla/5.0"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="요청당 기본 지연 (초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="추가 지연 상한 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="오류 응답 확률 (0~1)")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", action="store_true", help="실제 사이트에서 녹화만 하고 끝냄")
+    args = parser.parse_args()
+    if args.record:
+        return record()
+
+    server, _ = serve(args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      error_status=args.error_status, seed=args.seed)
+    print(f"PORT {server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""주식 테마 분석기 핵심 로직 (Streamlit 비의존)."""
@@ -0,0 +1,5 @@
+import sys
+
+from doragi.cli import main
+
+sys.exit(main())
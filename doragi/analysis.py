@@ -0,0 +1,185 @@
+"""Gemini 분석 (종목 심층 분석 대화 / 시황 브리핑).
+
+두 함수 모두 응답 조각을 내보내는 생성기다. 화면은 st.write_stream 으로, 배치는 "".join 으로 읽는다.
+"""
+import functools
+import time
+
+import google.generativeai as genai
+
+from doragi.chat_context import ChatContext
+from doragi.llm_cache import LlmResponseCache
+from doragi.metrics import get_metrics
+from doragi.news import news_source_label, select_news
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+# --- 안전 필터 해제 ---
+safety_settings = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+
+# --- [모델 목록] ---
+def list_gemini_models(api_key):
+    try:
+        genai.configure(api_key=api_key)
+        return [m.name.replace("models/", "") for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+    except: return [DEFAULT_MODEL]
+
+
+# --- [AI 응답 캐시: (모델, 데이터 스냅샷, 프롬프트) 가 같으면 저장된 답변을 다시 흘려 준다] ---
+@functools.lru_cache(maxsize=None)
+def get_llm_cache():
+    return LlmResponseCache()
+
+
+def _stream_gemini(model_name, contents, system_instruction=None, request_options=None):
+    """Gemini 스트림. 첫 조각까지의 시간(TTFT)과 전체 시간을 llm_* 지표로 남긴다."""
+    metrics = get_metrics()
+    t_start = time.perf_counter()
+    first = True
+    model = genai.GenerativeModel(f"models/{model_name}", system_instruction=system_instruction)
+    response = model.generate_content(contents, stream=True, safety_settings=safety_settings, request_options=request_options)
+    for chunk in response:
+        if first:
+            metrics.observe("llm_ttft_seconds", time.perf_counter() - t_start, model=model_name)
+            first = False
+        try:
+            if chunk.text: yield chunk.text
+        except ValueError: pass
+    metrics.observe("llm_total_seconds", time.perf_counter() - t_start, model=model_name)
+
+
+# --- [개별 종목 프롬프트: 화면의 대화와 배치 스코어링이 같은 문자열을 만들어야 응답 캐시를 같이 쓴다] ---
+STOCK_REPORT_REQUEST = "{name} 심층 분석해줘."
+
+
+def build_market_fact(stock_name, code, theme, fundamentals, price_text, indicators_text=""):
+    fact = (
+        f"종목명: {stock_name}\n코드: {code}\n테마: {theme}\n시가총액: {fundamentals['시가총액']}\n"
+        f"PER: {fundamentals['PER']} | PBR: {fundamentals['PBR']} | EPS: {fundamentals['EPS']} | "
+        f"배당수익률: {fundamentals['배당수익률']}% | 외국인소진율: {fundamentals['외국인소진율']}\n"
+        f"현재가(등락): {price_text}"
+    )
+    # 일봉 기반 지표 (doragi.indicators.describe_indicators)
+    return fact + f"\n기술적 지표(일봉): {indicators_text}" if indicators_text else fact
+
+
+def build_stock_system_text(market_data_str, news_data, terms=()):
+    # 같은 기사는 하나로 묶고 terms(종목명/테마) 관련도 순으로 토큰 예산 안의 상위 기사만
+    news_data = select_news(news_data, terms)
+    combined_news_context = ""
+    if news_data:
+        for i, item in enumerate(news_data):
+            combined_news_context += f"[{i+1}. {news_source_label(item)}] {item['title']} ({item['date']})\n> 요약: {item['summary']}\n\n"
+    else:
+        combined_news_context = "(수집된 뉴스가 없습니다. 시장 데이터 위주로 분석하세요.)"
+
+    search_res = f"""
+    \n[현재 분석 중인 종목 데이터]
+    1. 📊 시장 팩트: {market_data_str}
+    2. 📰 뉴스 데이터 (총 {len(news_data)}건):
+    {combined_news_context}
+    """
+
+    sys_instructions = """
+    [Role]
+    당신은 냉철한 판단력을 가진 세계최고 주식 애널리스트 겸 분석가 입니다.
+    제공된 [정량 데이터]와 [뉴스 데이터]를 기반으로 사용자의 질문에 답변하십시오.
+
+    [Instruction]
+    - 질문이 "분석해줘" 같은 요청이면 아래 포맷으로 리포트를 작성하세요.
+    - 긴말하지 말고 핵심만 명확하게 전달하세요.
+
+    [Report Format]
+    ### 1. 🎯 AI 투자 매력도 점수 (100점 만점)
+    * **점수:** OOO점
+    * **한줄 평:** (상승 동력 및 리스크 요약)
+
+    ### 2. 🚀 핵심 상승 동력 (Fact Base)
+    * 뉴스에서 확인된 실체 있는 호재 3가지를 요약.
+
+    ### 3. ⚠️ 리스크 및 수급 점검
+    * 과열 여부, 대주주 매도, 테마 대장주 여부 등 판단.
+
+    ### 4. 💡 실전 매매 전략
+    * **포지션:** [적극 매수 / 눌림목 매수 / 관망 / 매도]
+    * **전략:** 구체적인 진입/대응 가이드.
+    """
+
+    return sys_instructions + "\n" + search_res
+
+
+def stream_stock_report(model_name, snapshot_id, system_text, contents, request_options=None):
+    """응답 캐시를 거친 원시 스트림. 오류는 그대로 올라간다."""
+    return get_llm_cache().stream(
+        model_name, snapshot_id, {"system": system_text, "contents": contents},
+        lambda: _stream_gemini(model_name, contents, system_instruction=system_text, request_options=request_options)
+    )
+
+
+# --- [AI 응답 함수 1: 개별 종목] ---
+def get_gemini_response_stock_deep(messages, model_name, stock_name, theme, market_data_str, news_data, snapshot_id=None, chat_context=None, api_key=None):
+    if api_key: genai.configure(api_key=api_key)
+
+    # 지침과 종목 데이터는 system_instruction 으로 한 번만, 대화 기록은 토큰 예산 안에서 오래된 턴을 요약해서 보낸다
+    system_text = build_stock_system_text(market_data_str, news_data, (stock_name, theme))
+    chat_context = chat_context or ChatContext()
+    modified_msgs = chat_context.build(messages, system_text)
+
+    try:
+        yield from stream_stock_report(model_name, snapshot_id, system_text, modified_msgs)
+    except Exception as e:
+        yield f"⚠️ 응답 중 오류: {str(e)}"
+
+
+# --- [AI 응답 함수 2: 시황 분석] ---
+MARKET_NEWS_TERMS = ("코스피", "코스닥", "증시", "지수")  # 시황 브리핑 뉴스의 관련도 기준
+
+
+def analyze_market_macro_v2(df_cap, df_gainers_kospi, df_gainers_kosdaq, news_data, model_name, snapshot_id=None, api_key=None):
+    if api_key: genai.configure(api_key=api_key)
+
+    str_cap = df_cap.head(50).to_string(index=False)
+    str_kospi_gain = df_gainers_kospi.head(50).to_string(index=False)
+    str_kosdaq_gain = df_gainers_kosdaq.head(50).to_string(index=False)
+
+    combined_news = ""
+    for item in select_news(news_data, MARKET_NEWS_TERMS):
+        combined_news += f"[{news_source_label(item)}] {item['title']}\n(요약): {item['summary']}\n\n"
+
+    prompt = f"""
+    당신은 거시경제와 시장 흐름을 읽는 국내 최고 '마켓스트래티지스트겸 애널리스트 입니다.
+    긴말하지말고 바로 분석에 들어가 주세요.
+
+    [입력 데이터]
+    1. Blue Chips (50위): {str_cap}
+    2. Momentum (급등주): {str_kospi_gain} / {str_kosdaq_gain}
+    3. News: {combined_news}
+
+    [분석 요구사항]
+    위 데이터를 종합하여 '대형주(지수)'와 '개별 급등주(테마)'의 괴리를 분석하고,
+    오늘 시장의 **'진짜 주도 흐름'**을 명확히 정의해 주세요.
+
+    ### 1. 🌍 오늘의 시장 세줄 요약 (Market Color)
+    * (예: "지수는 보합이나 2차전지와 AI 로봇 테마가 폭발하는 종목 장세")
+
+    ### 2. 💰 자금 흐름 추적 (Money Flow)
+    * **대형주:** 반도체, 바이오, 금융 등 시총 상위 섹터의 수급은 어떻습니까?
+    * **개별주:** 급등주 리스트에서 공통적으로 보이는 **'오늘의 강세 테마'**는 무엇입니까?
+
+    ### 3. 📈 주요 거시 요인 분석
+    * 환율, 금리, 미 증시 영향, 정부 정책 등이 오늘 시장에 미친 영향.
+
+    ### 4. 💼 투자자 대응 가이드
+    * 오늘 같은 장세에서는 **어떤 스타일의 투자**가 유리합니까? (돌파 매매 vs 눌림목 매수 vs 현금 확보)
+    """
+
+    try:
+        yield from get_llm_cache().stream(model_name, snapshot_id, prompt, lambda: _stream_gemini(model_name, prompt))
+    except Exception as e:
+        yield f"⚠️ 분석 중 오류: {str(e)}"
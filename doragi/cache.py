@@ -0,0 +1,101 @@
+"""키 단위 TTL 캐시 (single-flight + 백그라운드 prefetch)."""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from doragi.metrics import get_metrics
+
+
+class TtlCache:
+    """loader(key) 결과를 ttl 초 동안 기억한다.
+
+    - get(): 없거나 만료됐으면 호출한 스레드에서 불러온다. 같은 키를 이미 불러오는 중이면 그 결과를 기다린다.
+    - prefetch(): 없는 키들만 백그라운드 스레드풀에 맡기고 바로 돌아온다.
+    - peek(): 네트워크 없이 지금 가진 값만 본다. pending() 은 그 키를 지금 불러오는 중인지.
+    실패한 로드는 기억하지 않으므로 다음 get() 이 다시 시도한다.
+    name 을 주면 get() 의 적중/실패를 cache_requests_total{cache=name} 지표로도 남긴다.
+    """
+
+    def __init__(self, loader, ttl, max_workers=4, max_entries=2000, name=None):
+        self.loader = loader
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (loaded_at, Future)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ttl-cache")
+        self.stats = {"hits": 0, "misses": 0, "prefetched": 0}
+
+    def _fresh(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        loaded_at, future = entry
+        if future.done() and (future.exception() is not None or now - loaded_at >= self.ttl):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return future
+
+    def _claim(self, key, now):
+        """(future, owner). owner 면 호출자가 로드해서 결과를 채워야 한다."""
+        future = self._fresh(key, now)
+        if future is not None:
+            return future, False
+        future = Future()
+        self._entries[key] = (now, future)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return future, True
+
+    def _load(self, key, future):
+        try:
+            future.set_result(self.loader(key))
+        except Exception as e:
+            future.set_exception(e)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is future:
+                # 만료 시각은 로드가 끝난 시점부터 센다
+                self._entries[key] = (time.time(), future)
+
+    def get(self, key):
+        with self._lock:
+            future, owner = self._claim(key, time.time())
+            self.stats["misses" if owner else "hits"] += 1
+        if self.name:
+            get_metrics().inc("cache_requests_total", cache=self.name, result="miss" if owner else "hit")
+        if owner:
+            self._load(key, future)
+        return future.result()
+
+    def peek(self, key):
+        with self._lock:
+            future = self._fresh(key, time.time())
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def pending(self, key):
+        """key 를 지금 불러오는 중인지. (없는 키나 이미 끝난/실패한 키는 False)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and not entry[1].done()
+
+    def prefetch(self, keys):
+        submitted = 0
+        now = time.time()
+        for key in keys:
+            with self._lock:
+                future, owner = self._claim(key, now)
+            if owner:
+                self._executor.submit(self._load, key, future)
+                submitted += 1
+        with self._lock:
+            self.stats["prefetched"] += submitted
+        return submitted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,82 @@
+"""종목 대화용 토큰 예산 컨텍스트.
+
+- 분석 지침과 시장/뉴스 데이터는 대화 기록에 끼워 넣지 않고 system_instruction 으로 한 번만 보낸다.
+- 대화 기록이 예산을 넘으면 오래된 턴부터 한 줄 요약으로 접는다. 이미 접은 턴은 다시 보지 않으므로
+  (세션에 ChatContext 를 두고 계속 쓰면) 턴이 늘어나도 매 요청의 프롬프트 크기가 거의 일정하다.
+"""
+import math
+
+CHAT_HISTORY_TOKEN_BUDGET = 2000   # 요약하지 않고 그대로 보낼 최근 대화의 토큰 예산
+SUMMARY_TOKEN_BUDGET = 600         # 요약 줄 전체의 토큰 예산 (넘으면 가장 오래된 요약부터 버림)
+KEEP_RECENT_MESSAGES = 4           # 예산과 상관없이 원문으로 남길 최근 메시지 수
+SUMMARY_CHARS_PER_MESSAGE = 80
+
+SUMMARY_HEADER = "[이전 대화 요약]"
+SUMMARY_ACK = "네, 이전 대화 내용을 참고해서 이어서 답변하겠습니다."
+
+
+def estimate_tokens(text):
+    """토크나이저 호출 없이 쓰는 근사치. 한글 등 비 ASCII 문자는 글자당 약 0.7, ASCII 는 4글자당 1 토큰."""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return math.ceil(non_ascii * 0.7 + (len(text) - non_ascii) / 4)
+
+
+def summarize_turn(turn, max_chars=SUMMARY_CHARS_PER_MESSAGE):
+    parts = []
+    for msg in turn:
+        label = "Q" if msg['role'] == "user" else "A"
+        text = " ".join(msg['content'].split())
+        parts.append(f"{label}: {text[:max_chars]}{'…' if len(text) > max_chars else ''}")
+    return " / ".join(parts)
+
+
+def _to_content(msg):
+    return {"role": "user" if msg['role'] == "user" else "model", "parts": [msg['content']]}
+
+
+class ChatContext:
+    def __init__(self, history_budget=CHAT_HISTORY_TOKEN_BUDGET, summary_budget=SUMMARY_TOKEN_BUDGET,
+                 keep_recent=KEEP_RECENT_MESSAGES):
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.keep_recent = keep_recent
+        self.summary_lines = []
+        self.compacted = 0  # messages[:compacted] 는 이미 summary_lines 에 들어 있음
+        self.last_stats = {}
+
+    def _compact(self, history):
+        if self.compacted > len(history):  # 대화가 초기화됐으면 처음부터
+            self.summary_lines, self.compacted = [], 0
+        while True:
+            recent = history[self.compacted:]
+            if len(recent) <= self.keep_recent:
+                break
+            if sum(estimate_tokens(m['content']) for m in recent) <= self.history_budget:
+                break
+            # 질문/답변 한 쌍을 한 줄로 접는다
+            n = 2 if recent[0]['role'] == "user" and recent[1]['role'] != "user" else 1
+            self.summary_lines.append(summarize_turn(recent[:n]))
+            self.compacted += n
+        while self.summary_lines and estimate_tokens("\n".join(self.summary_lines)) > self.summary_budget:
+            self.summary_lines.pop(0)
+
+    def build(self, messages, system_text=""):
+        """messages[-1] 은 이번 질문. Gemini contents 목록을 돌려준다."""
+        history = messages[:-1]
+        self._compact(history)
+
+        contents = []
+        if self.summary_lines:
+            contents.append({"role": "user", "parts": [SUMMARY_HEADER + "\n- " + "\n- ".join(self.summary_lines)]})
+            contents.append({"role": "model", "parts": [SUMMARY_ACK]})
+        contents.extend(_to_content(msg) for msg in history[self.compacted:])
+        contents.append(_to_content(messages[-1]))
+
+        self.last_stats = {
+            "system_tokens": estimate_tokens(system_text),
+            "history_tokens": sum(estimate_tokens(c['parts'][0]) for c in contents),
+            "compacted_messages": self.compacted,
+        }
+        return contents
@@ -0,0 +1,162 @@
+"""배치 수집 CLI (Streamlit 없이 실행).
+
+    python -m doragi --out output --format parquet --max-theme-rank 20 --sort 등락률
+
+데이터셋을 동시에 한 번씩 수집해서 3중 교집합과 시장 표들을 파일로 쓰고, 수집 결과 요약을
+manifest.json 에 남긴다. Streamlit 은 import 하지 않으므로 cron/워커에서 바로 돌릴 수 있다.
+Gemini 는 --screen-model 을 줄 때만 불러온다. (API 키는 환경 변수 GOOG_API_KEY)
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from doragi.collectors import DATASETS, UNIVERSE, collect_all
+from doragi.intersection import SORT_OPTIONS, compute_intersection
+from doragi.metrics import get_metrics
+from doragi.rank_history import attach_rank_features, get_rank_history
+
+OUTPUT_FORMATS = ("json", "parquet")
+INTERSECTION_INPUTS = ("themes", "risers", "trading_value")
+
+
+def build_tables(results, filters=None, sort_keys=None):
+    """수집 결과 -> {파일 이름: DataFrame}. 교집합은 입력 세 개가 모두 있을 때만 만든다."""
+    tables = {}
+    if all(name in results for name in INTERSECTION_INPUTS):
+        # 테마 순위 이력이 쌓여 있으면 (앞선 실행/화면의 수집분 포함) 모멘텀 지표 열을 붙인다
+        df_themes = attach_rank_features(results["themes"], get_rank_history().current_features())
+        tables["intersection"] = compute_intersection(
+            df_themes, results["risers"], results["trading_value"],
+            filters=filters, sort_keys=sort_keys,
+        )
+    for name, value in results.items():
+        if name == "risers":
+            tables[name] = pd.DataFrame(list(value.items()), columns=["code", "시장"])
+        elif name == "gainers":
+            tables["gainers_kospi"], tables["gainers_kosdaq"] = value
+        else:
+            tables[name] = value
+    return tables
+
+
+def write_table(df, path, fmt):
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_json(path, orient="records", force_ascii=False, indent=2)
+
+
+def _indicators(df, log):
+    from doragi.history import collect_indicators
+    from doragi.indicators import attach_indicators
+
+    t_start = time.time()
+    indicators = collect_indicators(list(df["code"]))
+    log(f"📉 기술적 지표 {len(indicators)}/{len(df)}종목 {time.time() - t_start:.2f}초")
+    return attach_indicators(df, indicators)
+
+
+def _screen(df, args, sort_keys, snapshot_id, log):
+    from doragi.intersection import sort_frame
+    from doragi.screening import BatchScreener, attach_scores
+
+    screener = BatchScreener(max_workers=args.screen_workers)
+    t_start = time.time()
+    results = screener.screen(df, args.screen_model, snapshot_id)
+    log(f"🤖 AI 스코어링 {len(df)}종목 {time.time() - t_start:.2f}초 (재시도 {screener.stats['retried']} / 실패 {screener.stats['failed']})")
+    return sort_frame(attach_scores(df, results), sort_keys)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m doragi", description="테마 × 상승률 × 거래대금 교집합 배치 수집")
+    parser.add_argument("--out", default="output", help="결과를 쓸 디렉터리 (기본: output)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS),
+                        help="수집할 데이터셋 (기본: 전부)")
+    parser.add_argument("--risers-top-n", type=int, default=UNIVERSE["risers_top_n"], help="시장별 상승률 상위 N 까지 수집")
+    parser.add_argument("--trading-top-n", type=int, default=UNIVERSE["trading_value_top_n"], help="시장별 거래대금 상위 N 까지 수집")
+    parser.add_argument("--stop-below-change", type=float, default=UNIVERSE["risers_min_change"], help="상승률 수집: 등락률(%%)이 이 밑이면 그만 받음")
+    parser.add_argument("--stop-below-trading-value", type=float, default=UNIVERSE["trading_value_min"], help="거래대금 수집: 거래대금(억)이 이 밑이면 그만 받음")
+    parser.add_argument("--max-theme-rank", type=int, help="테마 순위 상한")
+    parser.add_argument("--min-change", type=float, help="최소 등락률 (%%)")
+    parser.add_argument("--min-market-cap", type=float, help="최소 시가총액 (억)")
+    parser.add_argument("--min-trading-value", type=float, help="최소 거래대금 (억)")
+    parser.add_argument("--min-theme-velocity", type=float, help="최소 테마 순위 상승 속도 (수집 회당 오른 순위, 순위 이력 필요)")
+    parser.add_argument("--min-stock-velocity", type=float, help="최소 종목 순위 상승 속도 (테마 내 순위 기준, 순위 이력 필요)")
+    parser.add_argument("--min-streak", type=int, help="최소 연속 포착 횟수 (순위 이력 필요)")
+    parser.add_argument("--sort", nargs="+", choices=list(SORT_OPTIONS), default=["테마순위"],
+                        help="정렬 기준 (앞에서부터 우선)")
+    parser.add_argument("--indicators", action="store_true", help="교집합 종목의 일봉을 받아 기술적 지표 열(MA/RSI/거래량배율/돌파)을 붙임")
+    parser.add_argument("--screen-model", help="교집합 종목 전체를 이 Gemini 모델로 AI 스코어링 (예: gemini-flash-latest)")
+    parser.add_argument("--screen-workers", type=int, default=4, help="AI 스코어링 동시 요청 수")
+    parser.add_argument("--metrics", help="단계별 성능 지표를 쓸 파일 (.prom 이면 Prometheus 텍스트, 그 밖은 JSON lines)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="진행 상황을 출력하지 않음")
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and not (importlib.util.find_spec("pyarrow") or importlib.util.find_spec("fastparquet")):
+        parser.error("parquet 출력에는 pyarrow (또는 fastparquet) 가 필요합니다.")
+    return args
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    log = (lambda msg: None) if args.quiet else (lambda msg: print(msg, file=sys.stderr, flush=True))
+
+    def on_progress(name, done, total):
+        if done == total: log(f"✅ {name} ({done}/{total})")
+
+    UNIVERSE.update({
+        "risers_top_n": args.risers_top_n, "trading_value_top_n": args.trading_top_n,
+        "risers_min_change": args.stop_below_change, "trading_value_min": args.stop_below_trading_value,
+    })
+    t_start = time.time()
+    results, errors = collect_all(args.datasets, on_progress=on_progress)
+    elapsed = time.time() - t_start
+    for name, error in errors.items():
+        log(f"⚠️ {name}: {error}")
+
+    filters = {
+        "max_theme_rank": args.max_theme_rank, "min_change": args.min_change,
+        "min_market_cap": args.min_market_cap, "min_trading_value": args.min_trading_value,
+        "min_theme_velocity": args.min_theme_velocity, "min_stock_velocity": args.min_stock_velocity,
+        "min_streak": args.min_streak,
+    }
+    sort_keys = [SORT_OPTIONS[label] for label in args.sort]
+    tables = build_tables(results, filters=filters, sort_keys=sort_keys)
+    if args.indicators and not tables.get("intersection", pd.DataFrame()).empty:
+        tables["intersection"] = _indicators(tables["intersection"], log)
+    if args.screen_model and not tables.get("intersection", pd.DataFrame()).empty:
+        tables["intersection"] = _screen(tables["intersection"], args, sort_keys, int(t_start), log)
+
+    os.makedirs(args.out, exist_ok=True)
+    files = {}
+    for name, df in tables.items():
+        path = os.path.join(args.out, f"{name}.{args.format}")
+        write_table(df, path, args.format)
+        files[name] = {"path": path, "rows": len(df)}
+        log(f"💾 {path} ({len(df)}행)")
+
+    manifest = {
+        "collected_at": datetime.now().isoformat(timespec="seconds"),
+        "elapsed": round(elapsed, 3),
+        "universe": dict(UNIVERSE), "filters": filters, "sort": args.sort,
+        "files": files, "errors": errors,
+    }
+    with open(os.path.join(args.out, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    log(f"🕒 수집 {elapsed:.2f}초")
+    if args.metrics:
+        metrics = get_metrics()
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(metrics.to_prometheus() if args.metrics.endswith(".prom") else metrics.to_jsonl())
+        log(f"📈 {args.metrics}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""네이버 금융 수집기와 데이터셋 목록.
+
+수집기는 모두 (snapshot_id, on_progress=None) 을 받는다. on_progress(done, total) 는 선택이며,
+화면(주식.py)과 배치(python -m doragi)가 같은 함수를 그대로 쓴다.
+"""
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from doragi.cache import TtlCache
+from doragi.columnar import compact, memory_bytes
+from doragi.http_client import crawl_pages, get_headers, get_http_client
+from doragi.intersection import add_theme_numeric_columns, build_trading_value_frame, parse_number
+from doragi.metrics import count_rows, get_metrics
+from doragi.pages import current_snapshot_id, get_snapshot_pages
+from doragi.rank_history import get_rank_history
+from doragi.ratelimit import CircuitOpenError, get_rate_limiter
+from doragi.refresher import SnapshotRefresher
+
+
+NAVER_FINANCE_HOST = "finance.naver.com"
+
+
+def _record_error(dataset, e):
+    """수집 중 난 예외를 지표로 남긴다. (페이지 하나가 실패해도 수집은 계속되므로 조용히 비는 일이 없도록)"""
+    get_metrics().inc("collector_errors_total", dataset=dataset, error=type(e).__name__)
+
+
+# --- [테마 상세 델타 갱신: 목록 페이지에서 순위/등락률/등락현황이 바뀐 테마만 다시 받는다] ---
+THEME_DETAIL_MAX_AGE = 1800  # 그대로인 테마도 이 시간(초)이 지나면 다시 받는다 (구성 종목 현재가가 너무 낡지 않게)
+
+
+class ThemeDetailCache:
+    """테마 링크 -> (서명, 구성 종목, 받은 시각). 서명은 (순위, 등락률, 등락현황)."""
+
+    def __init__(self, max_age=THEME_DETAIL_MAX_AGE):
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(rank, theme):
+        return (rank, theme.get("등락률"), theme.get("등락현황"))
+
+    def split(self, theme_links, now=None):
+        """-> (그대로 쓸 {link: stocks}, 다시 받을 링크 목록)"""
+        now = now or time.time()
+        reuse, stale = {}, []
+        with self._lock:
+            for rank, theme in enumerate(theme_links, 1):
+                entry = self._entries.get(theme["link"])
+                if entry and entry[0] == self.signature(rank, theme) and now - entry[2] < self.max_age:
+                    reuse[theme["link"]] = entry[1]
+                else:
+                    stale.append(theme["link"])
+        return reuse, stale
+
+    def update(self, theme_links, fetched, now=None):
+        now = now or time.time()
+        links = {theme["link"]: (rank, theme) for rank, theme in enumerate(theme_links, 1)}
+        with self._lock:
+            for link, stocks in fetched.items():
+                if stocks is not None:
+                    rank, theme = links[link]
+                    self._entries[link] = (self.signature(rank, theme), stocks, now)
+            # 상위 50 에서 빠진 테마는 잊는다
+            for link in [link for link in self._entries if link not in links]:
+                del self._entries[link]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def get_theme_detail_cache():
+    return ThemeDetailCache()
+
+
+# --- [데이터 수집 1: 테마 상위 50개 (헤더 강화)] ---
+def get_top_50_themes_stocks(snapshot_id, on_progress=None):
+    url = "https://finance.naver.com/sise/theme.naver"
+    all_theme_stocks = []
+    pages = get_snapshot_pages()
+    details = get_theme_detail_cache()
+
+    theme_links = pages.get_rows(url, snapshot_id, "theme_list")
+    reuse, stale = details.split(theme_links)
+
+    t_start = time.time()
+    fetched, crawl_stats = crawl_pages(stale, lambda res: pages.parse("theme_stocks", res.content), on_progress=on_progress)
+    if crawl_stats["failed"]:
+        get_metrics().inc("collector_errors_total", crawl_stats["failed"], dataset="themes", error="page")
+    crawl_stats["elapsed"] = time.time() - t_start
+    crawl_stats["reused"] = len(reuse)
+    get_metrics().inc("theme_details_total", len(reuse), result="reused")
+    get_metrics().inc("theme_details_total", len(stale), result="fetched")
+
+    fetched = dict(zip(stale, fetched))
+    details.update(theme_links, fetched)
+    theme_pages = [reuse.get(t['link'], fetched.get(t['link'])) for t in theme_links]
+
+    for idx, (theme, stocks) in enumerate(zip(theme_links, theme_pages)):
+        for inner_rank, stock in enumerate(stocks or [], 1):
+            rank_display = f"👑 {inner_rank}위" if inner_rank == 1 else f"{inner_rank}위"
+            all_theme_stocks.append({
+                "code": stock["code"], "종목명": stock["종목명"], "테마명": theme['name'],
+                "테마순위": f"{idx+1}위", "테마순위_int": idx+1,
+                "테마내순위": rank_display,
+                "현재가(등락률)": stock["현재가(등락률)"]
+            })
+
+    df = add_theme_numeric_columns(pd.DataFrame(all_theme_stocks))
+    df.attrs["crawl_stats"] = crawl_stats
+    return df
+
+
+# --- [순위 페이지: 시장별로 행을 순위 순서대로 흘려 보내고, 필요한 페이지만 받는다] ---
+MARKETS = [(0, "KOSPI"), (1, "KOSDAQ")]
+MARKET_SUM_PAGE_SIZE = 50   # sise_market_sum 한 페이지의 종목 수
+RANKING_MAX_PAGES = 40      # 페이지 수 상한 (시장 전체를 넘지 않게)
+
+def _env_number(name, cast, default=None):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+
+# 수집 범위 (시장별). 배포 시점 설정이다: 화면은 환경 변수 값을 그대로 쓰고, CLI 는 인자로 덮어쓴다.
+# (실행 중에 바꾸면 갱신기와 모든 세션, 저장소를 같이 쓰는 레플리카의 수집 범위가 어긋나므로 세션에서 바꾸지 않는다)
+UNIVERSE = {
+    "risers_top_n": _env_number("DORAGI_RISERS_TOP_N", int, 250),             # 상승률 상위 N (코스피+코스닥 합쳐 최대 2N)
+    "risers_min_change": _env_number("DORAGI_RISERS_MIN_CHANGE", float),      # 등락률(%)이 이 밑으로 내려가면 그만 받는다
+    "trading_value_top_n": _env_number("DORAGI_TRADING_TOP_N", int, 250),     # 거래대금 상위 N
+    "trading_value_min": _env_number("DORAGI_TRADING_VALUE_MIN", float),      # 거래대금(억)이 이 밑으로 내려가면 그만 받는다
+}
+
+
+def _paged_url(base, page_param=True):
+    """1페이지는 page 인자 없는 주소를 그대로 써서 다른 수집기와 같은 URL(=같은 공유 페이지)이 되게 한다."""
+    return lambda page: base if page == 1 or not page_param else f"{base}&page={page}"
+
+
+def iter_ranked_rows(kind, page_url, snapshot_id, top_n, page_size=None, stop=None, on_page=None):
+    """순위 페이지 행을 top_n 개까지 순서대로. stop(row) 가 참이면 (그 뒤는 전부 기준 미달이므로) 멈춘다.
+
+    필요한 페이지 수만큼을 동시에 받는다. page_size 를 모르면 1페이지를 먼저 받아서 그 행 수와
+    '맨뒤' 링크(마지막 페이지)로 정한다. (1페이지는 공유 페이지라 다시 받지 않는다)
+    1페이지의 마지막 행이 이미 stop 에 걸리면 다음 페이지는 받지 않는다.
+    """
+    pages = get_snapshot_pages()
+    last_page = RANKING_MAX_PAGES
+    if not page_size:
+        first = pages.get_rows(page_url(1), snapshot_id, kind)
+        page_size = len(first) or 1
+        if first and stop and stop(first[-1]):
+            last_page = 1
+        else:
+            last_page = pages.get_rows(page_url(1), snapshot_id, "last_page")
+    max_pages = min(RANKING_MAX_PAGES, last_page, -(-top_n // page_size))
+    rows = pages.iter_rows(page_url, snapshot_id, kind, max_pages, window=max_pages, on_page=on_page)
+    try:
+        for n, row in enumerate(rows):
+            if n >= top_n or (stop and stop(row)):
+                break
+            yield row
+    finally:
+        rows.close()
+
+
+def _for_each_market(collect, on_progress=None):
+    """collect(sosok, market_name) 을 시장별로 동시에 실행한다. -> MARKETS 순서의 결과 목록"""
+    done = []
+    lock = threading.Lock()
+
+    def run(market):
+        result = collect(*market)
+        with lock:
+            done.append(market)
+            if on_progress: on_progress(len(done), len(MARKETS))
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(MARKETS), thread_name_prefix="market") as executor:
+        return list(executor.map(run, MARKETS))
+
+
+def _riser_stop(min_change):
+    if min_change is None:
+        return None
+    return lambda row: (parse_number(row["등락률"]) or 0) < min_change
+
+
+def _riser_url(sosok):
+    return _paged_url(f"https://finance.naver.com/sise/sise_rise.naver?sosok={sosok}")
+
+
+# --- [데이터 수집 2: 상승률 상위 (헤더 강화)] ---
+def get_risers_data_with_market(snapshot_id, on_progress=None, top_n=None, min_change=None):
+    """시장별 상승률 상위 top_n 종목의 code -> 시장"""
+    top_n = top_n or UNIVERSE["risers_top_n"]
+    min_change = min_change if min_change is not None else UNIVERSE["risers_min_change"]
+
+    def collect(s, market_name):
+        codes = []
+        try:
+            for row in iter_ranked_rows("riser_rows", _riser_url(s), snapshot_id, top_n, stop=_riser_stop(min_change)):
+                if row["code"]:
+                    codes.append(row["code"])
+        except Exception as e:
+            _record_error("risers", e)
+        return market_name, codes
+
+    riser_map = {}
+    for market_name, codes in _for_each_market(collect, on_progress):
+        for code in codes:
+            riser_map[code] = market_name
+    return riser_map
+
+
+# --- [데이터 수집 3: 급등주 DF (헤더 강화)] ---
+def get_top_gainers_df(snapshot_id, limit=150, on_progress=None):
+    # [공유] 상승률 페이지는 get_risers_data_with_market 와 같은 문서를 읽는다
+    def collect(s, market_name):
+        gainers = []
+        try:
+            for row in iter_ranked_rows("riser_rows", _riser_url(s), snapshot_id, limit):
+                gainers.append({"종목명": row["종목명"], "현재가": row["현재가"], "등락률": row["등락률"]})
+        except Exception as e:
+            _record_error("gainers", e)
+        return pd.DataFrame(gainers)
+
+    kospi_gainers, kosdaq_gainers = _for_each_market(collect, on_progress)
+    return kospi_gainers, kosdaq_gainers
+
+
+# --- [데이터 수집 4: 거래대금 상위 (헤더 강화)] ---
+def get_trading_value_df(snapshot_id, on_progress=None, top_n=None, min_value=None):
+    """시장별 거래대금 상위 top_n 종목의 code / 시장 / 시가총액(억) / 거래대금(억)"""
+    top_n = top_n or UNIVERSE["trading_value_top_n"]
+    min_value = min_value if min_value is not None else UNIVERSE["trading_value_min"]
+    stop = None
+    if min_value is not None:
+        stop = lambda row: (parse_number(row["현재가"]) or 0) * (parse_number(row["거래량"]) or 0) / 1e8 < min_value
+
+    def collect(s, market_name):
+        rows = []
+        try:
+            page_url = lambda page: f"https://finance.naver.com/sise/sise_market_sum.naver?sosok={s}&sort=amount&page={page}"
+            rows.extend(iter_ranked_rows("market_sum_rows", page_url, snapshot_id, top_n,
+                                         page_size=MARKET_SUM_PAGE_SIZE, stop=stop))
+        except Exception as e:
+            _record_error("trading_value", e)
+        return build_trading_value_frame(rows, market_name)
+
+    return pd.concat(_for_each_market(collect, on_progress), ignore_index=True).drop_duplicates("code")
+
+
+# --- [데이터 수집 5: 시가총액 상위 150] ---
+def get_market_cap_top150(snapshot_id, on_progress=None):
+    stocks = []
+    for page in range(1, 4):
+        try:
+            url = f"https://finance.naver.com/sise/sise_market_sum.naver?sosok=0&page={page}"
+            for row in get_snapshot_pages().get_rows(url, snapshot_id, "market_sum_rows"):
+                stocks.append({
+                    "순위": row["순위"], "종목명": row["종목명"],
+                    "현재가": row["현재가"], "등락률": row["등락률"],
+                    "시가총액": row["시가총액"]
+                })
+        except Exception as e:
+            _record_error("market_cap", e)
+        if on_progress: on_progress(page, 3)
+    return pd.DataFrame(stocks)
+
+
+# --- [종목 기본 지표: 코드별 TTL 캐시 + 교집합 종목 미리 받기] ---
+FUNDAMENTALS_TTL = 600
+FUNDAMENTALS_PREFETCH_WORKERS = 4
+EMPTY_FUNDAMENTALS = {"시가총액": "-", "PER": "-", "EPS": "-", "PBR": "-", "배당수익률": "-", "외국인소진율": "-"}
+
+
+def fetch_stock_fundamentals(code):
+    url = f"https://finance.naver.com/item/main.naver?code={code}"
+    # [수정] 위장 헤더 사용
+    res = get_http_client().get(url, headers=get_headers())
+    res.raise_for_status()
+    return get_snapshot_pages().parse("item_fundamentals", res.content)
+
+
+@functools.lru_cache(maxsize=None)
+def get_fundamentals_cache():
+    return TtlCache(fetch_stock_fundamentals, ttl=FUNDAMENTALS_TTL, max_workers=FUNDAMENTALS_PREFETCH_WORKERS, name="fundamentals")
+
+
+def get_stock_fundamentals(code):
+    try:
+        return get_fundamentals_cache().get(code)
+    except Exception:
+        return EMPTY_FUNDAMENTALS
+
+
+def peek_stock_fundamentals(code):
+    """이미 받아 둔 값만 (아직 받는 중이거나 실패했으면 EMPTY_FUNDAMENTALS). 네트워크를 기다리지 않음, 화면용"""
+    return get_fundamentals_cache().peek(code) or EMPTY_FUNDAMENTALS
+
+
+# --- [데이터셋 목록: 이름 -> (수집기, 갱신 주기 초)] ---
+# 주기가 같은 risers/gainers 는 같은 스냅샷 id 를 받아 sise_rise 페이지를 공유한다.
+DATASETS = {
+    "themes": (lambda sid, on_progress: get_top_50_themes_stocks(sid, on_progress), 600),
+    "risers": (lambda sid, on_progress: get_risers_data_with_market(sid, on_progress), 180),
+    "gainers": (lambda sid, on_progress: get_top_gainers_df(sid, limit=150, on_progress=on_progress), 180),
+    "trading_value": (lambda sid, on_progress: get_trading_value_df(sid, on_progress), 300),
+    "market_cap": (lambda sid, on_progress: get_market_cap_top150(sid, on_progress), 600),
+}
+# 수집이 끝난 스냅샷을 시계열로 남길 데이터셋 (수집을 직접 한 프로세스만 남기므로 레플리카끼리 겹치지 않는다)
+# collected_at 은 갱신기가 스냅샷 저장소에 남긴 것과 같은 시각
+DATASET_RECORDERS = {
+    "themes": lambda df, collected_at: get_rank_history().append(df, collected_at=collected_at),
+}
+
+
+def run_dataset(name, on_progress=None):
+    """DATASETS[name] 을 현재 스냅샷으로 한 번 수집하고 소요 시간/행 수/빈 결과/메모리를 기록한다.
+
+    결과는 모든 세션이 같이 읽으므로 작은 열 형식(doragi.columnar)으로 바꿔서 돌려준다.
+    네이버가 막고 있는 동안(회로 열림)은 요청 없이 실패하고, 수집 중에 막혔으면 일부만 채워진 결과를
+    버린다. 어느 쪽이든 갱신기는 마지막 정상 데이터를 그대로 보여 준다.
+    """
+    collect, interval = DATASETS[name]
+    metrics = get_metrics()
+    try:
+        _check_circuit()
+        with metrics.timer("collector_seconds", dataset=name):
+            value = collect(current_snapshot_id(interval), on_progress)
+        _check_circuit()
+    except Exception as e:
+        _record_error(name, e)
+        raise
+    value = compact(value)
+    rows = count_rows(value)
+    metrics.observe("collector_rows", rows, dataset=name)
+    metrics.observe("snapshot_bytes", memory_bytes(value), dataset=name)
+    if rows == 0:
+        metrics.inc("collector_empty_total", dataset=name)
+    return value
+
+
+def record_dataset(name, value, collected_at):
+    """DATASET_RECORDERS[name] 으로 수집 결과를 이력에 남긴다. (없는 데이터셋/빈 결과는 무시)
+
+    이력은 부가 기능이므로 남기다 실패해도 수집 결과는 그대로 쓴다.
+    """
+    if name not in DATASET_RECORDERS or count_rows(value) == 0:
+        return
+    metrics = get_metrics()
+    try:
+        with metrics.timer("history_append_seconds", dataset=name):
+            DATASET_RECORDERS[name](value, collected_at)
+    except Exception as e:
+        metrics.inc("history_errors_total", dataset=name, error=type(e).__name__)
+
+
+def _check_circuit():
+    if NAVER_FINANCE_HOST in get_rate_limiter().open_hosts():
+        raise CircuitOpenError(f"{NAVER_FINANCE_HOST} 차단 감지 - 마지막 정상 데이터를 유지합니다")
+
+
+def invalidate_dataset(name):
+    """name 의 현재 스냅샷 페이지를 버린다. 다음 수집은 (같은 갱신 구간이라도) 페이지를 새로 받는다."""
+    get_snapshot_pages().invalidate(current_snapshot_id(DATASETS[name][1]))
+
+
+def _dataset_job(name):
+    return lambda on_progress: run_dataset(name, on_progress)
+
+
+def _dataset_recorder(name):
+    if name in DATASET_RECORDERS:
+        return lambda value, collected_at: record_dataset(name, value, collected_at)
+    return None
+
+
+def build_refresher(store=None, names=None):
+    """DATASETS 를 등록한 SnapshotRefresher. (start() 는 호출하는 쪽에서)"""
+    refresher = SnapshotRefresher(store=store)
+    for name in names or DATASETS:
+        refresher.add_job(name, _dataset_job(name), DATASETS[name][1], record=_dataset_recorder(name))
+    return refresher
+
+
+def collect_all(names=None, on_progress=None, max_workers=len(DATASETS)):
+    """데이터셋들을 한 번씩 동시에 수집한다. -> (결과 dict, 오류 dict)
+
+    on_progress(name, done, total) 는 수집 스레드에서 호출된다.
+    """
+    names = list(names or DATASETS)
+    results, errors = {}, {}
+
+    def run(name):
+        report = (lambda done, total: on_progress(name, done, total)) if on_progress else None
+        value = run_dataset(name, report)
+        record_dataset(name, value, time.time())
+        return value
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collect") as executor:
+        futures = {executor.submit(run, name): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+    return results, errors
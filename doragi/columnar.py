@@ -0,0 +1,58 @@
+"""수집 결과를 모든 세션이 같이 읽는 작은 열 형식으로 바꾼다.
+
+테마 DataFrame 은 행마다 같은 테마명/테마순위/테마내순위 문자열을 되풀이한다. 값 종류가 행 수에 비해
+적은 문자열 열은 category(사전 + 정수 코드)로 바꾸고, 정수 열은 값 범위에 맞는 가장 작은 정수형으로 줄인다.
+갱신기(SnapshotRefresher)는 데이터셋마다 이 객체 하나를 모든 세션에 그대로 넘기므로 (세션별 복사 없음)
+읽는 쪽은 값을 고치지 말고 필터/열 추가처럼 새 DataFrame 을 만드는 연산만 쓴다.
+"""
+import sys
+
+import pandas as pd
+
+CATEGORY_MAX_RATIO = 0.5    # 값 종류가 행 수의 이 비율 이하인 문자열 열만 category 로 바꾼다
+
+
+def _is_text(series):
+    # pandas 2 는 object, pandas 3 부터는 str 열
+    return not isinstance(series.dtype, pd.CategoricalDtype) and (
+        series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+    )
+
+
+def compact_frame(df, max_ratio=CATEGORY_MAX_RATIO):
+    """문자열 열은 category, 정수 열은 작은 정수형으로 바꾼 사본. (attrs 유지)"""
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if _is_text(series) and len(series) and series.nunique(dropna=False) <= len(series) * max_ratio:
+            series = series.astype("category")
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            series = pd.to_numeric(series, downcast="integer")
+        out[col] = series
+    compact = pd.DataFrame(out, index=df.index)
+    compact.attrs.update(df.attrs)
+    return compact
+
+
+def compact(value):
+    """DataFrame 은 compact_frame, 튜플/딕셔너리는 안쪽까지. 그 밖의 값은 그대로."""
+    if isinstance(value, pd.DataFrame):
+        return compact_frame(value)
+    if isinstance(value, tuple):
+        return tuple(compact(v) for v in value)
+    if isinstance(value, dict):
+        return {k: compact(v) for k, v in value.items()}
+    return value
+
+
+def memory_bytes(value):
+    """스냅샷 하나가 차지하는 메모리 (문자열 내용까지 포함한 근사치)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, tuple):
+        return sum(memory_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + memory_bytes(v) for k, v in value.items())
+    if isinstance(value, (set, frozenset, list)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    return sys.getsizeof(value)
@@ -0,0 +1,157 @@
+"""종목별 일봉/주봉(OHLCV) 수집과 로컬 증분 저장소.
+
+네이버 siseJson 에서 봉을 받아 SQLite(ohlcv 표)에 쌓는다. 한 번 받은 종목은 저장된 마지막 봉 날짜부터만
+다시 받는다. (마지막 봉은 장중에 계속 바뀌므로 덮어쓴다) 그래서 같은 종목을 다시 보거나 다음 날 다시
+열어도 새로 생긴 봉만 받는다.
+
+get_ohlcv_cache() 는 (code, timeframe) -> 최근 HISTORY_BARS 개 봉 DataFrame 을 HISTORY_TTL 동안 기억하는
+TtlCache 이다. 교집합 후보 전체를 prefetch 해 두면 지표 계산/차트/AI 프롬프트가 같은 값을 나눠 쓴다.
+"""
+import functools
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from doragi.cache import TtlCache
+from doragi.http_client import get_headers, get_http_client
+from doragi.indicators import compute_indicators
+from doragi.snapshot_store import DEFAULT_DATA_DIR
+
+OHLCV_URL = "https://api.finance.naver.com/siseJson.naver?symbol={code}&requestType=1&startTime={start}&endTime={end}&timeframe={timeframe}"
+OHLCV_COLUMNS = ["날짜", "시가", "고가", "저가", "종가", "거래량"]
+TIMEFRAMES = ("day", "week")
+HISTORY_LOOKBACK_DAYS = {"day": 400, "week": 3 * 365}  # 처음 받을 때의 기간
+HISTORY_BARS = 250          # 캐시/지표/차트에 쓸 최근 봉 수
+HISTORY_TTL = 300           # 같은 종목을 다시 묻지 않을 시간 (초)
+HISTORY_PREFETCH_WORKERS = 4
+DEFAULT_OHLCV_PATH = os.path.join(DEFAULT_DATA_DIR, "ohlcv.sqlite3")
+
+# ["20240102", 78200, 79800, 78200, 79600, 17142847, 53.2]
+_ROW_RE = re.compile(r'\[\s*["\'](\d{8})["\']\s*,\s*([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)')
+
+
+def parse_sise_json(text):
+    """siseJson 응답 -> [(날짜, 시가, 고가, 저가, 종가, 거래량)] (날짜 오름차순, 날짜는 'YYYYMMDD')"""
+    return [
+        (date, float(o), float(h), float(l), float(c), float(v))
+        for date, o, h, l, c, v in _ROW_RE.findall(text)
+    ]
+
+
+class OhlcvStore:
+    """(code, timeframe, 날짜) 한 행에 봉 하나. 여러 스레드/프로세스에서 써도 된다."""
+
+    def __init__(self, path=DEFAULT_OHLCV_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ohlcv ("
+                " code TEXT NOT NULL, timeframe TEXT NOT NULL, date TEXT NOT NULL,"
+                " open REAL, high REAL, low REAL, close REAL, volume REAL,"
+                " PRIMARY KEY (code, timeframe, date))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def last_date(self, code, timeframe):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT MAX(date) FROM ohlcv WHERE code = ? AND timeframe = ?", (code, timeframe)
+            ).fetchone()
+        return row[0]
+
+    def append(self, code, timeframe, bars):
+        """같은 날짜의 봉은 덮어쓴다. -> 넣은 봉 수"""
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ohlcv (code, timeframe, date, open, high, low, close, volume)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(code, timeframe, *bar) for bar in bars],
+            )
+        return len(bars)
+
+    def load(self, code, timeframe, limit=HISTORY_BARS):
+        """최근 limit 개 봉 (날짜 오름차순). 날짜 열은 datetime."""
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT date, open, high, low, close, volume FROM ohlcv WHERE code = ? AND timeframe = ?"
+                " ORDER BY date DESC LIMIT ?", (code, timeframe, limit),
+            ).fetchall()
+        df = pd.DataFrame(rows[::-1], columns=OHLCV_COLUMNS)
+        df["날짜"] = pd.to_datetime(df["날짜"], format="%Y%m%d")
+        return df
+
+
+@functools.lru_cache(maxsize=None)
+def get_ohlcv_store():
+    return OhlcvStore()
+
+
+def update_ohlcv(code, timeframe="day", store=None, today=None):
+    """저장된 마지막 봉부터 오늘까지만 받아 저장소에 더한다. -> 새로 받은 봉 수"""
+    store = store or get_ohlcv_store()
+    today = today or datetime.now()
+    last = store.last_date(code, timeframe)
+    start = last or (today - timedelta(days=HISTORY_LOOKBACK_DAYS[timeframe])).strftime("%Y%m%d")
+    url = OHLCV_URL.format(code=code, start=start, end=today.strftime("%Y%m%d"), timeframe=timeframe)
+    res = get_http_client().get(url, headers=get_headers(), revalidate=False)
+    res.raise_for_status()
+    return store.append(code, timeframe, parse_sise_json(res.text))
+
+
+def fetch_ohlcv(key):
+    code, timeframe = key
+    update_ohlcv(code, timeframe)
+    return get_ohlcv_store().load(code, timeframe)
+
+
+@functools.lru_cache(maxsize=None)
+def get_ohlcv_cache():
+    return TtlCache(fetch_ohlcv, ttl=HISTORY_TTL, max_workers=HISTORY_PREFETCH_WORKERS, name="ohlcv")
+
+
+def get_ohlcv(code, timeframe="day"):
+    """실패하면 저장소에 이미 있는 봉만 (없으면 빈 DataFrame)."""
+    try:
+        return get_ohlcv_cache().get((code, timeframe))
+    except Exception:
+        return get_ohlcv_store().load(code, timeframe)
+
+
+def peek_ohlcv(code, timeframe="day"):
+    """이미 받아 둔 봉만 (아직 받는 중이거나 실패했으면 None). 네트워크를 기다리지 않음, 화면 차트용"""
+    return get_ohlcv_cache().peek((code, timeframe))
+
+
+def peek_indicators(codes, timeframe="day"):
+    """이미 받아 둔 종목만으로 지표를 계산한다. (네트워크를 기다리지 않음, 화면 표용)"""
+    cache = get_ohlcv_cache()
+    return compute_indicators({code: cache.peek((code, timeframe)) for code in codes})
+
+
+def collect_indicators(codes, timeframe="day"):
+    """codes 전체의 봉을 (동시에) 받아 지표를 계산한다. (배치/CLI 용)"""
+    get_ohlcv_cache().prefetch([(code, timeframe) for code in codes])
+    return compute_indicators({code: get_ohlcv(code, timeframe) for code in codes})
+
+
+def get_indicator_row(code, timeframe="day"):
+    """한 종목의 지표 행 (봉이 없으면 None). 화면의 상세 분석과 AI 스코어링이 같은 값을 쓴다."""
+    indicators = compute_indicators({code: get_ohlcv(code, timeframe)})
+    return indicators.loc[code] if code in indicators.index else None
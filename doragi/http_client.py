@@ -0,0 +1,189 @@
+"""모든 수집기가 공유하는 HTTP 클라이언트와 병렬 페이지 수집 엔진."""
+import functools
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from doragi.metrics import get_metrics
+from doragi.ratelimit import BlockedPageError, get_rate_limiter, is_block_page
+
+# --- [공통] HTTP 클라이언트 (커넥션 풀 + 타임아웃 + 재시도 + 조건부 GET) ---
+HTTP_CONNECT_TIMEOUT = 3.05     # 초
+HTTP_READ_TIMEOUT = 10          # 초
+HTTP_POOL_SIZE = 16             # 호스트당 유지할 keep-alive 커넥션 수
+HTTP_MAX_RETRIES = 3
+HTTP_RETRY_BACKOFF = 0.3        # 0.3, 0.6, 1.2초 ...
+HTTP_VALIDATOR_CACHE_SIZE = 512 # ETag/Last-Modified 를 기억할 URL 수
+
+# --- [공통] 병렬 페이지 수집 엔진 ---
+CRAWL_MAX_WORKERS = 8       # 전체 동시 요청 수
+CRAWL_PER_HOST_LIMIT = 4    # 호스트당 동시 요청 수 (봇 탐지 회피)
+
+
+# --- [공통] 사람처럼 보이기 위한 강력한 헤더 ---
+def get_headers():
+    return {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Referer': 'https://finance.naver.com/',
+        'Connection': 'keep-alive'
+    }
+
+
+def is_throttle_error(e):
+    """읽기 타임아웃(재시도 끝에 난 것 포함)만 호스트가 느려졌다는 신호로 본다. DNS 실패/연결 거부는 아님."""
+    if isinstance(e, (requests.ReadTimeout, requests.exceptions.RetryError)):
+        return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, ReadTimeoutError)
+
+
+def retry_count(res):
+    retries = getattr(res.raw, "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+class HttpClient:
+    """모든 수집기가 공유하는 HTTP 클라이언트.
+
+    requests.Session 하나로 호스트별 커넥션 풀과 TLS 세션을 재사용하고, 모든 요청에
+    connect/read 타임아웃과 백오프 재시도를 건다. ETag/Last-Modified 를 준 페이지는
+    다음 요청 때 조건부 GET 으로 재검증해서 304 가 오면 기억해 둔 응답을 그대로 돌려준다.
+    요청 속도는 호스트별 limiter(doragi.ratelimit) 가 응답 상태를 보고 조절한다.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES,
+                 timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), validator_cache_size=HTTP_VALIDATOR_CACHE_SIZE,
+                 limiter=None):
+        retry = Retry(
+            total=max_retries, connect=max_retries, read=max_retries,
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = timeout
+        self.limiter = limiter or get_rate_limiter()
+        self.validator_cache_size = validator_cache_size
+        self._validated = OrderedDict()  # url -> 마지막 200 응답
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "retried": 0}
+
+    def get(self, url, headers=None, timeout=None, revalidate=True, stream=False):
+        """stream=True 면 본문을 미리 읽지 않는다. (iter_content 로 읽고 close 할 것, 재검증 대상 아님)
+
+        호스트 회로가 열려 있으면 CircuitOpenError, 200 인데 차단 안내 페이지면 BlockedPageError.
+        """
+        req_headers = dict(headers or {})
+        cached = None
+        revalidate = revalidate and not stream
+        if revalidate:
+            with self._lock:
+                cached = self._validated.get(url)
+            if cached is not None:
+                if cached.headers.get("ETag"):
+                    req_headers["If-None-Match"] = cached.headers["ETag"]
+                if cached.headers.get("Last-Modified"):
+                    req_headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        host = urllib.parse.urlsplit(url).netloc
+        probe = self.limiter.acquire(host)
+        t_start = time.perf_counter()
+        try:
+            res = self.session.get(url, headers=req_headers, timeout=timeout or self.timeout, stream=stream)
+        except requests.RequestException as e:
+            get_metrics().inc("http_requests_total", host=host, status=type(e).__name__)
+            if is_throttle_error(e):
+                self.limiter.on_throttle(host, type(e).__name__, probe=probe)
+            else:
+                self.limiter.on_error(host, type(e).__name__, probe=probe)
+            raise
+        # stream=True 면 헤더까지의 시간만 (본문은 호출한 쪽이 읽는다)
+        metrics = get_metrics()
+        metrics.observe("http_request_seconds", time.perf_counter() - t_start, host=host)
+        metrics.inc("http_requests_total", host=host, status=res.status_code)
+        if not stream:
+            metrics.observe("http_response_bytes", len(res.content), host=host)
+
+        # 재시도 끝에 받은 응답도 "그 사이 막혔다" 는 신호로 본다
+        if res.status_code == 429 or res.status_code >= 500:
+            self.limiter.on_throttle(host, str(res.status_code), probe=probe)
+        elif not stream and res.status_code == 200 and is_block_page(res):
+            self.limiter.on_throttle(host, "block_page", probe=probe)
+            raise BlockedPageError(f"{host} 차단 안내 페이지를 받았습니다: {url}")
+        elif retry_count(res):
+            self.limiter.on_throttle(host, "retried", probe=probe)
+        else:
+            self.limiter.on_success(host, probe=probe)
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["retried"] += retry_count(res)
+            if res.status_code == 304 and cached is not None:
+                self.stats["not_modified"] += 1
+                self._validated.move_to_end(url)
+                return cached
+            if revalidate and res.status_code == 200 and ("ETag" in res.headers or "Last-Modified" in res.headers):
+                self._validated[url] = res
+                self._validated.move_to_end(url)
+                while len(self._validated) > self.validator_cache_size:
+                    self._validated.popitem(last=False)
+        return res
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_client():
+    """프로세스당 하나. (Streamlit 의 rerun 사이에도 모듈은 다시 import 되지 않으므로 그대로 유지된다)"""
+    return HttpClient()
+
+
+def crawl_pages(urls, parse_fn, max_workers=CRAWL_MAX_WORKERS, per_host_limit=CRAWL_PER_HOST_LIMIT,
+                on_progress=None, client=None):
+    """urls 를 병렬로 받아 parse_fn(res) 결과를 입력 순서대로 돌려준다. (실패한 페이지는 None)
+
+    재시도/타임아웃은 client 가 맡고, 여기서는 동시성 제한과 집계만 한다.
+    on_progress(done, total) 는 호출한 스레드에서 실행된다.
+    """
+    client = client or get_http_client()
+    results = [None] * len(urls)
+    stats = {"fetched": 0, "failed": 0, "retried": 0}
+    stats_lock = threading.Lock()
+    host_limits = {}
+    for url in urls:
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in host_limits:
+            host_limits[host] = threading.Semaphore(per_host_limit)
+
+    def fetch(url):
+        with host_limits[urllib.parse.urlsplit(url).netloc]:
+            res = client.get(url, headers=get_headers())
+        with stats_lock:
+            stats["retried"] += retry_count(res)
+        res.raise_for_status()
+        return parse_fn(res)
+
+    if not urls:
+        return results, stats
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        futures = {executor.submit(fetch, url): i for i, url in enumerate(urls)}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                results[futures[future]] = future.result()
+                stats["fetched"] += 1
+            except Exception:
+                stats["failed"] += 1
+            if on_progress: on_progress(done, len(urls))
+    return results, stats
@@ -0,0 +1,108 @@
+"""교집합 후보 전체의 기술적 지표를 한 번에 계산한다.
+
+종목별 OHLCV 를 (종목 수, 봉 수) 행렬로 쌓아서(최근 봉에 맞춰 오른쪽 정렬, 모자란 앞쪽은 NaN) 이동평균/
+거래량 배율/돌파 여부를 종목 축으로 한꺼번에 계산한다. 재귀식인 RSI 도 시간 축으로만 돌고 종목 축은 벡터 연산이다.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+MA_WINDOWS = (5, 20, 60)
+RSI_PERIOD = 14
+VOLUME_WINDOW = 20          # 거래량 배율: 오늘 거래량 / 직전 20봉 평균
+BREAKOUT_WINDOW = 20        # 돌파: 오늘 종가 > 직전 20봉 고가
+
+RSI_COL = "RSI14"
+VOLUME_RATIO_COL = "거래량배율"
+BREAKOUT_COL = "20일돌파"
+ALIGNED_COL = "정배열"
+INDICATOR_COLUMNS = [f"MA{w}" for w in MA_WINDOWS] + [RSI_COL, VOLUME_RATIO_COL, BREAKOUT_COL, ALIGNED_COL]
+
+
+def _stack(frames, column, length):
+    """[DataFrame] -> (len(frames), length) 행렬. 최근 봉이 마지막 열, 모자란 앞쪽은 NaN."""
+    out = np.full((len(frames), length), np.nan)
+    for i, df in enumerate(frames):
+        values = df[column].to_numpy(dtype=float)[-length:]
+        if len(values):
+            out[i, -len(values):] = values
+    return out
+
+
+def rolling_mean(x, window):
+    """행마다 window 봉 이동평균. (n, T-window+1), 창에 NaN 이 있으면 NaN."""
+    if x.shape[1] < window:
+        return np.full((x.shape[0], 1), np.nan)
+    return sliding_window_view(x, window, axis=1).mean(axis=2)
+
+
+def wilder_rsi(close, period=RSI_PERIOD):
+    """행마다 마지막 봉의 RSI (Wilder 평활). 변화가 period 개보다 적으면 NaN.
+
+    처음 period 개 변화의 단순 평균으로 시작하고, 그 뒤로는 avg = (avg * (period - 1) + 이번 값) / period.
+    """
+    diff = np.diff(close, axis=1)
+    gain, loss = np.clip(diff, 0, None), np.clip(-diff, 0, None)
+    seen = np.cumsum(~np.isnan(diff), axis=1)  # 행마다 지금까지의 변화 수 (앞쪽 NaN 은 세지 않음)
+    avg_gain = np.full(close.shape[0], np.nan)
+    avg_loss = np.full(close.shape[0], np.nan)
+    for t in range(period - 1, diff.shape[1]):
+        seed = seen[:, t] == period
+        if seed.any():
+            avg_gain[seed] = gain[seed, t - period + 1:t + 1].mean(axis=1)
+            avg_loss[seed] = loss[seed, t - period + 1:t + 1].mean(axis=1)
+        step = seen[:, t] > period
+        avg_gain = np.where(step, avg_gain + (gain[:, t] - avg_gain) / period, avg_gain)
+        avg_loss = np.where(step, avg_loss + (loss[:, t] - avg_loss) / period, avg_loss)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), 100 - 100 / (1 + avg_gain / avg_loss))
+    rsi[np.isnan(avg_gain)] = np.nan
+    return rsi
+
+
+def compute_indicators(histories):
+    """{code: OHLCV DataFrame} -> code 를 index 로 한 지표 DataFrame (INDICATOR_COLUMNS)."""
+    codes = [code for code, df in histories.items() if df is not None and not df.empty]
+    if not codes:
+        return pd.DataFrame(columns=INDICATOR_COLUMNS, index=pd.Index([], name="code"))
+    frames = [histories[code] for code in codes]
+    length = max(len(df) for df in frames)
+    close = _stack(frames, "종가", length)
+    high = _stack(frames, "고가", length)
+    volume = _stack(frames, "거래량", length)
+
+    out = {f"MA{w}": rolling_mean(close, w)[:, -1] for w in MA_WINDOWS}
+    out[RSI_COL] = wilder_rsi(close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prev_volume = volume[:, -VOLUME_WINDOW - 1:-1]
+        enough = (~np.isnan(prev_volume)).sum(axis=1) == VOLUME_WINDOW
+        out[VOLUME_RATIO_COL] = np.where(enough, volume[:, -1] / prev_volume.mean(axis=1), np.nan)
+    prev_high = high[:, -BREAKOUT_WINDOW - 1:-1]
+    enough = (~np.isnan(prev_high)).sum(axis=1) == BREAKOUT_WINDOW
+    out[BREAKOUT_COL] = enough & (close[:, -1] > np.where(np.isnan(prev_high), -np.inf, prev_high).max(axis=1))
+    ma = [out[f"MA{w}"] for w in MA_WINDOWS]
+    out[ALIGNED_COL] = (ma[0] > ma[1]) & (ma[1] > ma[2])
+
+    df = pd.DataFrame(out, index=pd.Index(codes, name="code"))
+    return df[INDICATOR_COLUMNS].round({f"MA{w}": 1 for w in MA_WINDOWS} | {RSI_COL: 1, VOLUME_RATIO_COL: 2})
+
+
+def attach_indicators(df, indicators):
+    """df 에 code 기준으로 지표 열을 붙인다. (지표가 없는 종목은 빈 칸)"""
+    return df.merge(indicators, left_on="code", right_index=True, how="left")
+
+
+def describe_indicators(row):
+    """AI 프롬프트용 한 줄. row 는 compute_indicators 결과의 한 행 (없으면 빈 문자열)."""
+    if row is None or (pd.isna(row[RSI_COL]) and pd.isna(row["MA5"])):
+        return ""
+    parts = [" / ".join(f"MA{w} {row[f'MA{w}']:,.0f}" for w in MA_WINDOWS if not pd.isna(row[f"MA{w}"]))]
+    if not pd.isna(row[RSI_COL]):
+        parts.append(f"RSI(14) {row[RSI_COL]:.1f}")
+    if not pd.isna(row[VOLUME_RATIO_COL]):
+        parts.append(f"거래량 {VOLUME_WINDOW}일 평균 대비 {row[VOLUME_RATIO_COL]:.1f}배")
+    if row[BREAKOUT_COL]:
+        parts.append(f"{BREAKOUT_WINDOW}일 고가 돌파")
+    if row[ALIGNED_COL]:
+        parts.append("이동평균 정배열")
+    return " | ".join(p for p in parts if p)
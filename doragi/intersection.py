@@ -0,0 +1,132 @@
+"""3중 교집합(테마 × 상승률 × 거래대금) 필터와 정렬.
+
+문자열로 수집된 가격/등락률/시가총액/거래량은 수집 시점에 한 번만 숫자 열로 바꿔 두고,
+교집합은 isin/merge 로 한 번에 계산한다. 행 단위 파이썬 루프가 없으므로 테마/종목 수가
+늘어나도 필터 단계가 크게 느려지지 않는다.
+"""
+import re
+
+import pandas as pd
+
+# 테마 DataFrame 에 붙는 숫자 열 (기존 '테마순위_int' 와 같은 이름 규칙)
+PRICE_COL = "현재가_int"
+CHANGE_COL = "등락률_float"
+MARKET_CAP_COL = "시가총액_억"
+TRADING_VALUE_COL = "거래대금_억"
+AI_SCORE_COL = "AI점수"             # doragi.screening 이 붙이는 열 (없으면 정렬 기준에서 빠짐)
+THEME_VELOCITY_COL = "테마순위속도"   # doragi.rank_history 가 붙이는 열 (순위 이력이 없으면 필터/정렬에서 빠짐)
+STOCK_VELOCITY_COL = "종목순위속도"   # 같은 열, 종목의 테마 내 순위 기준
+STREAK_COL = "연속포착"
+
+DEFAULT_FILTERS = {
+    "max_theme_rank": None,     # 테마 순위 상한 (예: 20 -> 상위 20개 테마만)
+    "min_change": None,         # 최소 등락률 (%)
+    "min_market_cap": None,     # 최소 시가총액 (억)
+    "min_trading_value": None,  # 최소 거래대금 (억)
+    "min_theme_velocity": None, # 최소 테마 순위 속도 (스냅샷당 오른 순위, 이동평균)
+    "min_stock_velocity": None, # 최소 종목 순위 속도 (테마 내 순위 기준, 같은 단위)
+    "min_streak": None,         # 최소 연속 포착 (스냅샷 수)
+}
+# (열 이름, 오름차순 여부). 기본값은 기존 화면과 같은 '테마 순위' 순.
+DEFAULT_SORT = [("테마순위_int", True)]
+SORT_OPTIONS = {
+    "테마순위": ("테마순위_int", True),
+    "등락률": (CHANGE_COL, False),
+    "거래대금": (TRADING_VALUE_COL, False),
+    "시가총액": (MARKET_CAP_COL, False),
+    "AI점수": (AI_SCORE_COL, False),
+    "테마순위상승": (THEME_VELOCITY_COL, False),
+    "종목순위상승": (STOCK_VELOCITY_COL, False),
+    "연속포착": (STREAK_COL, False),
+}
+
+_THEME_PRICE_RE = r'^\s*([\d,]+)\s*\(\s*([-+]?[\d.,]+)\s*%'
+
+
+def to_number(series):
+    """'12,300' / '+5.20%' / ' 1,234 ' 같은 문자열 열을 float 열로. 못 읽는 값은 NaN."""
+    cleaned = series.astype(str).str.replace(r'[,%+\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def parse_number(text):
+    """to_number 의 값 하나짜리. '12,300' / '+5.20%' -> float, 못 읽으면 None."""
+    try:
+        return float(re.sub(r'[,%+\s]', '', str(text)))
+    except ValueError:
+        return None
+
+
+def add_theme_numeric_columns(df_themes):
+    """'현재가(등락률)' = '12,300 (+5.20%)' 를 현재가_int / 등락률_float 로 나눈다."""
+    df = df_themes.copy()
+    if df.empty or "현재가(등락률)" not in df:
+        df[PRICE_COL] = pd.Series(dtype="Int64")
+        df[CHANGE_COL] = pd.Series(dtype="float64")
+        return df
+    parts = df["현재가(등락률)"].astype(str).str.extract(_THEME_PRICE_RE)
+    df[PRICE_COL] = to_number(parts[0]).astype("Int64")
+    df[CHANGE_COL] = to_number(parts[1])
+    return df
+
+
+def build_trading_value_frame(rows, market):
+    """sise_market_sum(sort=amount) 행 목록 -> code 별 시가총액/거래대금 숫자 DataFrame."""
+    df = pd.DataFrame(rows, columns=["code", "종목명", "현재가", "등락률", "시가총액", "거래량"])
+    df = df[df["code"] != ""]
+    price = to_number(df["현재가"])
+    volume = to_number(df["거래량"])
+    return pd.DataFrame({
+        "code": df["code"].values,
+        "시장": market,
+        MARKET_CAP_COL: to_number(df["시가총액"]).values,
+        TRADING_VALUE_COL: (price * volume / 1e8).round(1).values,  # 현재가 × 거래량 (억)
+    })
+
+
+def compute_intersection(df_themes, riser_data, df_trading, filters=None, sort_keys=None):
+    """테마 종목 중 상승률 상위(riser_data: code -> 시장)와 거래대금 상위(df_trading)에 모두 든 종목.
+
+    같은 종목이 여러 테마에 있으면 가장 높은 순위 테마의 행 하나만 남긴다.
+    """
+    filters = {**DEFAULT_FILTERS, **(filters or {})}
+    sort_keys = sort_keys or DEFAULT_SORT
+    if df_themes.empty or not riser_data or df_trading.empty:
+        return pd.DataFrame(columns=list(df_themes.columns) + ["시장", MARKET_CAP_COL, TRADING_VALUE_COL])
+
+    df = df_themes if CHANGE_COL in df_themes else add_theme_numeric_columns(df_themes)
+    riser_market = pd.Series(riser_data, name="시장")
+    df = df[df["code"].isin(riser_market.index)]
+    df = df.merge(
+        df_trading[["code", MARKET_CAP_COL, TRADING_VALUE_COL]].drop_duplicates("code"),
+        on="code", how="inner",
+    )
+    df["시장"] = df["code"].map(riser_market)
+
+    mask = pd.Series(True, index=df.index)
+    if filters["max_theme_rank"] is not None:
+        mask &= df["테마순위_int"] <= filters["max_theme_rank"]
+    if filters["min_change"] is not None:
+        mask &= df[CHANGE_COL] >= filters["min_change"]
+    if filters["min_market_cap"] is not None:
+        mask &= df[MARKET_CAP_COL] >= filters["min_market_cap"]
+    if filters["min_trading_value"] is not None:
+        mask &= df[TRADING_VALUE_COL] >= filters["min_trading_value"]
+    if filters["min_theme_velocity"] is not None and THEME_VELOCITY_COL in df:
+        mask &= df[THEME_VELOCITY_COL] >= filters["min_theme_velocity"]
+    if filters["min_stock_velocity"] is not None and STOCK_VELOCITY_COL in df:
+        mask &= df[STOCK_VELOCITY_COL] >= filters["min_stock_velocity"]
+    if filters["min_streak"] is not None and STREAK_COL in df:
+        mask &= df[STREAK_COL] >= filters["min_streak"]
+    df = df[mask].drop_duplicates(["code"])
+    return sort_frame(df, sort_keys)
+
+
+def sort_frame(df, sort_keys=None):
+    """sort_keys 중 df 에 있는 열만으로 안정 정렬한다. (값이 없는 행은 맨 뒤)"""
+    sort_keys = [(col, asc) for col, asc in (sort_keys or DEFAULT_SORT) if col in df]
+    if not sort_keys:
+        return df.reset_index(drop=True)
+    by = [col for col, _ in sort_keys]
+    ascending = [asc for _, asc in sort_keys]
+    return df.sort_values(by=by, ascending=ascending, kind="mergesort", na_position="last").reset_index(drop=True)
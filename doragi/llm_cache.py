@@ -0,0 +1,113 @@
+"""완성된 LLM 응답 캐시 (SQLite, LRU + TTL).
+
+키는 (모델 이름, 데이터 스냅샷 id, 정규화한 프롬프트 해시) 이다. 응답은 받은 조각(chunk) 그대로
+저장했다가 같은 생성기 인터페이스로 다시 흘려 주므로 st.write_stream 쪽은 바꿀 필요가 없다.
+스트림이 중간에 예외로 끝난 응답은 저장하지 않는다.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from doragi.metrics import get_metrics
+from doragi.snapshot_store import DEFAULT_DATA_DIR
+
+DEFAULT_DB_PATH = os.path.join(DEFAULT_DATA_DIR, "llm_cache.sqlite3")
+LLM_CACHE_TTL = 6 * 3600
+LLM_CACHE_MAX_ENTRIES = 500
+
+
+def normalize_prompt(prompt):
+    """문자열/메시지 목록(dict, list) 모두 공백 차이를 없앤 JSON 문자열로."""
+    if isinstance(prompt, str):
+        return " ".join(prompt.split())
+    if isinstance(prompt, dict):
+        return "{" + ",".join(f"{json.dumps(k, ensure_ascii=False)}:{normalize_prompt(v)}" for k, v in sorted(prompt.items())) + "}"
+    if isinstance(prompt, (list, tuple)):
+        return "[" + ",".join(normalize_prompt(v) for v in prompt) + "]"
+    return json.dumps(prompt, ensure_ascii=False, default=str)
+
+
+def make_key(model_name, snapshot_id, prompt):
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{model_name}|{snapshot_id}|{digest}"
+
+
+class LlmResponseCache:
+    def __init__(self, path=DEFAULT_DB_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, snapshot_id TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_used_at REAL NOT NULL, chunks TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_lru ON llm_responses (last_used_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @property
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT chunks FROM llm_responses WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                get_metrics().inc("cache_requests_total", cache="llm", result="miss")
+                return None
+            conn.execute("UPDATE llm_responses SET last_used_at = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+            get_metrics().inc("cache_requests_total", cache="llm", result="hit")
+            return json.loads(row[0])
+
+    def put(self, key, model_name, snapshot_id, chunks):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, snapshot_id, created_at, last_used_at, chunks)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, str(snapshot_id), now, now, json.dumps(chunks, ensure_ascii=False)),
+            )
+            conn.execute("DELETE FROM llm_responses WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM llm_responses WHERE key NOT IN ("
+                " SELECT key FROM llm_responses ORDER BY last_used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def stream(self, model_name, snapshot_id, prompt, generate):
+        """캐시에 있으면 저장된 조각을 그대로, 없으면 generate() 를 흘려 보내면서 끝까지 받은 응답을 저장한다."""
+        key = make_key(model_name, snapshot_id, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            yield from cached
+            return
+        chunks = []
+        for chunk in generate():
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            self.put(key, model_name, snapshot_id, chunks)
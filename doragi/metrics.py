@@ -0,0 +1,155 @@
+"""수집/분석 단계별 성능 지표.
+
+카운터(inc)와 요약(observe: 건수/합/최소/최대/최근 값 + 최근 window 개의 p50/p95)만 있는 작은 레지스트리.
+모든 모듈이 get_metrics() 로 같은 인스턴스에 기록하고, 화면의 진단 패널과 CLI 가 JSON lines /
+Prometheus 텍스트 형식으로 내보낸다.
+
+지표 이름 (단위는 이름 끝에):
+- http_request_seconds / http_response_bytes / http_requests_total{host, status}
+- parse_seconds / parse_rows{kind}
+- cache_requests_total{cache, result=hit|miss}
+- collector_seconds / collector_rows{dataset}, collector_empty_total / collector_errors_total{dataset, error}
+- snapshot_bytes{dataset} (수집 결과가 메모리에서 차지하는 크기)
+- refresh_total{dataset, source=crawl|shared} (직접 수집 / 다른 레플리카 결과 사용)
+- llm_ttft_seconds / llm_total_seconds{model}
+- quote_poll_seconds, quote_errors_total{error}
+- history_append_seconds / history_errors_total{dataset, error} (테마 순위 이력 쌓기)
+- news_clusters / news_prompt_tokens (유사 기사를 묶은 수 / 프롬프트에 넣은 뉴스 토큰 어림값)
+- ratelimit_throttled_total{host, reason}, circuit_open_total{host}, ratelimit_errors_total{host, reason} (차단이 아닌 네트워크 실패)
+"""
+import functools
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+METRICS_WINDOW = 256        # 분위수를 계산할 최근 관측 수 (시리즈마다)
+QUANTILES = (0.5, 0.95)
+PROMETHEUS_PREFIX = "doragi_"
+
+_NAME_RE = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{_NAME_RE.sub("_", k)}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def count_rows(value):
+    """수집 결과의 행 수. (DataFrame / dict / list / 그 튜플)"""
+    if isinstance(value, tuple):
+        return sum(count_rows(v) for v in value)
+    try:
+        return len(value)
+    except TypeError:
+        return 0
+
+
+class MetricsRegistry:
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._series = {}  # (type, name, labels) -> dict
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = ("counter", name, _label_key(labels))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"value": 0, "updated_at": 0.0}
+            series["value"] += value
+            series["updated_at"] = time.time()
+
+    def observe(self, name, value, **labels):
+        key = ("summary", name, _label_key(labels))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "count": 0, "sum": 0.0, "min": value, "max": value, "last": value,
+                    "recent": deque(maxlen=self.window), "updated_at": 0.0,
+                }
+            series["count"] += 1
+            series["sum"] += value
+            series["min"] = min(series["min"], value)
+            series["max"] = max(series["max"], value)
+            series["last"] = value
+            series["recent"].append(value)
+            series["updated_at"] = time.time()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """with 블록의 소요 시간(초)을 observe 한다. (예외로 끝나도 기록)"""
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t_start, **labels)
+
+    def snapshot(self):
+        """시리즈마다 dict 하나. (이름, 라벨 순으로 정렬)"""
+        rows = []
+        with self._lock:
+            items = sorted(self._series.items(), key=lambda item: (item[0][1], item[0][2]))
+            for (kind, name, labels), series in items:
+                row = {"metric": name, "type": kind, "labels": dict(labels), "updated_at": series["updated_at"]}
+                if kind == "counter":
+                    row["value"] = series["value"]
+                else:
+                    recent = sorted(series["recent"])
+                    row.update({
+                        "count": series["count"], "sum": series["sum"], "avg": series["sum"] / series["count"],
+                        "min": series["min"], "max": series["max"], "last": series["last"],
+                        **{f"p{int(q * 100)}": _quantile(recent, q) for q in QUANTILES},
+                    })
+                rows.append(row)
+        return rows
+
+    def to_jsonl(self):
+        now = time.time()
+        return "".join(json.dumps({"ts": now, **row}, ensure_ascii=False) + "\n" for row in self.snapshot())
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        lines = []
+        typed = set()
+        for row in self.snapshot():
+            name = prefix + _NAME_RE.sub("_", row["metric"])
+            labels = sorted(row["labels"].items())
+            if name not in typed:
+                lines.append(f"# TYPE {name} {row['type']}")
+                typed.add(name)
+            if row["type"] == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {row['value']}")
+                continue
+            for q in QUANTILES:
+                lines.append(f"{name}{_format_labels(labels, [('quantile', str(q))])} {row[f'p{int(q * 100)}']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {row['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def get_metrics():
+    return MetricsRegistry()
@@ -0,0 +1,265 @@
+"""Google News RSS 수집기.
+
+RSS 는 응답을 받는 대로 XMLPullParser 로 흘려 넣어 <item> 하나가 끝날 때마다 처리한다.
+(문서 전체 트리도, 아이템마다 BeautifulSoup 도 만들지 않는다)
+NewsAggregator 는 여러 검색어를 동시에 받고, 검색어별 결과를 짧은 TTL 동안 기억하며,
+합칠 때 link 기준으로 중복을 없앤다.
+
+같은 기사를 여러 매체가 다른 URL 로 옮겨 실은 것은 select_news 가 제목+요약의 글자 3-gram MinHash 로
+묶어서 대표 기사 하나(출처 수 포함)만 남기고, 관련도/최신순으로 상위 K 개를 토큰 예산 안에서 고른다.
+"""
+import email.utils
+import functools
+import html
+import math
+import re
+import urllib.parse
+import xml.etree.ElementTree as ET
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from doragi.cache import TtlCache
+from doragi.chat_context import estimate_tokens
+from doragi.metrics import get_metrics
+from doragi.http_client import get_http_client
+
+NEWS_TTL = 180          # 검색어별 결과 캐시 (초)
+NEWS_MAX_AGE_DAYS = 7
+NEWS_WORKERS = 4
+RSS_CHUNK_SIZE = 8192
+
+# 구글용 헤더는 별도로 간단하게 설정 (구글은 Referer 체크 안함)
+GOOGLE_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def strip_html(raw):
+    """description 의 HTML 조각 -> 공백 하나로 이어 붙인 텍스트."""
+    return " ".join(html.unescape(_TAG_RE.sub(" ", raw or "")).split())
+
+
+def news_sort_key(item):
+    return item['date_obj'].timestamp() if item['date_obj'] else 0
+
+
+def _to_news_item(title, link, pub_date, raw_desc, min_date):
+    dt_object = None
+    try:
+        dt_object = email.utils.parsedate_to_datetime(pub_date)
+        now = datetime.now(dt_object.tzinfo)
+        if dt_object < (now - min_date):
+            return None
+    except (TypeError, ValueError):
+        pass
+
+    source = "News"
+    if "-" in title:
+        parts = title.rsplit("-", 1)
+        if len(parts) > 1:
+            source = parts[1].strip()
+            title = parts[0].strip()
+
+    return {
+        "source": source, "title": title, "link": link,
+        "summary": strip_html(raw_desc), "date": pub_date, "date_obj": dt_object
+    }
+
+
+def iter_rss_items(chunks, max_age_days=NEWS_MAX_AGE_DAYS):
+    """바이트 조각들을 받는 대로 파싱해서 max_age_days 이내의 기사 dict 를 하나씩 내보낸다."""
+    parser = ET.XMLPullParser(events=("end",))
+    min_date = timedelta(days=max_age_days)
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if elem.tag != "item":
+                continue
+            item = _to_news_item(
+                elem.findtext("title", ""), elem.findtext("link", ""),
+                elem.findtext("pubDate", ""), elem.findtext("description", ""), min_date,
+            )
+            elem.clear()
+            if item is not None:
+                yield item
+    parser.close()
+
+
+def build_search_url(keyword, max_age_days=NEWS_MAX_AGE_DAYS):
+    encoded_kw = urllib.parse.quote(f"{keyword} when:{max_age_days}d")
+    return f"https://news.google.com/rss/search?q={encoded_kw}&hl=ko&gl=KR&ceid=KR:ko&scoring=n"
+
+
+def fetch_google_news_rss(http_get, keyword, limit=10):
+    """http_get(url, headers=..., stream=True) 로 받은 RSS 에서 최신순 limit 건."""
+    res = http_get(build_search_url(keyword), headers=GOOGLE_HEADERS, stream=True)
+    try:
+        if res.status_code != 200:
+            # 빈 결과로 치되 (TTL 동안 같은 검색어를 다시 두드리지 않게) 오류로 센다
+            get_metrics().inc("collector_errors_total", dataset="news", error=f"http_{res.status_code}")
+            return []
+        news_data = list(iter_rss_items(res.iter_content(RSS_CHUNK_SIZE)))
+    finally:
+        res.close()
+    news_data.sort(key=news_sort_key, reverse=True)
+    return news_data[:limit]
+
+
+def stock_news_queries(stock_name):
+    return [f"{stock_name} 주가 특징주", f"{stock_name} 속보"]
+
+
+def merge_news(news_lists):
+    """여러 검색 결과를 link 기준으로 합치고 최신순으로 정렬한다."""
+    unique_news = {}
+    for news in news_lists:
+        for item in news:
+            unique_news.setdefault(item['link'], item)
+    return sorted(unique_news.values(), key=news_sort_key, reverse=True)
+
+
+class NewsAggregator:
+    def __init__(self, http_get, ttl=NEWS_TTL, max_workers=NEWS_WORKERS):
+        self._http_get = http_get
+        self._cache = TtlCache(self._load, ttl=ttl, max_workers=max_workers, name="news")
+
+    def _load(self, key):
+        # 실패는 여기서 한 번만 센다 (prefetch 로만 받고 get 하지 않는 검색어도 있으므로)
+        try:
+            return fetch_google_news_rss(self._http_get, key[0], limit=key[1])
+        except Exception as e:
+            get_metrics().inc("collector_errors_total", dataset="news", error=type(e).__name__)
+            raise
+
+    @property
+    def stats(self):
+        return self._cache.stats
+
+    def search(self, queries, limit=10):
+        """queries 를 동시에 받아 합친 결과. 실패한 검색어는 빈 결과로 친다."""
+        keys = [(query, limit) for query in queries]
+        self._cache.prefetch(keys)
+        results = []
+        for key in keys:
+            try:
+                results.append(self._cache.get(key))
+            except Exception:
+                pass
+        return merge_news(results)
+
+    def prefetch(self, queries, limit=10):
+        """queries 를 백그라운드에서 받아 둔다. (기다리지 않음)"""
+        return self._cache.prefetch([(query, limit) for query in queries])
+
+    def peek(self, queries, limit=10):
+        """이미 받아 둔 검색어만 합친 결과와, 아직 받는 중인 검색어가 있는지. (네트워크를 기다리지 않음, 화면용)
+
+        실패한 검색어는 빈 결과로 치고 받는 중으로 보지 않는다.
+        """
+        keys = [(query, limit) for query in queries]
+        results = [news for news in map(self._cache.peek, keys) if news is not None]
+        return merge_news(results), any(self._cache.pending(key) for key in keys)
+
+
+# --- [유사 기사 묶기 + 프롬프트용 선별] ---
+NEWS_TOP_K = 8              # 프롬프트에 넣을 기사 묶음 수
+NEWS_TOKEN_BUDGET = 1500    # 프롬프트에 넣을 뉴스 분량 (토큰 어림값)
+NEWS_HALF_LIFE_HOURS = 12   # 이 시간만큼 오래된 기사는 점수가 절반
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16          # LSH: 4개씩 16 묶음 중 하나라도 같으면 후보
+DUPLICATE_THRESHOLD = 0.5   # MinHash 로 어림한 자카드 유사도가 이 이상이면 같은 기사
+
+_PRIME = (1 << 31) - 1
+_PERM_A, _PERM_B = np.random.default_rng(0).integers(1, _PRIME, size=(2, MINHASH_PERMUTATIONS, 1), dtype=np.int64)
+_NORMALIZE_RE = re.compile(r'[^0-9a-z가-힣]')
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """문장부호/공백을 뺀 글자 size-gram 집합. (한글은 띄어쓰기가 매체마다 달라 단어보다 글자 단위가 낫다)"""
+    text = _NORMALIZE_RE.sub("", (text or "").lower())
+    return {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+
+
+def minhash(shingle_set):
+    hashes = np.array([zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingle_set], dtype=np.int64)
+    return ((_PERM_A * hashes + _PERM_B) % _PRIME).min(axis=1)
+
+
+def cluster_news(items, threshold=DUPLICATE_THRESHOLD):
+    """비슷한 기사끼리 묶는다. -> [[item, ...], ...] (처음 나온 순서)"""
+    if not items:
+        return []
+    signatures = [minhash(shingles(f"{item['title']} {item['summary']}")) for item in items]
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    buckets = {}
+    for i, signature in enumerate(signatures):
+        for band in range(MINHASH_BANDS):
+            bucket = buckets.setdefault((band, signature[band * rows:(band + 1) * rows].tobytes()), [])
+            for j in bucket:
+                if find(i) != find(j) and np.mean(signatures[i] == signatures[j]) >= threshold:
+                    parent[find(i)] = find(j)
+            bucket.append(i)
+
+    clusters = {}
+    for i, item in enumerate(items):
+        clusters.setdefault(find(i), []).append(item)
+    return list(clusters.values())
+
+
+def _representative(cluster):
+    """요약이 가장 긴 기사를 대표로, 날짜는 묶음에서 가장 최근 것으로."""
+    best = max(cluster, key=lambda item: len(item["summary"]))
+    newest = max(cluster, key=news_sort_key)
+    sources = list(dict.fromkeys(item["source"] for item in cluster))
+    return {**best, "date": newest["date"], "date_obj": newest["date_obj"], "sources": sources, "cluster_size": len(cluster)}
+
+
+def _cluster_score(item, terms):
+    """log 점수 = 관련도 + 출처 수 + 최신도. 최신도가 게시 시각에 비례하므로 '지금' 에 따라 순서가 바뀌지 않는다."""
+    title, summary = item["title"], item["summary"]
+    relevance = sum(2 if term in title else 1 if term in summary else 0 for term in terms if term)
+    recency = news_sort_key(item) / 3600 / NEWS_HALF_LIFE_HOURS * math.log(2)
+    return math.log1p(relevance) + 0.3 * math.log(item["cluster_size"]) + recency
+
+
+def news_source_label(item):
+    size = item.get("cluster_size", 1)
+    return f"{item['source']} 외 {size - 1}곳" if size > 1 else item["source"]
+
+
+def select_news(items, terms=(), top_k=NEWS_TOP_K, token_budget=NEWS_TOKEN_BUDGET):
+    """유사 기사를 묶어 대표만 남기고, terms(종목명/테마명 등) 관련도와 최신순으로 상위 top_k 개.
+
+    token_budget 을 넘는 기사는 건너뛰고 다음 기사를 본다. (None 이면 제한 없음)
+    """
+    ranked = sorted((_representative(c) for c in cluster_news(items)),
+                    key=lambda item: _cluster_score(item, terms), reverse=True)
+    selected, used = [], 0
+    for item in ranked:
+        if len(selected) >= top_k:
+            break
+        cost = estimate_tokens(f"{item['title']} {item['summary']}")
+        if token_budget is not None and used + cost > token_budget:
+            continue
+        selected.append(item)
+        used += cost
+    metrics = get_metrics()
+    metrics.observe("news_clusters", len(ranked))
+    metrics.observe("news_prompt_tokens", used)
+    return selected
+
+
+@functools.lru_cache(maxsize=None)
+def get_news_aggregator():
+    return NewsAggregator(get_http_client().get)
@@ -0,0 +1,128 @@
+"""스냅샷 단위 페이지 공유 (URL 중복 제거 + single-flight)."""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from doragi.http_client import get_headers, get_http_client
+from doragi.metrics import count_rows, get_metrics
+from doragi.parsers import get_parser_backend
+
+SNAPSHOT_KEEP = 6           # 메모리에 남겨둘 스냅샷 수 (갱신 주기별 현재 + 직전)
+PAGE_WINDOW = 4             # 순위 페이지를 앞질러 동시에 받아 둘 페이지 수
+
+
+def current_snapshot_id(interval):
+    """interval 초 단위 벽시계 구간. 주기가 같은 수집기는 같은 id 를 받아 페이지를 공유한다."""
+    return (interval, int(time.time() // interval))
+
+
+class SnapshotPages:
+    """한 스냅샷 동안 같은 URL 은 한 번만 받고, 같은 표는 한 번만 파싱해서 여러 수집기가 같이 읽게 한다.
+
+    같은 URL 을 동시에 요청한 호출(다른 세션의 rerun 등)은 진행 중인 요청 하나를 기다렸다가
+    결과를 공유한다. 실패한 요청은 기억하지 않으므로 다음 호출이 다시 받는다.
+    """
+
+    def __init__(self, client, parser, keep=SNAPSHOT_KEEP):
+        self.client = client
+        self.parser = parser
+        self.keep = keep
+        self._snapshots = OrderedDict()  # snapshot_id -> {"flights": {key: Future}, "requests": n, "shared": n}
+        self._lock = threading.Lock()
+
+    def _snapshot(self, snapshot_id):
+        snap = self._snapshots.get(snapshot_id)
+        if snap is None:
+            snap = self._snapshots[snapshot_id] = {"flights": {}, "requests": 0, "shared": 0}
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+        return snap
+
+    def _single_flight(self, snapshot_id, key, compute, count_as_request=False):
+        with self._lock:
+            snap = self._snapshot(snapshot_id)
+            future = snap["flights"].get(key)
+            owner = future is None
+            if owner:
+                future = snap["flights"][key] = Future()
+                if count_as_request: snap["requests"] += 1
+            elif count_as_request:
+                snap["shared"] += 1
+        get_metrics().inc("cache_requests_total", cache="pages" if count_as_request else "rows", result="miss" if owner else "hit")
+
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                with self._lock:
+                    if snap["flights"].get(key) is future:
+                        del snap["flights"][key]
+                future.set_exception(e)
+        return future.result()
+
+    def get_page(self, url, snapshot_id, headers=None):
+        def fetch():
+            res = self.client.get(url, headers=headers or get_headers())
+            res.raise_for_status()
+            return res.content
+        return self._single_flight(snapshot_id, ("page", url), fetch, count_as_request=True)
+
+    def parse(self, kind, content):
+        """getattr(parser, kind)(content) 에 파싱 시간과 추출 행 수를 기록한다."""
+        metrics = get_metrics()
+        with metrics.timer("parse_seconds", kind=kind):
+            result = getattr(self.parser, kind)(content)
+        metrics.observe("parse_rows", count_rows(result), kind=kind)
+        return result
+
+    def get_rows(self, url, snapshot_id, kind):
+        """kind 는 ParserBackend 의 추출 메서드 이름 (예: "riser_rows"). 결과는 공유되므로 수정하지 말 것."""
+        return self._single_flight(
+            snapshot_id, (kind, url),
+            lambda: self.parse(kind, self.get_page(url, snapshot_id))
+        )
+
+    def iter_rows(self, page_url, snapshot_id, kind, max_pages, window=PAGE_WINDOW, on_page=None):
+        """page_url(n) 의 1..max_pages 페이지 행을 순위 순서대로 하나씩 내보낸다.
+
+        다음 window 개 페이지를 미리 동시에 받아 두고, 소비하는 쪽이 멈추면(break) 아직 시작하지 않은
+        페이지는 요청하지 않는다. 빈 페이지나 앞 페이지와 같은 페이지(범위를 넘은 page 번호)가 나오면 끝.
+        on_page(page, max_pages) 는 페이지 하나를 다 받을 때마다 호출한다.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, min(window, max_pages)), thread_name_prefix="pages")
+        futures = {}
+        next_page = 1
+        previous = None
+        try:
+            for page in range(1, max_pages + 1):
+                while next_page <= min(max_pages, page + window - 1):
+                    futures[next_page] = executor.submit(self.get_rows, page_url(next_page), snapshot_id, kind)
+                    next_page += 1
+                rows = futures.pop(page).result()
+                if on_page: on_page(page, max_pages)
+                if not rows or rows == previous:
+                    return
+                previous = rows
+                yield from rows
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self, snapshot_id):
+        with self._lock:
+            snap = self._snapshots.get(snapshot_id)
+            return {"requests": snap["requests"], "shared": snap["shared"]} if snap else {"requests": 0, "shared": 0}
+
+    def invalidate(self, snapshot_id):
+        with self._lock:
+            self._snapshots.pop(snapshot_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def get_snapshot_pages():
+    return SnapshotPages(get_http_client(), get_parser_backend())
@@ -0,0 +1,289 @@
+"""네이버 금융 페이지 표 추출기.
+
+같은 인터페이스(ParserBackend)를 가진 두 구현을 제공한다.
+- LxmlParser: 대상 <table> 조각만 잘라서 lxml(C 구현)로 파싱한다. (기본값)
+- SoupParser: 기존 BeautifulSoup('html.parser') + CSS select 방식. lxml 이 없을 때의 대체용.
+
+모든 메서드는 네이버가 돌려준 원본 바이트(cp949)를 받아 dict 목록을 돌려주며,
+두 백엔드의 결과는 항상 같아야 한다. (benchmarks/bench_parsers.py 로 확인)
+페이지 수(last_page)는 표가 아니라 페이지 이동 링크 하나만 보면 되므로 두 백엔드가 같은 정규식을 쓴다.
+"""
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # lxml 이 없으면 SoupParser 만 사용
+    lxml = None
+
+NAVER_ENCODING = "cp949"
+THEME_LIMIT = 50
+
+_CODE_RE = re.compile(r'code=([0-9]+)')
+_LAST_PAGE_RE = re.compile(r'class="pgRR"[^>]*>\s*<a[^>]*[?&](?:amp;)?page=(\d+)')
+
+
+def decode_page(content):
+    if isinstance(content, str):
+        return content
+    return content.decode(NAVER_ENCODING, 'ignore')
+
+
+def _code_from_href(href):
+    code_match = _CODE_RE.search(href or "")
+    return code_match.group(1) if code_match else ""
+
+
+def _clean_rate(text):
+    return text.strip().replace('\n', '').strip()
+
+
+# item/main.naver 의 id 로 바로 찾을 수 있는 지표들
+ITEM_METRIC_IDS = {"PER": "_per", "EPS": "_eps", "PBR": "_pbr", "배당수익률": "_dvr"}
+FOREIGN_TABLE_SUMMARY = "외국인한도"
+FOREIGN_RATIO_LABEL = "외국인소진율"
+
+
+def _format_market_cap(raw_cap):
+    raw_cap = re.sub(r'[議兆]', '조', raw_cap.strip())
+    return raw_cap.replace('\t', '').replace('\n', '').replace('  ', ' ') + "억"
+
+
+class ParserBackend:
+    """표 추출 인터페이스. 각 메서드는 페이지 원본(bytes 또는 str)을 받는다."""
+
+    name = ""
+
+    def theme_list(self, content, limit=THEME_LIMIT):
+        """sise/theme.naver -> [{"name", "link", "등락률", "등락현황"}] (테마 순위 순)
+
+        등락현황은 '상승/보합/하락' 종목 수. 등락률과 함께 테마 상세를 다시 받을지 정하는 데 쓴다.
+        """
+        raise NotImplementedError
+
+    def theme_stocks(self, content):
+        """sise_group_detail.naver -> [{"code", "종목명", "현재가(등락률)"}] (테마 내 순위 순)"""
+        raise NotImplementedError
+
+    def riser_rows(self, content):
+        """sise_rise.naver -> [{"code", "종목명", "현재가", "등락률"}]"""
+        raise NotImplementedError
+
+    def market_sum_rows(self, content):
+        """sise_market_sum.naver -> [{"code", "순위", "종목명", "현재가", "등락률", "시가총액", "거래량"}]"""
+        raise NotImplementedError
+
+    def item_fundamentals(self, content):
+        """item/main.naver -> {"시가총액", "PER", "EPS", "PBR", "배당수익률", "외국인소진율"} (없는 값은 "-")"""
+        raise NotImplementedError
+
+    def last_page(self, content):
+        """순위 페이지의 '맨뒤' 링크가 가리키는 마지막 페이지 번호. (페이지 이동 링크가 없으면 1)"""
+        match = _LAST_PAGE_RE.search(decode_page(content))
+        return int(match.group(1)) if match else 1
+
+
+class SoupParser(ParserBackend):
+    name = "bs4"
+
+    @staticmethod
+    def _soup(content):
+        return BeautifulSoup(decode_page(content), 'html.parser')
+
+    def theme_list(self, content, limit=THEME_LIMIT):
+        theme_links = []
+        for row in self._soup(content).select("#contentarea_left > table.type_1 > tr"):
+            cols = row.select("td")
+            if len(cols) >= 4:
+                theme_links.append({
+                    "name": cols[0].text.strip(),
+                    "link": "https://finance.naver.com" + cols[0].find('a')['href'],
+                    "등락률": cols[1].text.strip(),
+                    "등락현황": "/".join(td.text.strip() for td in cols[3:6]),
+                })
+                if len(theme_links) >= limit: break
+        return theme_links
+
+    def theme_stocks(self, content):
+        stocks = []
+        for row in self._soup(content).select("table.type_5 > tbody > tr"):
+            cols = row.select("td")
+            if len(cols) > 4:
+                name_tag = cols[0].find('a')
+                if not name_tag: continue
+                stocks.append({
+                    "code": _code_from_href(name_tag['href']),
+                    "종목명": name_tag.text.strip(),
+                    "현재가(등락률)": cols[2].text.strip() + " (" + _clean_rate(cols[4].text) + ")"
+                })
+        return stocks
+
+    def riser_rows(self, content):
+        rows = []
+        for row in self._soup(content).select("table.type_2 tr"):
+            cols = row.select("td")
+            if len(cols) < 5: continue
+            name_tag = cols[1].find('a')
+            if not name_tag: continue
+            rows.append({
+                "code": _code_from_href(name_tag.get('href')),
+                "종목명": name_tag.text.strip(),
+                "현재가": cols[2].text.strip(),
+                "등락률": _clean_rate(cols[4].text)
+            })
+        return rows
+
+    def market_sum_rows(self, content):
+        rows = []
+        for row in self._soup(content).select("table.type_2 tbody tr"):
+            cols = row.select("td")
+            if len(cols) < 10: continue
+            name_tag = cols[1].find('a')
+            rows.append({
+                "code": _code_from_href(name_tag.get('href')) if name_tag else "",
+                "순위": cols[0].text.strip(), "종목명": cols[1].text.strip(),
+                "현재가": cols[2].text.strip(), "등락률": _clean_rate(cols[4].text),
+                "시가총액": cols[6].text.strip(), "거래량": cols[9].text.strip()
+            })
+        return rows
+
+    def item_fundamentals(self, content):
+        soup = self._soup(content)
+        cap_elem = soup.select_one("#_market_sum")
+        record = {"시가총액": _format_market_cap(cap_elem.text) if cap_elem else "-"}
+        for key, elem_id in ITEM_METRIC_IDS.items():
+            elem = soup.select_one(f"#{elem_id}")
+            record[key] = elem.text.strip() if elem else "-"
+        record[FOREIGN_RATIO_LABEL] = "-"
+        foreign_table = soup.select_one(f'table[summary*="{FOREIGN_TABLE_SUMMARY}"]')
+        for row in foreign_table.select("tr") if foreign_table else []:
+            th, em = row.find("th"), row.select_one("td em")
+            if th and em and FOREIGN_RATIO_LABEL in th.text:
+                record[FOREIGN_RATIO_LABEL] = em.text.strip()
+                break
+        return record
+
+
+class LxmlParser(ParserBackend):
+    name = "lxml"
+
+    _TABLE_RE = {
+        cls: re.compile(r'<table[^>]*class="[^"]*\b' + cls + r'\b', re.I)
+        for cls in ("type_1", "type_2", "type_5")
+    }
+
+    @classmethod
+    def _table(cls, content, table_class, after=None):
+        """문서 전체가 아니라 대상 <table>...</table> 조각만 잘라 파싱한다."""
+        text = decode_page(content)
+        start = text.find(after) if after else 0
+        if start < 0: return None
+        match = cls._TABLE_RE[table_class].search(text, start)
+        if not match: return None
+        end = text.find("</table>", match.start())
+        if end < 0: return None
+        return lxml.html.fragment_fromstring(text[match.start():end + len("</table>")])
+
+    @staticmethod
+    def _tds(row):
+        return [child for child in row if child.tag == "td"]
+
+    @staticmethod
+    def _link(td):
+        found = td.iter("a")
+        return next(found, None)
+
+    def theme_list(self, content, limit=THEME_LIMIT):
+        theme_links = []
+        table = self._table(content, "type_1", after='id="contentarea_left"')
+        if table is None: return theme_links
+        for row in table.iterchildren("tr"):
+            cols = self._tds(row)
+            if len(cols) >= 4:
+                theme_links.append({
+                    "name": cols[0].text_content().strip(),
+                    "link": "https://finance.naver.com" + self._link(cols[0]).get('href'),
+                    "등락률": cols[1].text_content().strip(),
+                    "등락현황": "/".join(td.text_content().strip() for td in cols[3:6]),
+                })
+                if len(theme_links) >= limit: break
+        return theme_links
+
+    def theme_stocks(self, content):
+        stocks = []
+        table = self._table(content, "type_5")
+        if table is None: return stocks
+        for tbody in table.iterchildren("tbody"):
+            for row in tbody.iterchildren("tr"):
+                cols = self._tds(row)
+                if len(cols) > 4:
+                    name_tag = self._link(cols[0])
+                    if name_tag is None: continue
+                    stocks.append({
+                        "code": _code_from_href(name_tag.get('href')),
+                        "종목명": name_tag.text_content().strip(),
+                        "현재가(등락률)": cols[2].text_content().strip() + " (" + _clean_rate(cols[4].text_content()) + ")"
+                    })
+        return stocks
+
+    def riser_rows(self, content):
+        rows = []
+        table = self._table(content, "type_2")
+        if table is None: return rows
+        for row in table.iter("tr"):
+            cols = self._tds(row)
+            if len(cols) < 5: continue
+            name_tag = self._link(cols[1])
+            if name_tag is None: continue
+            rows.append({
+                "code": _code_from_href(name_tag.get('href')),
+                "종목명": name_tag.text_content().strip(),
+                "현재가": cols[2].text_content().strip(),
+                "등락률": _clean_rate(cols[4].text_content())
+            })
+        return rows
+
+    def market_sum_rows(self, content):
+        rows = []
+        table = self._table(content, "type_2")
+        if table is None: return rows
+        for tbody in table.iter("tbody"):
+            for row in tbody.iter("tr"):
+                cols = self._tds(row)
+                if len(cols) < 10: continue
+                name_tag = self._link(cols[1])
+                rows.append({
+                    "code": _code_from_href(name_tag.get('href')) if name_tag is not None else "",
+                    "순위": cols[0].text_content().strip(), "종목명": cols[1].text_content().strip(),
+                    "현재가": cols[2].text_content().strip(), "등락률": _clean_rate(cols[4].text_content()),
+                    "시가총액": cols[6].text_content().strip(), "거래량": cols[9].text_content().strip()
+                })
+        return rows
+
+    def item_fundamentals(self, content):
+        doc = lxml.html.document_fromstring(decode_page(content))
+        cap_elem = doc.get_element_by_id("_market_sum", None)
+        record = {"시가총액": _format_market_cap(cap_elem.text_content()) if cap_elem is not None else "-"}
+        for key, elem_id in ITEM_METRIC_IDS.items():
+            elem = doc.get_element_by_id(elem_id, None)
+            record[key] = elem.text_content().strip() if elem is not None else "-"
+        record[FOREIGN_RATIO_LABEL] = "-"
+        ems = doc.xpath(
+            f'//table[contains(@summary, "{FOREIGN_TABLE_SUMMARY}")]//tr[th[contains(., "{FOREIGN_RATIO_LABEL}")]]/td//em'
+        )
+        if ems:
+            record[FOREIGN_RATIO_LABEL] = ems[0].text_content().strip()
+        return record
+
+
+PARSER_BACKENDS = {"bs4": SoupParser}
+if lxml is not None:
+    PARSER_BACKENDS["lxml"] = LxmlParser
+
+
+def get_parser_backend(name=None):
+    """name 이 없으면 사용 가능한 가장 빠른 백엔드(lxml > bs4)를 돌려준다."""
+    if name is None:
+        name = "lxml" if "lxml" in PARSER_BACKENDS else "bs4"
+    return PARSER_BACKENDS[name]()
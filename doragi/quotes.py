@@ -0,0 +1,119 @@
+"""장중 실시간 시세 폴링.
+
+교집합 후보의 '현재가(등락률)' 은 테마 스냅샷(10분) 시점에 멈춰 있다. 여기서는 후보 종목 코드만
+가벼운 시세 API 에 묶어서 물어보고, 직전 틱과 달라진 종목만 골라 낸다. 화면은 이 결과로 표의
+현재가 칸만 바꿔서 다시 그린다. (전체 스크립트가 아니라 st.fragment 부분만 재실행)
+
+- 시세 출처는 fetch(codes) -> {code: {"현재가": int, "등락률": float}} 하나만 있으면 된다.
+  기본은 네이버 polling API 이고, DORAGI_QUOTE_URL 로 주소를 바꾸거나 QuoteBoard(source=...) 로
+  다른 출처(테스트용 대역 서버 등)를 넣을 수 있다.
+- QuoteBoard 는 프로세스에 하나. max_age 안에 이미 받은 종목은 다시 묻지 않으므로 여러 세션과
+  여러 fragment 가 같은 틱을 나눠 쓴다.
+"""
+import functools
+import os
+import threading
+import time
+
+from doragi.http_client import get_headers, get_http_client
+from doragi.intersection import parse_number
+from doragi.metrics import get_metrics
+
+QUOTE_URL = os.environ.get(
+    "DORAGI_QUOTE_URL", "https://polling.finance.naver.com/api/realtime/domestic/stock/{codes}"
+)
+QUOTE_INTERVAL = 5          # 폴링 주기 (초). 같은 주기 안의 요청은 받아 둔 값을 쓴다.
+QUOTE_BATCH = 50            # 요청 하나에 묶을 종목 수
+QUOTE_TIMEOUT = (2, 3)      # 폴링은 짧게 포기하고 다음 틱을 기다린다
+
+
+def parse_quotes(payload):
+    """polling API 응답(JSON) -> {code: {"현재가": int, "등락률": float}}. 읽을 수 없는 항목은 건너뛴다."""
+    quotes = {}
+    for item in (payload or {}).get("datas", []):
+        price = parse_number(item.get("closePrice"))
+        rate = parse_number(item.get("fluctuationsRatio"))
+        if item.get("itemCode") and price is not None and rate is not None:
+            quotes[item["itemCode"]] = {"현재가": int(price), "등락률": rate}
+    return quotes
+
+
+def format_quote(quote):
+    """{"현재가": 12300, "등락률": 5.2} -> '12,300 (+5.20%)' (테마 상세 페이지와 같은 모양)"""
+    return f"{quote['현재가']:,} ({quote['등락률']:+.2f}%)"
+
+
+def diff_quotes(previous, current):
+    """직전 틱과 현재가/등락률이 달라진 종목 코드. (직전 틱에 없던 종목은 바뀐 것으로 보지 않는다)"""
+    return {code for code, quote in current.items() if code in previous and previous[code] != quote}
+
+
+class NaverQuoteSource:
+    def __init__(self, url=QUOTE_URL, client=None, timeout=QUOTE_TIMEOUT):
+        self.url = url
+        self.client = client
+        self.timeout = timeout
+
+    def fetch(self, codes):
+        client = self.client or get_http_client()
+        res = client.get(self.url.format(codes=",".join(codes)), headers=get_headers(),
+                         timeout=self.timeout, revalidate=False)
+        res.raise_for_status()
+        return parse_quotes(res.json())
+
+
+class QuoteBoard:
+    """종목별 최근 시세. get(codes) 는 max_age 보다 오래된 종목만 묶어서 다시 묻는다."""
+
+    def __init__(self, source=None, max_age=QUOTE_INTERVAL, batch=QUOTE_BATCH):
+        self.source = source or NaverQuoteSource()
+        self.max_age = max_age
+        self.batch = batch
+        self._quotes = {}  # code -> (quote, fetched_at)
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()  # 같은 틱에 여러 세션이 동시에 묻지 않게
+
+    def _stale(self, codes, now):
+        with self._lock:
+            return [c for c in codes if c not in self._quotes or now - self._quotes[c][1] >= self.max_age]
+
+    def get(self, codes):
+        """-> {code: quote}. 폴링이 실패하면 마지막으로 받은 값을 그대로 돌려준다."""
+        codes = list(dict.fromkeys(codes))
+        if self._stale(codes, time.time()):
+            with self._fetch_lock:
+                stale = self._stale(codes, time.time())  # 기다리는 동안 다른 세션이 받았을 수 있다
+                for i in range(0, len(stale), self.batch):
+                    self._poll(stale[i:i + self.batch])
+        with self._lock:
+            return {c: self._quotes[c][0] for c in codes if c in self._quotes}
+
+    def _poll(self, codes):
+        metrics = get_metrics()
+        try:
+            with metrics.timer("quote_poll_seconds"):
+                quotes = self.source.fetch(codes)
+        except Exception as e:
+            metrics.inc("quote_errors_total", error=type(e).__name__)
+            return
+        now = time.time()
+        with self._lock:
+            for code, quote in quotes.items():
+                self._quotes[code] = (quote, now)
+
+    def clear(self):
+        with self._lock:
+            self._quotes.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def get_quote_board():
+    return QuoteBoard()
+
+
+def apply_quotes(df, quotes, column="현재가(등락률)"):
+    """df 의 현재가 칸을 실시간 시세로 바꾼 사본. 시세가 없는 종목은 스냅샷 값을 그대로 둔다."""
+    df = df.copy()
+    live = df["code"].map(lambda code: format_quote(quotes[code]) if code in quotes else None)
+    df[column] = live.fillna(df[column])
+    return df
@@ -0,0 +1,178 @@
+"""테마 순위 시계열 저장소와 스냅샷마다 조금씩 갱신하는 모멘텀 지표.
+
+themes 데이터셋을 수집할 때마다 (수집 시각, 테마, 종목) 한 행씩 테마순위/테마내순위/등락률을 SQLite 에
+덧붙인다. (theme_ranks 표, 지우지 않고 쌓기만 하며 RANK_HISTORY_MAX_AGE 보다 오래된 행만 정리)
+
+같은 트랜잭션에서 rank_features 표의 (테마, 종목) 행을 직전 값에서 한 단계만 갱신하므로, 화면은
+이력을 다시 훑지 않고 현재 스냅샷의 지표만 인덱스로 읽는다. (종목 칸이 빈 문자열인 행은 테마 자체)
+
+- 순위 속도: 직전 스냅샷 대비 오른 순위 수의 지수 이동평균 (양수면 상승 중). 직전 스냅샷에 없다가
+  들어온 항목은 (그 스냅샷의 항목 수 + 1) 위에서 올라온 것으로 본다.
+- 연속 포착: 빠지지 않고 잇따라 잡힌 스냅샷 수
+- 최초 포착: 처음 잡힌 시각
+"""
+import functools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from doragi.intersection import CHANGE_COL, STOCK_VELOCITY_COL, STREAK_COL, THEME_VELOCITY_COL
+from doragi.snapshot_store import DEFAULT_DATA_DIR
+
+DEFAULT_RANK_HISTORY_PATH = os.path.join(DEFAULT_DATA_DIR, "rank_history.sqlite3")
+RANK_HISTORY_MAX_AGE = 30 * 24 * 3600   # 이보다 오래된 순위 행/지표는 지운다 (초)
+VELOCITY_ALPHA = 0.5                    # 순위 속도 이동평균에서 이번 변화의 비중
+MIN_SNAPSHOTS = 2                       # 이만큼 쌓이기 전에는 지표를 내지 않는다 (전부 '처음 포착' 이므로)
+FIRST_SEEN_COL = "최초포착"
+THEME_KEY = ""                          # rank_features 에서 테마 자체를 나타내는 종목 칸
+FEATURE_COLUMNS = [STREAK_COL, FIRST_SEEN_COL, THEME_VELOCITY_COL, STOCK_VELOCITY_COL]
+
+
+class RankHistoryStore:
+    """theme_ranks(원본 시계열) + rank_features(최신 지표). 여러 스레드/프로세스에서 써도 된다."""
+
+    def __init__(self, path=DEFAULT_RANK_HISTORY_PATH, max_age=RANK_HISTORY_MAX_AGE, alpha=VELOCITY_ALPHA):
+        self.path = path
+        self.max_age = max_age
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._memo = None  # (최신 수집 시각, 지표 DataFrame)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS snapshots (collected_at REAL PRIMARY KEY, rows INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS theme_ranks ("
+                " collected_at REAL NOT NULL, theme TEXT NOT NULL, code TEXT NOT NULL,"
+                " theme_rank INTEGER, inner_rank INTEGER, change REAL,"
+                " PRIMARY KEY (collected_at, theme, code))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rank_features ("
+                " theme TEXT NOT NULL, code TEXT NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL,"
+                " seen INTEGER NOT NULL, streak INTEGER NOT NULL, rank INTEGER NOT NULL, velocity REAL NOT NULL,"
+                " PRIMARY KEY (theme, code))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS rank_features_last_seen ON rank_features (last_seen)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, df_themes, collected_at=None):
+        """테마 스냅샷 하나를 덧붙이고 지표를 갱신한다. 마지막 스냅샷보다 오래된 것은 무시. -> 넣은 행 수"""
+        collected_at = collected_at or time.time()
+        if df_themes is None or df_themes.empty:
+            return 0
+        df = df_themes.drop_duplicates(["테마명", "code"])
+        rows = list(zip(
+            df["테마명"].astype(str), df["code"].astype(str), df["테마순위_int"].astype(int),
+            df["테마내순위"].astype(str).str.extract(r'(\d+)')[0].astype(int),
+            df[CHANGE_COL].astype(float) if CHANGE_COL in df else [None] * len(df),
+        ))
+        themes = {theme: t_rank for theme, _, t_rank, _, _ in rows}
+        stocks_per_theme = {}
+        for theme, *_ in rows:
+            stocks_per_theme[theme] = stocks_per_theme.get(theme, 0) + 1
+        current = {(theme, THEME_KEY): t_rank for theme, t_rank in themes.items()}
+        current.update({(theme, code): i_rank for theme, code, _, i_rank, _ in rows})
+
+        with self._lock, self._connect() as conn:
+            previous = conn.execute("SELECT MAX(collected_at) FROM snapshots").fetchone()[0]
+            if previous is not None and collected_at <= previous:
+                return 0
+            conn.executemany(
+                "INSERT INTO theme_ranks (collected_at, theme, code, theme_rank, inner_rank, change) VALUES (?, ?, ?, ?, ?, ?)",
+                [(collected_at, *row) for row in rows],
+            )
+            conn.execute("INSERT INTO snapshots (collected_at, rows) VALUES (?, ?)", (collected_at, len(rows)))
+
+            placeholders = ",".join("?" * len(themes))
+            known = {
+                (theme, code): (first_seen, last_seen, seen, streak, rank, velocity)
+                for theme, code, first_seen, last_seen, seen, streak, rank, velocity in conn.execute(
+                    "SELECT theme, code, first_seen, last_seen, seen, streak, rank, velocity FROM rank_features"
+                    f" WHERE theme IN ({placeholders})", list(themes),
+                )
+            }
+            updated = []
+            for (theme, code), rank in current.items():
+                outside = (len(themes) if code == THEME_KEY else stocks_per_theme[theme]) + 1
+                first_seen, last_seen, seen, streak, last_rank, velocity = known.get(
+                    (theme, code), (collected_at, None, 0, 0, outside, 0.0)
+                )
+                continued = previous is not None and last_seen == previous
+                if previous is None:
+                    velocity = 0.0
+                else:
+                    delta = (last_rank if continued else outside) - rank
+                    velocity = self.alpha * delta + (1 - self.alpha) * (velocity if continued else 0.0)
+                updated.append((theme, code, first_seen, collected_at, seen + 1, streak + 1 if continued else 1, rank, velocity))
+            conn.executemany(
+                "INSERT OR REPLACE INTO rank_features (theme, code, first_seen, last_seen, seen, streak, rank, velocity)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", updated,
+            )
+
+            cutoff = collected_at - self.max_age
+            conn.execute("DELETE FROM theme_ranks WHERE collected_at < ?", (cutoff,))
+            conn.execute("DELETE FROM snapshots WHERE collected_at < ?", (cutoff,))
+            conn.execute("DELETE FROM rank_features WHERE last_seen < ?", (cutoff,))
+        return len(rows)
+
+    def current_features(self, min_snapshots=MIN_SNAPSHOTS):
+        """최신 스냅샷에 있는 (테마명, code) 별 지표 DataFrame. 스냅샷이 min_snapshots 보다 적으면 빈 DataFrame.
+
+        열: 테마명, code, 연속포착, 최초포착(datetime), 테마순위속도 (테마 단위 값), 종목순위속도 (테마 내 순위)
+        """
+        with self._lock, self._connect() as conn:
+            latest, count = conn.execute("SELECT MAX(collected_at), COUNT(*) FROM snapshots").fetchone()
+            if count < min_snapshots:
+                return pd.DataFrame(columns=["테마명", "code", *FEATURE_COLUMNS])
+            if self._memo is not None and self._memo[0] == latest:
+                return self._memo[1]
+            rows = conn.execute(
+                "SELECT theme, code, first_seen, streak, velocity FROM rank_features WHERE last_seen = ?", (latest,)
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=["테마명", "code", FIRST_SEEN_COL, STREAK_COL, STOCK_VELOCITY_COL])
+        theme_velocity = df[df["code"] == THEME_KEY].set_index("테마명")[STOCK_VELOCITY_COL]
+        df = df[df["code"] != THEME_KEY].copy()
+        df[THEME_VELOCITY_COL] = df["테마명"].map(theme_velocity).round(1)
+        df[STOCK_VELOCITY_COL] = df[STOCK_VELOCITY_COL].round(1)
+        df[FIRST_SEEN_COL] = _to_local_time(df[FIRST_SEEN_COL])
+        df = df[["테마명", "code", *FEATURE_COLUMNS]].reset_index(drop=True)
+        with self._lock:
+            self._memo = (latest, df)
+        return df
+
+
+def _to_local_time(timestamps):
+    # 화면의 다른 시각 표시(datetime.fromtimestamp)와 같은 현지 시각
+    return pd.to_datetime(timestamps.map(datetime.fromtimestamp))
+
+
+@functools.lru_cache(maxsize=None)
+def get_rank_history():
+    return RankHistoryStore()
+
+
+def attach_rank_features(df_themes, features):
+    """테마 DataFrame 에 (테마명, code) 기준으로 지표 열을 붙인다. features 가 비어 있으면 그대로."""
+    if features.empty or df_themes.empty:
+        return df_themes
+    keys = df_themes[["테마명", "code"]].astype(str)
+    merged = keys.merge(features, on=["테마명", "code"], how="left")
+    df = df_themes.copy()
+    for col in FEATURE_COLUMNS:
+        df[col] = merged[col].values
+    return df
@@ -0,0 +1,172 @@
+"""호스트별 요청 속도 조절 (토큰 버킷 + AIMD) 과 차단 감지 회로 차단기.
+
+HttpClient 가 요청마다 acquire(host) 로 토큰을 받고, 응답을 보고 on_success / on_throttle 을 알린다.
+(acquire 가 돌려준 probe 값을 그대로 넘긴다)
+
+- 정상 응답이 이어지면 초당 요청 수를 조금씩 올리고(+increase), 429/5xx/재시도/차단 페이지를 만나면
+  절반으로 줄인다(×decrease). 그래서 고정 sleep 없이 그때그때 안전한 가장 빠른 속도로 수렴한다.
+- 차단 신호가 strikes 번 잇따르면 그 호스트의 회로를 연다. 열린 동안은 요청을 보내지 않고
+  CircuitOpenError 를 바로 낸다. (수집은 실패로 끝나고 갱신기는 마지막 정상 데이터를 유지한다)
+  cooldown 뒤에 요청 하나만 시험으로 보내서 성공하면 닫고, 실패하면 cooldown 을 두 배로 늘려 다시 연다.
+  회로를 열 때 이미 나가 있던 요청들의 늦은 응답은 시험 요청이 아니므로 회로를 바꾸지 않고 횟수만 센다.
+- DNS 실패/연결 거부처럼 호스트가 막은 게 아니라 우리 쪽 네트워크 문제면 on_error 로 알린다.
+  속도와 회로는 그대로 두고, 시험 요청이었으면 자리만 비워서 다음 요청이 다시 시험하게 한다.
+"""
+import functools
+import threading
+import time
+
+from doragi.metrics import get_metrics
+
+RATE_INITIAL = 10.0     # 처음 초당 요청 수 (호스트별)
+RATE_MIN = 0.5
+RATE_MAX = 50.0
+RATE_INCREASE = 1.0     # 정상 응답 하나마다 더할 초당 요청 수
+RATE_DECREASE = 0.5     # 차단 신호 하나마다 곱할 비율
+RATE_BURST = 8          # 한 번에 몰아 보낼 수 있는 요청 수
+BREAKER_STRIKES = 3     # 잇따른 차단 신호가 이만큼이면 회로를 연다
+BREAKER_COOLDOWN = 60   # 처음 열 때 기다릴 시간 (초)
+BREAKER_MAX_COOLDOWN = 600
+
+# 200 으로 오지만 실제로는 차단/캡차 안내인 페이지의 문구 (네이버는 EUC-KR 페이지도 있다)
+BLOCK_SIGNATURES = tuple(
+    text.encode(encoding)
+    for text in ("비정상적인 접근", "자동입력 방지", "접근이 일시적으로 제한")
+    for encoding in ("utf-8", "euc-kr")
+) + (b"unusual traffic", b"g-recaptcha")
+
+
+class ThrottledError(Exception):
+    """호스트가 요청을 막고 있다는 신호. (수집기가 빈 결과로 넘어가지 않고 실패로 끝나게 하기 위함)"""
+
+
+class CircuitOpenError(ThrottledError):
+    pass
+
+
+class BlockedPageError(ThrottledError):
+    pass
+
+
+def is_block_page(res):
+    """HTML 응답 본문에 차단 안내 문구가 있는지. (RSS/JSON 은 보지 않는다)"""
+    if "html" not in res.headers.get("Content-Type", "html"):
+        return False
+    content = res.content
+    return any(signature in content for signature in BLOCK_SIGNATURES)
+
+
+class HostRateLimiter:
+    def __init__(self, initial=RATE_INITIAL, min_rate=RATE_MIN, max_rate=RATE_MAX, increase=RATE_INCREASE,
+                 decrease=RATE_DECREASE, burst=RATE_BURST, strikes=BREAKER_STRIKES, cooldown=BREAKER_COOLDOWN,
+                 max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.initial = initial
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.strikes = strikes
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {
+                "rate": self.initial, "tokens": float(self.burst), "updated": time.monotonic(),
+                "circuit": "closed", "open_until": 0.0, "cooldown": self.cooldown, "strikes": 0, "probing": 0.0,
+                "throttled": 0, "opened": 0,
+            }
+        return state
+
+    def acquire(self, host):
+        """토큰이 생길 때까지 기다린다. 회로가 열려 있으면 CircuitOpenError.
+
+        -> 이 요청이 회로를 닫을지 정하는 시험 요청이면 True. (응답을 알릴 때 probe= 로 넘긴다)
+        """
+        while True:
+            with self._lock:
+                state = self._host(host)
+                now = time.monotonic()
+                if state["circuit"] == "open":
+                    # 시험 요청이 응답을 알리지 못하고 사라졌으면 cooldown 뒤에 새 시험 요청을 허용한다
+                    probing = state["probing"] and now - state["probing"] < state["cooldown"]
+                    if now < state["open_until"] or probing:
+                        raise CircuitOpenError(f"{host} 차단 감지로 요청을 멈췄습니다 ({state['open_until'] - now:.0f}초 후 재시도)")
+                    state["probing"] = now  # cooldown 이 지났으면 요청 하나만 시험으로 보낸다
+                    return True
+                state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * state["rate"])
+                state["updated"] = now
+                if state["tokens"] >= 1:
+                    state["tokens"] -= 1
+                    return False
+                delay = (1 - state["tokens"]) / state["rate"]
+            time.sleep(delay)
+
+    def on_success(self, host, probe=False):
+        with self._lock:
+            state = self._host(host)
+            if state["circuit"] == "open" and not probe:
+                return  # 회로가 열리기 전에 나간 요청의 늦은 응답
+            state["rate"] = min(self.max_rate, state["rate"] + self.increase)
+            state["strikes"] = 0
+            if probe:
+                state.update(circuit="closed", probing=0.0, cooldown=self.cooldown)
+
+    def on_throttle(self, host, reason, probe=False):
+        with self._lock:
+            state = self._host(host)
+            state["throttled"] += 1
+            straggler = state["circuit"] == "open" and not probe
+            opened = False
+            if not straggler:
+                state["rate"] = max(self.min_rate, state["rate"] * self.decrease)
+                state["tokens"] = min(state["tokens"], 0.0)
+                state["strikes"] += 1
+                if probe:
+                    state["cooldown"] = min(self.max_cooldown, state["cooldown"] * 2)
+                opened = probe or state["strikes"] >= self.strikes
+            if opened:
+                state.update(circuit="open", probing=0.0, open_until=time.monotonic() + state["cooldown"])
+                state["opened"] += 1
+        metrics = get_metrics()
+        metrics.inc("ratelimit_throttled_total", host=host, reason=reason)
+        if opened:
+            metrics.inc("circuit_open_total", host=host)
+
+    def on_error(self, host, reason, probe=False):
+        """차단 신호가 아닌 실패 (네트워크 끊김 등). 회로/속도는 건드리지 않는다."""
+        if probe:
+            with self._lock:
+                self._host(host)["probing"] = 0.0
+        get_metrics().inc("ratelimit_errors_total", host=host, reason=reason)
+
+    def open_hosts(self):
+        now = time.monotonic()
+        with self._lock:
+            return [host for host, s in self._hosts.items() if s["circuit"] == "open" and now < s["open_until"]]
+
+    def snapshot(self):
+        """화면 진단용: 호스트마다 현재 속도/회로 상태"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "host": host, "rate": round(s["rate"], 1), "circuit": s["circuit"],
+                    "open_for": max(0.0, round(s["open_until"] - now)) if s["circuit"] == "open" else 0,
+                    "throttled": s["throttled"], "opened": s["opened"],
+                }
+                for host, s in sorted(self._hosts.items())
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limiter():
+    return HostRateLimiter()
@@ -0,0 +1,190 @@
+"""데이터셋별 백그라운드 갱신기.
+
+데이터셋마다 데몬 스레드 하나가 자기 주기(interval)로 수집하고, 수집이 끝난 결과만
+통째로 바꿔 끼운다. 화면은 latest() 로 마지막으로 완성된 버전만 읽으므로 네트워크를 기다리지 않는다.
+
+실행 시각은 interval 단위의 벽시계 경계에 맞춘다. 주기가 같은 데이터셋은 같은 순간에 돌아서
+같은 페이지를 공유(single-flight)할 수 있다.
+
+store 가 try_lease/release 를 지원하면(SnapshotStore) 같은 저장소를 쓰는 레플리카끼리도 single-flight 가
+된다. 주기 구간마다 한 레플리카만 수집권을 잡고 수집해서 저장소에 남기고, 나머지는 그 결과가 저장소에
+나타날 때까지 기다렸다가 그대로 가져다 쓴다. 이미 이번 구간의 결과가 저장소에 있으면 바로 쓴다.
+"""
+import os
+import socket
+import threading
+import time
+
+import pandas as pd
+
+from doragi.metrics import get_metrics
+
+RETRY_DELAY = 30  # 수집 실패/빈 결과 후 다시 시도할 때까지의 시간 (초)
+LEASE_TTL = 120   # 수집권 유효 시간 (초). 수집하던 레플리카가 죽으면 이만큼 뒤에 다른 레플리카가 가져간다.
+LEASE_POLL = 1.0  # 다른 레플리카의 결과를 기다릴 때 저장소를 확인하는 간격 (초)
+
+
+def has_data(value):
+    if isinstance(value, pd.DataFrame): return not value.empty
+    if isinstance(value, tuple): return any(has_data(v) for v in value)
+    return bool(value)
+
+
+def next_boundary(ts, interval):
+    return (int(ts // interval) + 1) * interval
+
+
+class SnapshotRefresher:
+    def __init__(self, store=None, retry_delay=RETRY_DELAY, lease_ttl=LEASE_TTL, lease_poll=LEASE_POLL):
+        self.store = store
+        self.retry_delay = retry_delay
+        self.lease_ttl = lease_ttl
+        self.lease_poll = lease_poll
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._jobs = {}
+        self._latest = {}  # name -> (value, collected_at)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def add_job(self, name, collect, interval, record=None):
+        """collect(on_progress) 는 데이터셋 값을 돌려준다. on_progress(done, total) 는 선택적으로 호출.
+
+        record(value, collected_at) 는 직접 수집한 정상 결과를 저장소에 남긴 뒤 같은 시각으로 호출한다.
+        (다른 레플리카의 결과를 가져다 쓸 때는 부르지 않는다)
+        """
+        job = {
+            "collect": collect, "interval": interval, "record": record, "trigger": threading.Event(), "thread": None,
+            "running": False, "waiting": False, "progress": None, "last_error": None, "last_duration": None,
+            "source": None, "next_run": time.time(),
+        }
+        stored = self.store.load_latest(name) if self.store is not None else None
+        if stored is not None:
+            self._latest[name] = stored
+            job["source"] = "store"
+            job["next_run"] = next_boundary(stored[1], interval)
+        self._jobs[name] = job
+
+    def start(self):
+        for name, job in self._jobs.items():
+            if job["thread"] is None:
+                job["thread"] = threading.Thread(target=self._run, args=(name,), name=f"refresher-{name}", daemon=True)
+                job["thread"].start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for job in self._jobs.values():
+            job["trigger"].set()
+
+    def refresh_now(self, names=None):
+        for name in names or self._jobs:
+            self._jobs[name]["trigger"].set()
+
+    def latest(self, name):
+        """마지막으로 완성된 (value, collected_at). 아직 한 번도 수집되지 않았으면 None."""
+        with self._lock:
+            return self._latest.get(name)
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            collected = {name: snap[1] for name, snap in self._latest.items()}
+        return {
+            name: {
+                "collected_at": collected.get(name), "running": job["running"], "waiting": job["waiting"],
+                "source": job["source"], "progress": job["progress"],
+                "last_error": job["last_error"], "last_duration": job["last_duration"],
+                "next_run_in": max(0.0, job["next_run"] - now), "interval": job["interval"],
+            }
+            for name, job in self._jobs.items()
+        }
+
+    def _run(self, name):
+        job = self._jobs[name]
+        while not self._stop.is_set():
+            delay = job["next_run"] - time.time()
+            if delay > 0:
+                job["trigger"].wait(delay)
+            if self._stop.is_set(): break
+            forced = job["trigger"].is_set()
+            job["trigger"].clear()
+            self._refresh(name, forced)
+
+    def _stored_since(self, name, since):
+        stored = self.store.load_latest(name)
+        return stored if stored is not None and stored[1] >= since else None
+
+    def _wait_for_turn(self, name, since):
+        """수집권을 잡으면 None, 그 사이 다른 레플리카가 since 이후 결과를 남기면 그 (value, collected_at)."""
+        job = self._jobs[name]
+        shared = self._stored_since(name, since)
+        while shared is None and not self.store.try_lease(name, self.owner, self.lease_ttl):
+            job["waiting"] = True
+            if self._stop.wait(self.lease_poll):
+                break
+            shared = self._stored_since(name, since)
+        job["waiting"] = False
+        return shared
+
+    def _adopt(self, name, shared):
+        job = self._jobs[name]
+        with self._lock:
+            current = self._latest.get(name)
+            if current is None or current[1] < shared[1]:
+                self._latest[name] = shared
+        job["source"] = "shared"
+        job["last_error"] = None
+        job["next_run"] = next_boundary(shared[1], job["interval"])
+        get_metrics().inc("refresh_total", dataset=name, source="shared")
+
+    def _refresh(self, name, forced=False):
+        job = self._jobs[name]
+        leased = callable(getattr(self.store, "try_lease", None))
+        if leased:
+            # 손으로 누른 새로고침은 지금 이후의 결과만, 주기 실행은 이번 주기 구간의 결과면 충분하다
+            since = time.time() if forced else time.time() // job["interval"] * job["interval"]
+            shared = self._wait_for_turn(name, since)
+            if shared is not None:
+                return self._adopt(name, shared)
+            if self._stop.is_set():
+                return
+        try:
+            self._collect(name)
+        finally:
+            if leased:
+                self.store.release(name, self.owner)
+
+    def _collect(self, name):
+        job = self._jobs[name]
+        get_metrics().inc("refresh_total", dataset=name, source="crawl")
+        job["running"] = True
+        job["progress"] = None
+        t_start = time.time()
+        value = None
+        try:
+            value = job["collect"](lambda done, total: job.__setitem__("progress", (done, total)))
+            job["last_error"] = None
+        except Exception as e:
+            job["last_error"] = f"{type(e).__name__}: {e}"
+        finally:
+            job["running"] = False
+            job["progress"] = None
+            job["last_duration"] = time.time() - t_start
+
+        collected_at = time.time()
+        ok = value is not None and has_data(value)
+        with self._lock:
+            # 빈 결과는 처음 한 번만 받아들이고, 그 뒤로는 마지막 정상 데이터를 유지한다
+            if ok or (value is not None and name not in self._latest):
+                self._latest[name] = (value, collected_at)
+        if ok:
+            job["source"] = "crawl"
+            if self.store is not None:
+                self.store.save(name, value, collected_at)
+            if job["record"] is not None:
+                job["record"](value, collected_at)
+            job["next_run"] = next_boundary(collected_at, job["interval"])
+        else:
+            if value is not None and job["last_error"] is None:
+                job["last_error"] = "빈 결과"
+            job["next_run"] = collected_at + min(self.retry_delay, job["interval"])
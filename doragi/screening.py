@@ -0,0 +1,181 @@
+"""교집합 후보 전체 AI 스코어링 (배치).
+
+후보마다 화면의 '심층 분석 리포트' 와 같은 프롬프트(같은 뉴스/지표/스냅샷 id)로 Gemini 를 부르고,
+리포트의 'AI 투자 매력도 점수' 와 한줄 평을 뽑아 정렬 가능한 열로 돌려준다. 같은 프롬프트라서
+응답 캐시를 같이 쓰므로, 스코어링이 끝난 종목은 행을 눌러 리포트를 열 때 바로 나온다.
+
+- 동시 요청 수는 스레드풀 크기(max_workers)로 제한한다.
+- 요청마다 timeout 을 걸고, 429/503/시간 초과는 지수 백오프로 다시 시도한다.
+  429 를 받으면 모든 작업자가 같은 시각까지 쉬었다가 다시 보낸다.
+- 성공한 결과만 (모델, 스냅샷, 종목) 키로 TTL 동안 기억한다. 실패(키 오류 등)는 마지막 오류 문구만 남겨
+  화면에 보여 주고, 다음 screen() 때 다시 시도한다.
+- Gemini 설정(genai.configure)은 스크리너가 직접 한다. (api_key 를 주지 않으면 GOOG_API_KEY 환경 변수)
+"""
+import functools
+import os
+import random
+import re
+import threading
+import time
+
+import google.generativeai as genai
+import pandas as pd
+from google.api_core import exceptions as google_exceptions
+
+from doragi.analysis import STOCK_REPORT_REQUEST, build_market_fact, build_stock_system_text, stream_stock_report
+from doragi.cache import TtlCache
+from doragi.collectors import get_stock_fundamentals
+from doragi.history import get_indicator_row
+from doragi.indicators import describe_indicators
+from doragi.intersection import AI_SCORE_COL
+from doragi.news import get_news_aggregator, stock_news_queries
+
+AI_SUMMARY_COL = "AI한줄평"
+
+SCREEN_WORKERS = 4          # 동시에 보낼 Gemini 요청 수
+SCREEN_TIMEOUT = 60         # 요청 하나의 제한 시간 (초)
+SCREEN_MAX_RETRIES = 3
+SCREEN_BACKOFF = 2.0        # 2, 4, 8초 (+ 0~1초 지터)
+SCREEN_TTL = 600            # 테마 스냅샷 주기와 같게
+
+_RETRYABLE = (
+    google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError, TimeoutError,
+)
+_RATE_LIMITED = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+_SCORE_RE = re.compile(r'점수\s*\**\s*[:：]\s*\**\s*(\d{1,3})\s*점')
+_SUMMARY_RE = re.compile(r'한줄\s*평[^:：\n]*[:：]\**\s*(.+)')
+
+
+def parse_score(text):
+    """'* **점수:** 82점' -> 82. 0~100 이 아니거나 못 찾으면 None."""
+    match = _SCORE_RE.search(text or "")
+    if not match:
+        return None
+    score = int(match.group(1))
+    return score if 0 <= score <= 100 else None
+
+
+def parse_summary(text):
+    match = _SUMMARY_RE.search(text or "")
+    return match.group(1).strip().strip("*").strip() if match else ""
+
+
+def _is_rate_limited(e):
+    return isinstance(e, _RATE_LIMITED) or "429" in str(e)
+
+
+def _is_retryable(e):
+    return isinstance(e, _RETRYABLE) or _is_rate_limited(e)
+
+
+class ScreeningError(Exception):
+    """재시도까지 실패한 종목. (TtlCache 가 기억하지 않도록 결과 대신 예외로 올린다)"""
+
+
+class BatchScreener:
+    def __init__(self, max_workers=SCREEN_WORKERS, timeout=SCREEN_TIMEOUT, max_retries=SCREEN_MAX_RETRIES,
+                 backoff=SCREEN_BACKOFF, ttl=SCREEN_TTL, api_key=None):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._cache = TtlCache(self._screen, ttl=ttl, max_workers=max_workers, name="screening")
+        self._errors = {}  # key -> 마지막 실패 결과 (성공하거나 다시 시도하면 지운다)
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retried": 0, "rate_limited": 0, "failed": 0}
+
+    @staticmethod
+    def make_keys(df, model_name, snapshot_id):
+        return [
+            (model_name, snapshot_id, row["code"], row["종목명"], row["테마명"], row["현재가(등락률)"])
+            for row in df.to_dict("records")
+        ]
+
+    def _wait_turn(self):
+        with self._lock:
+            delay = self._pause_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _back_off(self, attempt, rate_limited):
+        delay = self.backoff * 2 ** attempt + random.uniform(0, 1)
+        with self._lock:
+            self.stats["retried"] += 1
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+                self._pause_until = max(self._pause_until, time.time() + delay)
+        if not rate_limited:
+            time.sleep(delay)
+
+    def _screen(self, key):
+        model_name, snapshot_id, code, stock_name, theme, price_text = key
+        news_data = get_news_aggregator().search(stock_news_queries(stock_name), limit=10)
+        market_str = build_market_fact(
+            stock_name, code, theme, get_stock_fundamentals(code), price_text, describe_indicators(get_indicator_row(code))
+        )
+        system_text = build_stock_system_text(market_str, news_data, (stock_name, theme))
+        contents = [{"role": "user", "parts": [STOCK_REPORT_REQUEST.format(name=stock_name)]}]
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_turn()
+            with self._lock:
+                self.stats["requests"] += 1
+            try:
+                text = "".join(stream_stock_report(
+                    model_name, snapshot_id, system_text, contents, request_options={"timeout": self.timeout}
+                ))
+                return {"score": parse_score(text), "summary": parse_summary(text), "error": None}
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    with self._lock:
+                        self.stats["failed"] += 1
+                    raise ScreeningError(f"{type(e).__name__}: {e}") from e
+                self._back_off(attempt, _is_rate_limited(e))
+
+    def _result(self, key):
+        try:
+            result = self._cache.get(key)
+        except ScreeningError as e:
+            result = {"score": None, "summary": "", "error": str(e)}
+            with self._lock:
+                self._errors[key] = result
+            return result
+        with self._lock:
+            self._errors.pop(key, None)
+        return result
+
+    def peek(self, df, model_name, snapshot_id):
+        """지금까지 끝난 결과만 df 와 같은 순서로. (아직인 종목은 None, 실패한 종목은 마지막 오류)"""
+        keys = self.make_keys(df, model_name, snapshot_id)
+        with self._lock:
+            errors = dict(self._errors)
+        return [self._cache.peek(key) or errors.get(key) for key in keys]
+
+    def screen(self, df, model_name, snapshot_id, on_progress=None, api_key=None):
+        """df 전체를 스코어링하고 끝날 때까지 기다린다. -> df 와 같은 순서의 결과 목록"""
+        api_key = api_key or self.api_key or os.environ.get("GOOG_API_KEY")
+        if api_key: genai.configure(api_key=api_key)
+        keys = self.make_keys(df, model_name, snapshot_id)
+        self._cache.prefetch(keys)
+        results = []
+        for done, key in enumerate(keys, 1):
+            results.append(self._result(key))
+            if on_progress: on_progress(done, len(keys))
+        return results
+
+
+@functools.lru_cache(maxsize=None)
+def get_screener():
+    return BatchScreener()
+
+
+def attach_scores(df, results):
+    """results (screen/peek 결과) 를 AI점수 / AI한줄평 열로 붙인다."""
+    df = df.copy()
+    df[AI_SCORE_COL] = pd.array([r["score"] if r else None for r in results], dtype="Int64")
+    df[AI_SUMMARY_COL] = [(r["summary"] or r["error"] or "") if r else "" for r in results]
+    return df
@@ -0,0 +1,155 @@
+"""수집 결과(DataFrame, 코드 집합 등)를 SQLite 에 남겨 재시작 후에도 바로 쓰게 하는 스냅샷 저장소.
+
+한 행은 (dataset, collected_at) 하나이며 값은 JSON 으로 직렬화한다.
+DataFrame / set / tuple 은 태그를 붙여 저장하고 읽을 때 원래 타입으로 되돌린다.
+
+같은 DORAGI_DATA_DIR 을 쓰는 여러 프로세스(레플리카)는 leases 표로 "이번 주기에 이 데이터셋은 누가
+수집하는가" 를 정한다. (try_lease / release, SnapshotRefresher 가 사용)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from doragi.columnar import compact_frame
+
+DEFAULT_DATA_DIR = os.environ.get(
+    "DORAGI_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
+DEFAULT_DB_PATH = os.path.join(DEFAULT_DATA_DIR, "snapshots.sqlite3")
+KEEP_PER_DATASET = 6    # 데이터셋별로 남길 스냅샷 수
+MAX_AGE = 7 * 24 * 3600 # 이보다 오래된 스냅샷은 압축 때 지운다 (초)
+
+
+def _encode(value):
+    if isinstance(value, pd.DataFrame):
+        return {"__df__": json.loads(value.to_json(orient="split", force_ascii=False)), "attrs": value.attrs}
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": sorted(value)}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if "__df__" in value:
+            split = value["__df__"]
+            df = pd.DataFrame(split["data"], columns=split["columns"])
+            df.attrs.update(value.get("attrs", {}))
+            return compact_frame(df)
+        if "__set__" in value:
+            return set(value["__set__"])
+        if "__tuple__" in value:
+            return tuple(_decode(v) for v in value["__tuple__"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+class SnapshotStore:
+    """데이터셋별 스냅샷을 collected_at(유닉스 시각) 기준으로 저장/조회한다. 여러 스레드에서 써도 된다."""
+
+    def __init__(self, path=DEFAULT_DB_PATH, keep=KEEP_PER_DATASET, max_age=MAX_AGE):
+        self.path = path
+        self.keep = keep
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._memo = {}  # dataset -> (collected_at, value), 같은 스냅샷을 매번 JSON 으로 풀지 않기 위함
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " dataset TEXT NOT NULL, collected_at REAL NOT NULL, payload TEXT NOT NULL,"
+                " PRIMARY KEY (dataset, collected_at))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " dataset TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, dataset, value, collected_at=None):
+        collected_at = time.time() if collected_at is None else collected_at
+        payload = json.dumps(_encode(value), ensure_ascii=False)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (dataset, collected_at, payload) VALUES (?, ?, ?)",
+                (dataset, collected_at, payload),
+            )
+            self._memo[dataset] = (collected_at, value)
+        self.compact(dataset)
+        return collected_at
+
+    def load_latest(self, dataset):
+        """(value, collected_at) 또는 저장된 스냅샷이 없으면 None."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT collected_at FROM snapshots WHERE dataset = ? ORDER BY collected_at DESC LIMIT 1",
+                (dataset,),
+            ).fetchone()
+            if row is None:
+                return None
+            collected_at = row[0]
+            memo = self._memo.get(dataset)
+            if memo is not None and memo[0] == collected_at:
+                return memo[1], collected_at
+            payload = conn.execute(
+                "SELECT payload FROM snapshots WHERE dataset = ? AND collected_at = ?", (dataset, collected_at)
+            ).fetchone()[0]
+            value = _decode(json.loads(payload))
+            self._memo[dataset] = (collected_at, value)
+            return value, collected_at
+
+    def try_lease(self, dataset, owner, ttl):
+        """dataset 수집권을 ttl 초 동안 잡는다. 다른 owner 가 아직 유효한 수집권을 갖고 있으면 False.
+
+        한 문장(UPSERT)으로 처리하므로 여러 프로세스가 동시에 불러도 한 곳만 True 를 받는다.
+        수집하던 프로세스가 죽어도 ttl 이 지나면 다른 프로세스가 가져간다.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                "INSERT INTO leases (dataset, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(dataset) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE leases.expires_at < ? OR leases.owner = excluded.owner",
+                (dataset, owner, now + ttl, now),
+            ).rowcount == 1
+
+    def release(self, dataset, owner):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE dataset = ? AND owner = ?", (dataset, owner))
+
+    def compact(self, dataset=None):
+        """데이터셋별로 최근 keep 개만 남기고, max_age 보다 오래된 스냅샷은 지운다. (가장 최근 것은 항상 남김)"""
+        cutoff = time.time() - self.max_age
+        with self._lock, self._connect() as conn:
+            datasets = [dataset] if dataset else [r[0] for r in conn.execute("SELECT DISTINCT dataset FROM snapshots")]
+            removed = 0
+            for name in datasets:
+                removed += conn.execute(
+                    "DELETE FROM snapshots WHERE dataset = ? AND collected_at < ("
+                    " SELECT MAX(collected_at) FROM snapshots WHERE dataset = ?) AND (collected_at < ? OR collected_at NOT IN ("
+                    " SELECT collected_at FROM snapshots WHERE dataset = ? ORDER BY collected_at DESC LIMIT ?))",
+                    (name, name, cutoff, name, self.keep),
+                ).rowcount
+            return removed
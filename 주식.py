@@ -1,14 +1,32 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
+import altair as alt
 import pandas as pd
 import time
-import re
-import google.generativeai as genai
-import urllib.parse
-import random
-import email.utils
-from datetime import datetime, timedelta
+from doragi.analysis import (
+    STOCK_REPORT_REQUEST, analyze_market_macro_v2, build_market_fact, get_gemini_response_stock_deep, get_llm_cache,
+    list_gemini_models,
+)
+from doragi.chat_context import ChatContext
+from doragi.collectors import (
+    DATASETS, UNIVERSE, build_refresher, get_fundamentals_cache, get_theme_detail_cache, invalidate_dataset,
+    peek_stock_fundamentals,
+)
+from doragi.columnar import memory_bytes
+from doragi.history import TIMEFRAMES, get_ohlcv_cache, peek_indicators, peek_ohlcv
+from doragi.indicators import BREAKOUT_COL, RSI_COL, VOLUME_RATIO_COL, attach_indicators, describe_indicators
+from doragi.intersection import (
+    SORT_OPTIONS, compute_intersection, sort_frame, AI_SCORE_COL, MARKET_CAP_COL, STOCK_VELOCITY_COL, STREAK_COL,
+    THEME_VELOCITY_COL, TRADING_VALUE_COL,
+)
+from doragi.metrics import get_metrics
+from doragi.news import get_news_aggregator, news_source_label, select_news, stock_news_queries
+from doragi.parsers import THEME_LIMIT
+from doragi.quotes import QUOTE_INTERVAL, apply_quotes, diff_quotes, format_quote, get_quote_board
+from doragi.rank_history import FIRST_SEEN_COL, attach_rank_features, get_rank_history
+from doragi.ratelimit import get_rate_limiter
+from doragi.screening import AI_SUMMARY_COL, attach_scores, get_screener
+from doragi.snapshot_store import SnapshotStore
+from datetime import datetime
 
 # ==========================================
 # 🔑 [필수] Gemini API 키 설정
@@ -31,392 +49,120 @@ if "current_news_data" not in st.session_state:
     st.session_state.current_news_data = [] 
 if "current_market_fact" not in st.session_state:
     st.session_state.current_market_fact = ""
+if "chat_context" not in st.session_state:
+    st.session_state.chat_context = ChatContext()
+if "live_quotes" not in st.session_state:
+    st.session_state.live_quotes = {}
 
-# --- 안전 필터 해제 ---
-safety_settings = [
-    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-]
-
-# --- [공통] 사람처럼 보이기 위한 강력한 헤더 ---
-def get_headers():
-    return {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7',
-        'Referer': 'https://finance.naver.com/',
-        'Connection': 'keep-alive'
-    }
+# --- [공유 객체] 수집/분석 로직은 doragi 패키지에 있고, 여기서는 프로세스 공용 인스턴스만 꺼내 쓴다 ---
+fundamentals_cache = get_fundamentals_cache()
+news_aggregator = get_news_aggregator()
+llm_cache = get_llm_cache()
+screener = get_screener()
+ohlcv_cache = get_ohlcv_cache()
+quote_board = get_quote_board()
+rank_history = get_rank_history()
+metrics = get_metrics()
 
 # --- [모델 목록] ---
 @st.cache_data(ttl=3600)
 def get_available_gemini_models(api_key):
-    try:
-        genai.configure(api_key=api_key)
-        return [m.name.replace("models/", "") for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-    except: return ["gemini-1.5-flash"]
-
-# --- [Google News RSS 수집기] ---
-def fetch_google_news_rss(keyword, limit=10):
-    news_data = []
-    try:
-        search_query = f"{keyword} when:7d"
-        encoded_kw = urllib.parse.quote(search_query)
-        
-        # 구글용 헤더는 별도로 간단하게 설정 (구글은 Referer 체크 안함)
-        google_headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-        
-        url = f"https://news.google.com/rss/search?q={encoded_kw}&hl=ko&gl=KR&ceid=KR:ko&scoring=n&t={int(time.time())}"
-        
-        # 타임아웃 제거, 헤더 적용
-        res = requests.get(url, headers=google_headers)
-        
-        if res.status_code == 200:
-            soup = BeautifulSoup(res.content, 'xml')
-            items = soup.find_all('item')
-            
-            for item in items:
-                title = item.title.text
-                link = item.link.text
-                pub_date = item.pubDate.text
-                raw_desc = item.description.text
-                clean_desc = BeautifulSoup(raw_desc, "html.parser").get_text(separator=" ", strip=True)
-                
-                dt_object = None
-                try:
-                    dt_object = email.utils.parsedate_to_datetime(pub_date)
-                    now = datetime.now(dt_object.tzinfo)
-                    if dt_object < (now - timedelta(days=7)): 
-                        continue
-                except:
-                    pass
-
-                source = "News"
-                if "-" in title:
-                    parts = title.rsplit("-", 1)
-                    if len(parts) > 1:
-                        source = parts[1].strip()
-                        title = parts[0].strip()
-                    
-                news_data.append({
-                    "source": source, "title": title, "link": link,
-                    "summary": clean_desc, "date": pub_date, "date_obj": dt_object
-                })
-            
-            news_data.sort(key=lambda x: x['date_obj'] if x['date_obj'] else datetime.min.replace(tzinfo=None), reverse=True)
-            news_data = news_data[:limit]
+    return list_gemini_models(api_key)
 
-    except Exception as e:
-        print(f"RSS Error: {e}")
-    return news_data
-
-# --- [데이터 수집 1: 테마 상위 50개 (헤더 강화)] ---
-@st.cache_data(ttl=600)
-def get_top_50_themes_stocks():
-    url = "https://finance.naver.com/sise/theme.naver"
-    all_theme_stocks = [] 
-    
-    status_text = st.empty()
-    progress_bar = st.progress(0)
-    
-    try:
-        status_text.text("⏳ 테마 목록 수집 중...")
-        # [수정] 위장 헤더 사용, 타임아웃 제거
-        res = requests.get(url, headers=get_headers())
-        soup = BeautifulSoup(res.content.decode('cp949', 'ignore'), 'html.parser')
-        
-        theme_links = []
-        for row in soup.select("#contentarea_left > table.type_1 > tr"):
-            cols = row.select("td")
-            if len(cols) >= 4:
-                theme_name = cols[0].text.strip()
-                link = "https://finance.naver.com" + cols[0].find('a')['href']
-                theme_links.append({"name": theme_name, "link": link})
-                if len(theme_links) >= 50: break
-        
-        total = len(theme_links)
-        for idx, theme in enumerate(theme_links):
-            status_text.text(f"🔍 테마 분석 중 ({idx+1}/{total}): {theme['name']}")
-            progress_bar.progress((idx + 1) / total)
-            
-            try:
-                # [수정] 위장 헤더 사용
-                res_t = requests.get(theme['link'], headers=get_headers())
-                soup_t = BeautifulSoup(res_t.content.decode('cp949', 'ignore'), 'html.parser')
-                
-                inner_rank = 1
-                for row in soup_t.select("table.type_5 > tbody > tr"):
-                    cols = row.select("td")
-                    if len(cols) > 4:
-                        name_tag = cols[0].find('a')
-                        if not name_tag: continue
-                        stock_name = name_tag.text.strip()
-                        link_sub = name_tag['href']
-                        code_match = re.search(r'code=([0-9]+)', link_sub)
-                        code = code_match.group(1) if code_match else ""
-                        price_str = cols[2].text.strip() + " (" + cols[4].text.strip().replace('\n', '').strip() + ")"
-                        
-                        rank_display = f"👑 {inner_rank}위" if inner_rank == 1 else f"{inner_rank}위"
-                        
-                        all_theme_stocks.append({
-                            "code": code, "종목명": stock_name, "테마명": theme['name'],
-                            "테마순위": f"{idx+1}위", "테마순위_int": idx+1,
-                            "테마내순위": rank_display,
-                            "현재가(등락률)": price_str
-                        })
-                        inner_rank += 1
-                # [중요] 봇 탐지 회피를 위한 최소한의 매너 (0.1초 휴식)
-                time.sleep(0.1)
-            except: pass
-            
-        status_text.empty()
-        progress_bar.empty()
-        
-    except Exception as e:
-        status_text.error(f"테마 수집 중 오류: {e}")
-        
-    return pd.DataFrame(all_theme_stocks)
+# --- [백그라운드 갱신: 데이터셋마다 자기 주기로 수집하고 완성된 결과만 교체] ---
+DATASET_LABELS = {
+    "themes": "🔥 테마", "risers": "📈 상승률", "gainers": "🚀 급등주",
+    "trading_value": "💰 거래대금", "market_cap": "🏢 시가총액",
+}
 
-# --- [데이터 수집 2: 상승률 상위 (헤더 강화)] ---
-@st.cache_data(ttl=600)
-def get_risers_data_with_market():
-    riser_map = {}
-    
-    for s, market_name in [(0, "KOSPI"), (1, "KOSDAQ")]:
-        try:
-            url = f"https://finance.naver.com/sise/sise_rise.naver?sosok={s}"
-            # [수정] 위장 헤더 사용
-            res = requests.get(url, headers=get_headers())
-            soup = BeautifulSoup(res.content.decode('cp949', 'ignore'), 'html.parser')
-            
-            for item in soup.select("table.type_2 tr td a.tltle"):
-                link = item['href']
-                code_match = re.search(r'code=([0-9]+)', link)
-                if code_match:
-                    code = code_match.group(1)
-                    riser_map[code] = market_name
-        except Exception as e:
-            pass
-    return riser_map
+@st.cache_resource
+def get_refresher():
+    """프로세스당 하나. 디스크에 남은 마지막 스냅샷을 먼저 올려 두고 수집 스레드를 띄운다."""
+    return build_refresher(store=SnapshotStore()).start()
 
-# --- [데이터 수집 3: 급등주 DF (헤더 강화)] ---
-@st.cache_data(ttl=600)
-def get_top_gainers_df(limit=150):
-    kospi_gainers = []
-    kosdaq_gainers = []
-    
-    for market_code, result_list in [(0, kospi_gainers), (1, kosdaq_gainers)]:
-        try:
-            url = f"https://finance.naver.com/sise/sise_rise.naver?sosok={market_code}"
-            # [수정] 위장 헤더 사용
-            res = requests.get(url, headers=get_headers())
-            soup = BeautifulSoup(res.content.decode('cp949', 'ignore'), 'html.parser')
-            rows = soup.select("table.type_2 tr")
-            count = 0
-            for row in rows:
-                cols = row.select("td")
-                if len(cols) < 5: continue
-                name_tag = cols[1].find('a')
-                if not name_tag: continue
-                result_list.append({
-                    "종목명": name_tag.text.strip(),
-                    "현재가": cols[2].text.strip(),
-                    "등락률": cols[4].text.strip().replace('\n', '').strip()
-                })
-                count += 1
-                if count >= limit: break
-        except: pass
-    return pd.DataFrame(kospi_gainers), pd.DataFrame(kosdaq_gainers)
+refresher = get_refresher()
 
-# --- [데이터 수집 4: 거래대금 상위 (헤더 강화)] ---
-@st.cache_data(ttl=600)
-def get_money_flow_codes():
-    mf_codes = set()
-    
-    status_text = st.empty()
-    progress_bar = st.progress(0)
-    total_steps = 10
-    current_step = 0
-    
-    for s, market_name in [(0, "KOSPI"), (1, "KOSDAQ")]:
-        for page in range(1, 6):
-            current_step += 1
-            status_text.text(f"💰 거래대금 수집 중... ({market_name} {page}/5)")
-            progress_bar.progress(current_step / total_steps)
-            
-            try:
-                url = f"https://finance.naver.com/sise/sise_market_sum.naver?sosok={s}&sort=amount&page={page}"
-                # [수정] 위장 헤더 사용
-                res = requests.get(url, headers=get_headers())
-                soup = BeautifulSoup(res.content.decode('cp949', 'ignore'), 'html.parser')
-                items = soup.select("table.type_2 tbody tr td:nth-child(2) a")
-                for item in items:
-                    link = item['href']
-                    code_match = re.search(r'code=([0-9]+)', link)
-                    if code_match:
-                        mf_codes.add(code_match.group(1))
-            except: pass
-            
-    status_text.empty()
-    progress_bar.empty()
-    return mf_codes
+def refresh_datasets(names=None):
+    """고른 데이터셋만 페이지를 새로 받아 다시 수집한다. (다른 데이터셋, Gemini 모델 목록 등은 그대로)"""
+    for name in names or DATASETS:
+        invalidate_dataset(name)
+    refresher.refresh_now(names)
 
-def get_stock_fundamentals(code):
-    try:
-        url = f"https://finance.naver.com/item/main.naver?code={code}"
-        # [수정] 위장 헤더 사용
-        res = requests.get(url, headers=get_headers())
-        soup = BeautifulSoup(res.content.decode('cp949', 'ignore'), 'html.parser')
-        cap_elem = soup.select_one("#_market_sum")
-        if cap_elem:
-            raw_cap = cap_elem.text.strip()
-            raw_cap = re.sub(r'[議兆]', '조', raw_cap)
-            raw_cap = raw_cap.replace('\t', '').replace('\n', '').replace('  ', ' ') + "억"
-            return {"시가총액": raw_cap}
-    except: pass
-    return {"시가총액": "-"}
+def _size(name):
+    """데이터셋의 현재 스냅샷이 차지하는 메모리 (모든 세션이 이 한 벌을 같이 읽는다)"""
+    latest = refresher.latest(name)
+    return f"{memory_bytes(latest[0]) / 1024:,.0f}KB" if latest else "-"
 
-@st.cache_data(ttl=600)
-def get_market_cap_top150():
-    stocks = []
-    for page in range(1, 4):
-        try:
-            url = f"https://finance.naver.com/sise/sise_market_sum.naver?sosok=0&page={page}"
-            # [수정] 위장 헤더 사용
-            res = requests.get(url, headers=get_headers())
-            soup = BeautifulSoup(res.content.decode('cp949', 'ignore'), 'html.parser')
-            for row in soup.select("table.type_2 tbody tr"):
-                cols = row.select("td")
-                if len(cols) < 10: continue
-                stocks.append({
-                    "순위": cols[0].text.strip(), "종목명": cols[1].text.strip(),
-                    "현재가": cols[2].text.strip(), "등락률": cols[4].text.strip().replace("\n", "").strip(),
-                    "시가총액": cols[6].text.strip()
-                })
-        except: pass
-    return pd.DataFrame(stocks)
+def _candle_chart(df):
+    """OHLCV DataFrame -> 캔들 + 5/20/60 이동평균 (altair, 확대/이동 가능)"""
+    df = df.assign(**{f"MA{w}": df["종가"].rolling(w).mean() for w in (5, 20, 60)})
+    base = alt.Chart(df).encode(x=alt.X("날짜:T", title=None))
+    color = alt.condition("datum.시가 <= datum.종가", alt.value("#e03131"), alt.value("#1c7ed6"))
+    wick = base.mark_rule().encode(y=alt.Y("저가:Q", scale=alt.Scale(zero=False), title=None), y2="고가:Q", color=color)
+    body = base.mark_bar().encode(y="시가:Q", y2="종가:Q", color=color, tooltip=["날짜:T", "시가", "고가", "저가", "종가", "거래량"])
+    ma = base.transform_fold(["MA5", "MA20", "MA60"], as_=["선", "값"]).mark_line(strokeWidth=1).encode(
+        y="값:Q", color=alt.Color("선:N", legend=alt.Legend(orient="top", title=None))
+    )
+    return (wick + body + ma).interactive()
 
-# --- [AI 응답 함수 1: 개별 종목] ---
-def get_gemini_response_stock_deep(messages, model_name, stock_name, theme, market_data_str, news_data):
-    genai.configure(api_key=GOOG_API_KEY)
-    
-    combined_news_context = ""
-    if news_data:
-        for i, item in enumerate(news_data):
-            combined_news_context += f"[{i+1}. {item['source']}] {item['title']} ({item['date']})\n> 요약: {item['summary']}\n\n"
-    else:
-        combined_news_context = "(수집된 뉴스가 없습니다. 시장 데이터 위주로 분석하세요.)"
-        
-    search_res = f"""
-    \n[현재 분석 중인 종목 데이터]
-    1. 📊 시장 팩트: {market_data_str}
-    2. 📰 뉴스 데이터 (총 {len(news_data)}건):
-    {combined_news_context}
-    """
-    
-    sys_instructions = """
-    [Role]
-    당신은 냉철한 판단력을 가진 세계최고 주식 애널리스트 겸 분석가 입니다.
-    제공된 [정량 데이터]와 [뉴스 데이터]를 기반으로 사용자의 질문에 답변하십시오.
-    
-    [Instruction]
-    - 질문이 "분석해줘" 같은 요청이면 아래 포맷으로 리포트를 작성하세요.
-    - 긴말하지 말고 핵심만 명확하게 전달하세요.
-    
-    [Report Format]
-    ### 1. 🎯 AI 투자 매력도 점수 (100점 만점)
-    * **점수:** OOO점
-    * **한줄 평:** (상승 동력 및 리스크 요약)
-    
-    ### 2. 🚀 핵심 상승 동력 (Fact Base)
-    * 뉴스에서 확인된 실체 있는 호재 3가지를 요약.
-    
-    ### 3. ⚠️ 리스크 및 수급 점검
-    * 과열 여부, 대주주 매도, 테마 대장주 여부 등 판단.
-    
-    ### 4. 💡 실전 매매 전략
-    * **포지션:** [적극 매수 / 눌림목 매수 / 관망 / 매도]
-    * **전략:** 구체적인 진입/대응 가이드.
-    """
-    
-    modified_msgs = []
-    for msg in messages[:-1]:
-        modified_msgs.append({"role": "user" if msg['role']=="user" else "model", "parts": [msg['content']]})
-    
-    last_content = messages[-1]['content'] + search_res + "\n\n" + sys_instructions
-    modified_msgs.append({"role": "user", "parts": [last_content]})
-    
-    model = genai.GenerativeModel(f"models/{model_name}")
-    try:
-        response = model.generate_content(modified_msgs, stream=True, safety_settings=safety_settings)
-        for chunk in response:
-            try:
-                if chunk.text: yield chunk.text
-            except ValueError: pass
-    except Exception as e:
-        yield f"⚠️ 응답 중 오류: {str(e)}"
+def _ago(ts):
+    return f"{int(time.time() - ts)}초 전" if ts else "-"
 
-# --- [AI 응답 함수 2: 시황 분석] ---
-def analyze_market_macro_v2(df_cap, df_gainers_kospi, df_gainers_kosdaq, news_data, model_name):
-    genai.configure(api_key=GOOG_API_KEY)
-    model = genai.GenerativeModel(f"models/{model_name}")
-    
-    str_cap = df_cap.head(50).to_string(index=False)
-    str_kospi_gain = df_gainers_kospi.head(50).to_string(index=False)
-    str_kosdaq_gain = df_gainers_kosdaq.head(50).to_string(index=False)
-    
-    combined_news = ""
-    for item in news_data:
-        combined_news += f"[{item['source']}] {item['title']}\n(요약): {item['summary']}\n\n"
-    
-    prompt = f"""
-    당신은 거시경제와 시장 흐름을 읽는 국내 최고 '마켓스트래티지스트겸 애널리스트 입니다.
-    긴말하지말고 바로 분석에 들어가 주세요.
-    
-    [입력 데이터]
-    1. Blue Chips (50위): {str_cap}
-    2. Momentum (급등주): {str_kospi_gain} / {str_kosdaq_gain}
-    3. News: {combined_news}
-    
-    [분석 요구사항]
-    위 데이터를 종합하여 '대형주(지수)'와 '개별 급등주(테마)'의 괴리를 분석하고,
-    오늘 시장의 **'진짜 주도 흐름'**을 명확히 정의해 주세요.
-    
-    ### 1. 🌍 오늘의 시장 세줄 요약 (Market Color)
-    * (예: "지수는 보합이나 2차전지와 AI 로봇 테마가 폭발하는 종목 장세")
-    
-    ### 2. 💰 자금 흐름 추적 (Money Flow)
-    * **대형주:** 반도체, 바이오, 금융 등 시총 상위 섹터의 수급은 어떻습니까?
-    * **개별주:** 급등주 리스트에서 공통적으로 보이는 **'오늘의 강세 테마'**는 무엇입니까?
-    
-    ### 3. 📈 주요 거시 요인 분석
-    * 환율, 금리, 미 증시 영향, 정부 정책 등이 오늘 시장에 미친 영향.
-    
-    ### 4. 💼 투자자 대응 가이드
-    * 오늘 같은 장세에서는 **어떤 스타일의 투자**가 유리합니까? (돌파 매매 vs 눌림목 매수 vs 현금 확보)
-    """
-    
-    try:
-        response = model.generate_content(prompt, stream=True, safety_settings=safety_settings)
-        for chunk in response:
-            try:
-                if chunk.text: yield chunk.text
-            except ValueError: pass
-    except Exception as e:
-        yield f"⚠️ 분석 중 오류: {str(e)}"
+def _metrics_table(rows):
+    """진단 패널용: 시리즈 하나당 한 줄 (초 단위 지표는 ms 로)"""
+    table = []
+    for row in rows:
+        scale = 1000 if row["metric"].endswith("_seconds") else 1
+        unit = row["metric"].replace("_seconds", "_ms")
+        labels = ", ".join(f"{k}={v}" for k, v in row["labels"].items())
+        if row["type"] == "counter":
+            table.append({"지표": unit, "라벨": labels, "횟수/값": row["value"]})
+        else:
+            table.append({
+                "지표": unit, "라벨": labels, "횟수/값": row["count"],
+                "평균": round(row["avg"] * scale, 1), "p95": round(row["p95"] * scale, 1), "최대": round(row["max"] * scale, 1),
+            })
+    return table
 
 # ==========================================
 # 🖥️ 메인 실행
 # ==========================================
 with st.sidebar:
     st.header("🔍 설정")
+    # 테마는 목록에서 순위/등락률이 바뀐 테마의 상세만 다시 받으므로 전체 새로고침도 바뀐 만큼만 비용이 든다
     if st.button("🔄 데이터 새로고침"):
-        st.cache_data.clear()
+        refresh_datasets()
         st.session_state.current_news_data = [] 
         st.rerun()
     
+    with st.expander("🗂️ 데이터 갱신 상태", expanded=False):
+        for name, info in refresher.status().items():
+            c_info, c_btn = st.columns([5, 1])
+            if info["waiting"]:
+                state = "🔗 다른 인스턴스 수집 대기"
+            elif info["running"]:
+                state = "🔄 수집 중"
+            else:
+                state = ("🔗 공유 | " if info["source"] == "shared" else "") + f"⏱️ {int(info['next_run_in'])}초 후"
+            c_info.caption(f"{DATASET_LABELS[name]}: {_ago(info['collected_at'])} 수집 | {_size(name)} | {state}")
+            if c_btn.button("🔄", key=f"refresh_{name}", help=f"{DATASET_LABELS[name]}만 새로고침"):
+                refresh_datasets([name])
+                st.rerun()
+            if info["last_error"]:
+                st.caption(f"⚠️ {info['last_error']}")
+        if st.button("🧹 테마 상세 전부 다시 받기"):
+            get_theme_detail_cache().clear()
+            refresh_datasets(["themes"])
+            st.rerun()
+
+    # 상위 N 은 시장별 값이다. 프로세스 전체(갱신기/모든 세션)가 같이 쓰므로 배포 시 환경 변수로만 정한다.
+    with st.expander("📏 수집 범위 (시장별)", expanded=False):
+        st.caption(
+            f"테마 상위 {THEME_LIMIT}개 | 상승률 상위 {UNIVERSE['risers_top_n']} | 거래대금 상위 {UNIVERSE['trading_value_top_n']}"
+            f" | 등락률 하한 {UNIVERSE['risers_min_change'] or '없음'} | 거래대금 하한 {UNIVERSE['trading_value_min'] or '없음'}"
+        )
+        st.caption("변경: DORAGI_RISERS_TOP_N / DORAGI_TRADING_TOP_N / DORAGI_RISERS_MIN_CHANGE / DORAGI_TRADING_VALUE_MIN 환경 변수")
+    
     if GOOG_API_KEY.startswith("AIza"):
         models = get_available_gemini_models(GOOG_API_KEY)
         
@@ -435,56 +181,180 @@ with st.sidebar:
     else:
         st.error("API 키 필요")
         selected_real_name = "gemini-1.5-flash"
+    
+    llm_total = llm_cache.stats["hits"] + llm_cache.stats["misses"]
+    st.caption(f"🧠 AI 응답 캐시 적중률 {llm_cache.hit_rate:.0%} ({llm_cache.stats['hits']}/{llm_total})")
+    
+    with st.expander("🩺 성능 진단", expanded=False):
+        # 호스트별 요청 속도 (정상 응답이면 오르고 429/5xx/차단 페이지면 절반으로)
+        host_rows = get_rate_limiter().snapshot()
+        if host_rows:
+            st.dataframe(host_rows, hide_index=True, use_container_width=True)
+        metric_rows = metrics.snapshot()
+        if metric_rows:
+            st.dataframe(_metrics_table(metric_rows), hide_index=True, use_container_width=True)
+            d1, d2 = st.columns(2)
+            d1.download_button("JSONL", metrics.to_jsonl(), file_name="doragi_metrics.jsonl", mime="application/x-ndjson")
+            d2.download_button("Prometheus", metrics.to_prometheus(), file_name="doragi_metrics.prom", mime="text/plain")
+        else:
+            st.caption("아직 기록된 지표가 없습니다.")
 
-# 초기 데이터 로딩
-with st.status("🚀 데이터 수집 시작 (진행바가 표시됩니다)...", expanded=True) as status:
-    df_themes = get_top_50_themes_stocks() 
-    riser_data = get_risers_data_with_market() 
-    mf_codes = get_money_flow_codes()
-    df_market_cap = get_market_cap_top150()
-    df_kospi_gainers, df_kosdaq_gainers = get_top_gainers_df(limit=150)
+# 초기 데이터: 백그라운드 갱신기가 완성해 둔 최신 스냅샷만 읽는다
+# 첫 기동 때는 다섯 데이터셋이 동시에 수집되고, 준비된 데이터셋의 화면부터 먼저 그린다
+# 첫 수집이 실패한 데이터셋은 '수집 중' 이 아니라 오류로 보여 준다 (갱신기가 retry_delay 뒤에 다시 시도)
+def _first_errors(status, names):
+    return {name: status[name]["last_error"] for name in names if status[name]["last_error"] and not status[name]["running"]}
+
+missing = [name for name in DATASETS if refresher.latest(name) is None]
+dataset_errors = _first_errors(refresher.status(), missing)
+if missing:
+    # 전부 실패해서 재시도를 기다리는 동안은 천천히 확인한다
+    @st.fragment(run_every=5 if len(dataset_errors) == len(missing) else 0.5)
+    def startup_progress(missing, errors):
+        # 기다리던 데이터셋이 준비되거나 실패/재시도로 바뀌면 전체를 다시 돌려서 그 부분을 그린다
+        status = refresher.status()
+        if any(status[name]["collected_at"] is not None for name in missing) or _first_errors(status, missing) != errors:
+            st.rerun()
+        for name in missing:
+            info = status[name]
+            if name in errors:
+                st.text(f"⚠️ {DATASET_LABELS[name]} 수집 실패: {errors[name]} ({int(info['next_run_in'])}초 후 다시 시도)")
+            else:
+                done_total = info["progress"]
+                st.text(f"⏳ {DATASET_LABELS[name]} 수집 중..." + (f" ({done_total[0]}/{done_total[1]})" if done_total else ""))
     
-    status.update(label="✅ 모든 데이터 준비 완료!", state="complete", expanded=False)
+    failed_text = f", 실패 {len(dataset_errors)}" if dataset_errors else ""
+    with st.status(f"🚀 데이터 수집 중... ({len(DATASETS) - len(missing)}/{len(DATASETS)} 준비{failed_text})", expanded=True,
+                   state="error" if len(dataset_errors) == len(missing) else "running"):
+        startup_progress(missing, dataset_errors)
+
+def _pending(name, text):
+    """아직 값이 없는 데이터셋 자리. 첫 수집이 실패했으면 오류를 보여 준다."""
+    if name in dataset_errors:
+        st.error(f"⚠️ {DATASET_LABELS[name]} 수집 실패: {dataset_errors[name]} (잠시 후 자동으로 다시 시도합니다)")
+    else:
+        st.info(text)
+
+def _latest(name, default):
+    """(값, 수집 시각). 아직 한 번도 수집되지 않았으면 (default, None)"""
+    return refresher.latest(name) or (default, None)
+
+df_themes, themes_at = _latest("themes", pd.DataFrame())
+riser_data, risers_at = _latest("risers", {})
+df_trading, trading_at = _latest("trading_value", pd.DataFrame())
+df_market_cap, market_cap_at = _latest("market_cap", pd.DataFrame())
+(df_kospi_gainers, df_kosdaq_gainers), gainers_at = _latest("gainers", (pd.DataFrame(), pd.DataFrame()))
+intersection_ready = None not in (themes_at, risers_at, trading_at)
+
+crawl_stats = df_themes.attrs.get("crawl_stats")
+if crawl_stats:
+    st.caption(f"🕒 테마 데이터 {datetime.fromtimestamp(themes_at):%H:%M:%S} 수집 | 테마 페이지 성공 {crawl_stats['fetched']} / 재사용 {crawl_stats.get('reused', 0)} / 실패 {crawl_stats['failed']} / 재시도 {crawl_stats['retried']} ({crawl_stats['elapsed']:.2f}초)")
 
 tab1, tab2 = st.tabs(["🎯 3중 교집합 발굴", "📊 시황 분석 (Dual-Engine)"])
 
 # --- Tab 1 ---
 with tab1:
     st.subheader("1️⃣ 3중 교집합 분석 결과 (The Intersection)")
-    st.markdown("""
+    st.markdown(f"""
     **필터링 조건 (AND 조건):**
-    1. 🔥 **테마 상위 50위** 내 종목
-    2. 📈 **상승률 상위 500위** (코스피+코스닥)
-    3. 💰 **거래대금 상위 500위** (코스피+코스닥)
+    1. 🔥 **테마 상위 {THEME_LIMIT}위** 내 종목
+    2. 📈 **상승률 상위 {UNIVERSE['risers_top_n']}위** (코스피/코스닥 각각)
+    3. 💰 **거래대금 상위 {UNIVERSE['trading_value_top_n']}위** (코스피/코스닥 각각)
     """)
     
     st.info(f"📊 **데이터 수집 현황**")
     col1, col2, col3 = st.columns(3)
-    col1.metric("🔥 테마 종목", f"{len(df_themes)}개")
-    col2.metric("📈 상승 종목", f"{len(riser_data)}개")
-    col3.metric("💰 거래대금 종목", f"{len(mf_codes)}개")
+    col1.metric("🔥 테마 종목", f"{len(df_themes)}개" if themes_at is not None else "⚠️ 실패" if "themes" in dataset_errors else "⏳")
+    col2.metric("📈 상승 종목", f"{len(riser_data)}개" if risers_at is not None else "⚠️ 실패" if "risers" in dataset_errors else "⏳")
+    col3.metric("💰 거래대금 종목", f"{len(df_trading)}개" if trading_at is not None else "⚠️ 실패" if "trading_value" in dataset_errors else "⏳")
     
-    final_candidates = []
+    with st.expander("⚙️ 필터 / 정렬 설정", expanded=False):
+        f1, f2, f3, f4 = st.columns(4)
+        intersection_filters = {
+            "max_theme_rank": f1.number_input("테마 순위 상한", min_value=1, value=None, step=1),
+            "min_change": f2.number_input("최소 등락률 (%)", value=None, step=0.5),
+            "min_market_cap": f3.number_input("최소 시가총액 (억)", min_value=0, value=None, step=100),
+            "min_trading_value": f4.number_input("최소 거래대금 (억)", min_value=0, value=None, step=10),
+        }
+        # 순위 이력 (테마 수집이 두 번 이상 쌓인 뒤부터 적용)
+        f5, f6, f7 = st.columns(3)
+        intersection_filters.update({
+            "min_theme_velocity": f5.number_input("최소 테마 순위 상승 속도 (회당 순위)", value=None, step=0.5),
+            "min_stock_velocity": f6.number_input("최소 종목 순위 상승 속도 (테마 내, 회당 순위)", value=None, step=0.5),
+            "min_streak": f7.number_input("최소 연속 포착 (회)", min_value=1, value=None, step=1),
+        })
+        sort_labels = st.multiselect("정렬 기준 (앞에서부터 우선)", list(SORT_OPTIONS), default=["테마순위"])
     
-    if not df_themes.empty:
-        for index, row in df_themes.iterrows():
-            code = row['code']
-            if (code in riser_data) and (code in mf_codes):
-                row_data = row.to_dict()
-                row_data['시장'] = riser_data[code] 
-                final_candidates.append(row_data)
-                
-    if final_candidates:
-        df_final = pd.DataFrame(final_candidates)
-        df_final = df_final.drop_duplicates(['code'])
-        df_final = df_final.sort_values(by="테마순위_int")
+    sort_keys = [SORT_OPTIONS[label] for label in sort_labels]
+    # 테마 순위 이력의 모멘텀 지표 (수집할 때마다 갱신된 값을 읽기만 한다)
+    rank_features = rank_history.current_features()
+    df_final = compute_intersection(
+        attach_rank_features(df_themes, rank_features), riser_data, df_trading,
+        filters=intersection_filters,
+        sort_keys=sort_keys,
+    )
+    
+    if not df_final.empty:
+        # 행을 클릭했을 때 기다리지 않도록 후보 전체의 기본 지표와 관련 뉴스를 미리 받아 둔다
+        fundamentals_cache.prefetch(df_final["code"])
+        news_aggregator.prefetch([query for name in df_final["종목명"] for query in stock_news_queries(name)], limit=10)
+        # 일봉/주봉도 후보 전체를 받아 두고, 이미 받은 종목부터 지표 열과 차트를 채운다 (나머지는 다음 rerun 때)
+        ohlcv_cache.prefetch([(code, timeframe) for code in df_final["code"] for timeframe in TIMEFRAMES])
+        indicators = peek_indicators(df_final["code"])
+        
+        # [AI 스코어링] 후보 전체를 동시에 분석해서 점수 열로 붙인다 (리포트는 응답 캐시에 남아 행을 열 때 바로 나옴)
+        if st.button(f"🤖 후보 {len(df_final)}종목 AI 점수 일괄 분석"):
+            progress = st.progress(0.0, text="AI 스코어링 중...")
+            t_start = time.time()
+            screener.screen(
+                df_final, selected_real_name, int(themes_at),
+                on_progress=lambda done, total: progress.progress(done / total, text=f"AI 스코어링 중... ({done}/{total})"),
+                api_key=GOOG_API_KEY,
+            )
+            progress.progress(1.0, text=f"✅ AI 스코어링 완료 ({time.time() - t_start:.1f}초)")
+        
+        screen_results = screener.peek(df_final, selected_real_name, int(themes_at))
+        display_cols = ['테마순위', '테마내순위', '시장', '종목명', '현재가(등락률)', '테마명', MARKET_CAP_COL, TRADING_VALUE_COL]
+        if any(screen_results):
+            df_final = sort_frame(attach_scores(df_final, screen_results), sort_keys)
+            display_cols += [AI_SCORE_COL, AI_SUMMARY_COL]
+        if not indicators.empty:
+            df_final = attach_indicators(df_final, indicators)
+            display_cols += [RSI_COL, VOLUME_RATIO_COL, BREAKOUT_COL]
+        if not rank_features.empty:
+            display_cols += [THEME_VELOCITY_COL, STOCK_VELOCITY_COL, STREAK_COL, FIRST_SEEN_COL]
+        
+        live_mode = st.toggle(f"⚡ 실시간 시세 ({QUOTE_INTERVAL}초마다 현재가만 갱신)", key="live_mode")
+        
+        # 고른 행은 전체 스크립트 기준으로 읽어 두고, fragment 안에서 선택이 바뀌었을 때만 전체를 다시 돌린다
+        table_state = st.session_state.get("candidate_table")
+        selected_rows = [r for r in (table_state.selection.rows if table_state else []) if r < len(df_final)]
+        st.session_state.app_selection = selected_rows
         
-        event = st.dataframe(
-            df_final[['테마순위', '테마내순위', '시장', '종목명', '현재가(등락률)', '테마명']], 
-            use_container_width=True, 
-            hide_index=True, 
-            on_select="rerun", 
-            selection_mode="single-row",
+        # [실시간] 시세 틱마다 이 부분만 다시 그린다 (수집/교집합/상세 분석은 다시 돌지 않음)
+        @st.fragment(run_every=QUOTE_INTERVAL if live_mode else None)
+        def candidate_table(df, cols, column_config):
+            view = df[cols]
+            if st.session_state.get("live_mode"):
+                codes = list(df["code"]) + ([st.session_state.last_code] if st.session_state.last_code else [])
+                quotes = quote_board.get(codes)
+                changed = diff_quotes(st.session_state.live_quotes, quotes)
+                st.session_state.live_quotes = quotes
+                st.caption(f"⚡ {datetime.now():%H:%M:%S} 기준 | 시세 {len(quotes)}종목 | 직전 대비 변동 {len(changed)}종목")
+                changed_rows = df["code"].isin(changed).tolist()
+                view = apply_quotes(df, quotes)[cols].style.apply(
+                    lambda col: ["background-color: #fff3b0" if hit else "" for hit in changed_rows],
+                    subset=["현재가(등락률)"]
+                )
+            event = st.dataframe(
+                view, use_container_width=True, hide_index=True, on_select="rerun", selection_mode="single-row",
+                key="candidate_table", column_config=column_config
+            )
+            if event.selection.rows != st.session_state.app_selection:
+                st.rerun()
+        
+        candidate_table(
+            df_final, display_cols,
             column_config={
                 "테마순위": st.column_config.TextColumn("테마랭킹", width="small"),
                 "테마내순위": st.column_config.TextColumn("테마내등수", width="small"),
@@ -492,13 +362,24 @@ with tab1:
                 "종목명": st.column_config.TextColumn("종목명", width="medium"),
                 "현재가(등락률)": st.column_config.TextColumn("현재가", width="medium"),
                 "테마명": st.column_config.TextColumn("테마명", width="medium"),
+                MARKET_CAP_COL: st.column_config.NumberColumn("시가총액(억)", format="%.0f", width="small"),
+                TRADING_VALUE_COL: st.column_config.NumberColumn("거래대금(억)", format="%.1f", width="small"),
+                AI_SCORE_COL: st.column_config.ProgressColumn("AI 매력도", format="%d점", min_value=0, max_value=100, width="small"),
+                AI_SUMMARY_COL: st.column_config.TextColumn("AI 한줄평", width="large"),
+                RSI_COL: st.column_config.NumberColumn("RSI", format="%.0f", width="small"),
+                VOLUME_RATIO_COL: st.column_config.NumberColumn("거래량배율", format="%.1f배", width="small"),
+                BREAKOUT_COL: st.column_config.CheckboxColumn("20일돌파", width="small"),
+                THEME_VELOCITY_COL: st.column_config.NumberColumn("테마순위속도", format="%+.1f", width="small"),
+                STOCK_VELOCITY_COL: st.column_config.NumberColumn("종목순위속도", format="%+.1f", width="small"),
+                STREAK_COL: st.column_config.NumberColumn("연속포착", format="%d회", width="small"),
+                FIRST_SEEN_COL: st.column_config.DatetimeColumn("최초포착", format="MM-DD HH:mm", width="small"),
             }
         )
         
         st.divider()
         
-        if len(event.selection.rows) > 0:
-            sel_idx = event.selection.rows[0]
+        if len(selected_rows) > 0:
+            sel_idx = selected_rows[0]
             sel_data = df_final.iloc[sel_idx]
             
             s_name = sel_data['종목명']
@@ -507,24 +388,53 @@ with tab1:
             
             if st.session_state.last_code != code:
                 st.session_state.messages = []
+                st.session_state.chat_context = ChatContext()
                 st.session_state.last_code = code
-                st.session_state.current_news_data = [] 
-                
-                with st.spinner(f"⚡ {s_name} 실시간 속보 수집 중..."):
-                    news_1 = fetch_google_news_rss(f"{s_name} 주가 특징주", limit=10)
-                    news_2 = fetch_google_news_rss(f"{s_name} 속보", limit=10)
-                    
-                    all_news = news_1 + news_2
-                    unique_news = {v['link']: v for v in all_news}.values()
-                    
-                    sorted_news = sorted(list(unique_news), key=lambda x: x['date_obj'] if x['date_obj'] else datetime.min.replace(tzinfo=None), reverse=True)
-                    st.session_state.current_news_data = sorted_news
-                    
-                    market_str = f"종목명: {s_name}\n코드: {code}\n테마: {s_theme}\n시가총액: {get_stock_fundamentals(code)['시가총액']}\n현재가(등락): {sel_data['현재가(등락률)']}"
-                    st.session_state.current_market_fact = market_str
+            
+            # 뉴스/기본 지표/봉은 위에서 후보 전체를 미리 받아 두므로 여기서는 받아 둔 값만 읽는다 (네트워크를 기다리지 않음)
+            # 대화를 시작하기 전까지는 rerun 마다 그 사이 들어온 값으로 다시 채운다
+            fundamentals = peek_stock_fundamentals(code)
+            news_data, _ = news_aggregator.peek(stock_news_queries(s_name), limit=10)
+            if not st.session_state.messages:
+                st.session_state.current_news_data = news_data
+                st.session_state.current_market_fact = build_market_fact(
+                    s_name, code, s_theme, fundamentals, sel_data['현재가(등락률)'],
+                    describe_indicators(indicators.loc[code] if code in indicators.index else None)
+                )
+
+            def detail_loading(code, s_name):
+                """아직 받는 중인 항목 이름들"""
+                pending = {
+                    "뉴스": news_aggregator.peek(stock_news_queries(s_name), limit=10)[1],
+                    "기본 지표": fundamentals_cache.pending(code),
+                    "일봉/주봉": any(ohlcv_cache.pending((code, timeframe)) for timeframe in TIMEFRAMES),
+                }
+                return [label for label, waiting in pending.items() if waiting]
 
             st.subheader(f"2️⃣ [{s_name}] 상세 분석")
-            st.info(f"💰 시가총액: **{get_stock_fundamentals(code)['시가총액']}** | 🏆 테마: **{s_theme}**")
+            loading = detail_loading(code, s_name)
+            if loading:
+                @st.fragment(run_every=0.5)
+                def detail_progress(code, s_name, loading):
+                    # 받는 중이던 항목이 들어오면 전체를 다시 돌려서 그 부분을 채운다
+                    if detail_loading(code, s_name) != loading:
+                        st.rerun()
+                    st.caption(f"⏳ {' · '.join(loading)} 받는 중...")
+                
+                detail_progress(code, s_name, loading)
+            st.info(
+                f"💰 시가총액: **{fundamentals['시가총액']}** | PER **{fundamentals['PER']}** | PBR **{fundamentals['PBR']}** | "
+                f"외국인 **{fundamentals['외국인소진율']}** | 🏆 테마: **{s_theme}**"
+            )
+            
+            if live_mode:
+                @st.fragment(run_every=QUOTE_INTERVAL)
+                def selected_live_price(code, snapshot_text):
+                    # 표의 fragment 와 같은 틱이면 QuoteBoard 가 받아 둔 값을 그대로 준다
+                    quote = quote_board.get([code]).get(code)
+                    st.caption(f"⚡ 실시간 {format_quote(quote)} (스냅샷 {snapshot_text})" if quote else "⚡ 실시간 시세를 아직 받지 못했습니다.")
+                
+                selected_live_price(code, sel_data['현재가(등락률)'])
             
             with st.expander("💬 AI 투자 전략가와 대화하기 (Click)", expanded=True):
                 news_count = len(st.session_state.current_news_data)
@@ -543,7 +453,7 @@ with tab1:
                         log_box = st.expander("🛠️ 시스템 처리 로그 (분석 진행상황)", expanded=True)
                         log_box.write("1️⃣ 분석 프로세스 시작...")
                         
-                        user_msg_content = f"{s_name} 심층 분석해줘."
+                        user_msg_content = STOCK_REPORT_REQUEST.format(name=s_name)
                         with st.chat_message("user"): st.markdown(user_msg_content)
                         st.session_state.messages.append({"role": "user", "content": user_msg_content})
                         
@@ -557,11 +467,17 @@ with tab1:
                                 s_name, 
                                 s_theme, 
                                 st.session_state.current_market_fact, 
-                                st.session_state.current_news_data
+                                st.session_state.current_news_data,
+                                snapshot_id=int(themes_at),
+                                chat_context=st.session_state.chat_context,
+                                api_key=GOOG_API_KEY
                             ))
                             
                             t_end = time.time()
                             log_box.write(f"3️⃣ 답변 생성 완료! (소요 시간: {t_end - t_start:.2f}초)")
+                            ctx_stats = st.session_state.chat_context.last_stats
+                            if ctx_stats:
+                                log_box.write(f"📏 프롬프트 약 {ctx_stats['system_tokens'] + ctx_stats['history_tokens']} 토큰 (지침+데이터 {ctx_stats['system_tokens']} / 대화 {ctx_stats['history_tokens']})")
                             
                         st.session_state.messages.append({"role": "assistant", "content": res_txt})
 
@@ -575,28 +491,43 @@ with tab1:
                             s_name, 
                             s_theme, 
                             st.session_state.current_market_fact, 
-                            st.session_state.current_news_data
+                            st.session_state.current_news_data,
+                            snapshot_id=int(themes_at),
+                            chat_context=st.session_state.chat_context,
+                            api_key=GOOG_API_KEY
                         ))
                     st.session_state.messages.append({"role": "assistant", "content": res_txt})
 
             col1, col2 = st.columns([1, 1])
             with col1:
                 t1, t2, t3 = st.tabs(["📅 일봉", "📆 주봉", "📋 테마 전체"])
-                with t1: st.image(f"https://ssl.pstatic.net/imgfinance/chart/item/candle/day/{code}.png", use_container_width=True)
-                with t2: st.image(f"https://ssl.pstatic.net/imgfinance/chart/item/candle/week/{code}.png", use_container_width=True)
+                # 미리 받아 둔 봉으로 그린다 (아직 받는 중이거나 못 받은 종목은 네이버 차트 이미지)
+                for tab, timeframe in ((t1, "day"), (t2, "week")):
+                    with tab:
+                        bars = peek_ohlcv(code, timeframe)
+                        if bars is not None and not bars.empty:
+                            st.altair_chart(_candle_chart(bars.tail(120)), use_container_width=True)
+                        else:
+                            st.image(f"https://ssl.pstatic.net/imgfinance/chart/item/candle/{timeframe}/{code}.png", use_container_width=True)
                 with t3:
                     cur_theme_list = df_themes[df_themes['테마명']==s_theme]
                     st.dataframe(cur_theme_list[['테마내순위', '종목명','현재가(등락률)']], hide_index=True)
             with col2:
-                final_news_list = st.session_state.current_news_data
+                final_news_list = select_news(st.session_state.current_news_data, (s_name, s_theme), top_k=20, token_budget=None)
                 st.markdown(f"##### 📰 관련 뉴스 (상위 20건)")
                 if final_news_list:
-                    for n in final_news_list[:20]: 
-                        st.markdown(f"- [{n['title']}]({n['link']})")
+                    for n in final_news_list: 
+                        st.markdown(f"- [{n['title']}]({n['link']}) · {news_source_label(n)}")
                 else:
                     st.warning("수집된 뉴스가 없습니다.")
+    elif not intersection_ready:
+        failed_inputs = [name for name in ("themes", "risers", "trading_value") if name in dataset_errors]
+        for name in failed_inputs:
+            _pending(name, "")
+        if not failed_inputs:
+            st.info("⏳ 교집합에 필요한 테마/상승률/거래대금 데이터를 수집하는 중입니다. 준비되는 대로 표시됩니다.")
     else:
-        st.warning("조건(테마50위 & 상승500위 & 거래대금500위)을 동시에 만족하는 종목이 현재 없습니다.")
+        st.warning(f"조건(테마{THEME_LIMIT}위 & 상승{UNIVERSE['risers_top_n']}위 & 거래대금{UNIVERSE['trading_value_top_n']}위)을 동시에 만족하는 종목이 현재 없습니다.")
 
 # --- Tab 2 ---
 with tab2:
@@ -604,7 +535,9 @@ with tab2:
     sub_t1, sub_t2 = st.tabs(["🏢 시총 상위 150 (지수)", "🚀 급등 상위 150 (모멘텀)"])
     with sub_t1:
         if not df_market_cap.empty: st.dataframe(df_market_cap, height=400, use_container_width=True)
+        elif market_cap_at is None: _pending("market_cap", "⏳ 시가총액 상위 종목 수집 중...")
     with sub_t2:
+        if gainers_at is None: _pending("gainers", "⏳ 급등 종목 수집 중...")
         c1, c2 = st.columns(2)
         with c1:
             st.markdown("#### 코스피 급등 Top 150")
@@ -615,15 +548,9 @@ with tab2:
         
     st.divider()
     st.subheader("🤖 AI 실시간 시황 브리핑")
-    if st.button("📢 시황 뉴스 수집 및 종합 분석 (RSS)"):
+    if st.button("📢 시황 뉴스 수집 및 종합 분석 (RSS)", disabled=market_cap_at is None or gainers_at is None):
         with st.spinner("실시간 증시 속보 수집 중..."):
-            news_1 = fetch_google_news_rss("국내 증시", limit=10)
-            news_2 = fetch_google_news_rss("한국 증시", limit=10)
-            
-            all_market_news = news_1 + news_2
-            unique_market_news = {v['link']: v for v in all_market_news}.values()
-            
-            final_market_news = sorted(list(unique_market_news), key=lambda x: x['date_obj'] if x['date_obj'] else datetime.min.replace(tzinfo=None), reverse=True)
+            final_market_news = news_aggregator.search(["국내 증시", "한국 증시"], limit=10)
             
         if final_market_news:
             st.success(f"✅ 뉴스 {len(final_market_news)}건 확보! (분석 시작)")
@@ -632,7 +559,7 @@ with tab2:
             log_box.write(f"1️⃣ 뉴스 {len(final_market_news)}개 AI 전송 중...")
             t_s = time.time()
             
-            st.write_stream(analyze_market_macro_v2(df_market_cap, df_kospi_gainers, df_kosdaq_gainers, final_market_news, selected_real_name))
+            st.write_stream(analyze_market_macro_v2(df_market_cap, df_kospi_gainers, df_kosdaq_gainers, final_market_news, selected_real_name, snapshot_id=f"{int(market_cap_at)}-{int(gainers_at)}", api_key=GOOG_API_KEY))
             
             t_e = time.time()
             log_box.write(f"2️⃣ 분석 완료 (소요: {t_e - t_s:.2f}초)")
@@ -642,3 +569,4 @@ with tab2:
                     st.write(f"- {n['title']}: {n['summary']}")
         else:
             st.error("⚠️ 최근 7일 내 시황 뉴스가 없습니다.")
+